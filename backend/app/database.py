@@ -2,15 +2,31 @@
 Database connection and session management
 """
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from app.config import settings
 
+
+def _pool_options(url: str) -> dict:
+    """Pool sizing for dialects that use QueuePool (not e.g. in-memory SQLite's SingletonThreadPool)"""
+    url = make_url(url)
+    if not issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        return {}
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+    }
+
+
 # Create database engine
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    echo=settings.DEBUG
+    echo=settings.DEBUG,
+    **_pool_options(settings.DATABASE_URL)
 )
 
 # Create session factory
@@ -29,4 +45,47 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def add_to_row(db, model, key: dict, increments: dict, assign: dict = None) -> None:
+    """
+    Atomically add `increments` to the row identified by `key`, inserting it if
+    missing (INSERT ... ON CONFLICT DO UPDATE SET col = col + excluded.col)
+
+    Args:
+        db: Session; the caller commits
+        model: Mapped class with a primary key or unique constraint on key's columns
+        key: Column values that identify the row
+        increments: Column -> amount to add
+        assign: Column -> value to overwrite (e.g. a last-seen timestamp)
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"add_to_row does not support {dialect}")
+
+    assign = assign or {}
+    statement = insert(model).values(**key, **increments, **assign)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={
+            **{column: getattr(model, column) + getattr(statement.excluded, column) for column in increments},
+            **{column: getattr(statement.excluded, column) for column in assign},
+        }
+    )
+    db.execute(statement)
+
+
+def init_db():
+    """
+    Create missing tables. Called from the app's startup (and by scripts),
+    never on import. Columns and indexes added to existing tables are
+    applied by `python -m app.migrations`, once per deploy.
+    """
+    import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+    Base.metadata.create_all(bind=engine)
@@ -0,0 +1,163 @@
+"""
+Event loop lag monitor and blocking-call detector
+A task on the event loop sleeps LOOP_MONITOR_INTERVAL_SECONDS at a time and
+records how late it wakes up. That lateness is time the loop spent running
+something else without yielding: sync SQLAlchemy sessions, sync SDK calls
+and CPU work inside `async def` handlers.
+
+With DEBUG (or LOOP_BLOCK_DETECTOR) on, a watchdog thread also notices when
+the loop has been stuck past LOOP_BLOCK_THRESHOLD_SECONDS and grabs the
+loop thread's stack until it is free again. The block is attributed to the
+innermost app/ frame seen most often, its call site. Sites are counted and
+the first stack seen for each is logged. Blocks are caught when they
+overlap one of the monitor's wake-ups, so short blocks are sampled rather
+than all seen.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Dict, Optional
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+loop_lag = registry.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a timer due now",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+loop_blocked = registry.counter(
+    "event_loop_blocked_total", "Times the event loop was late by more than LOOP_BLOCK_THRESHOLD_SECONDS"
+)
+blocking_calls = registry.counter(
+    "event_loop_blocking_calls_total", "Blocked event loop episodes by app call site (detector on)"
+)
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_APP_ROOT = os.path.dirname(os.path.dirname(_APP_DIR)) + os.sep
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def _call_site(frame) -> Optional[str]:
+    """'app/routers/work.py:231 (log_work)' for the innermost app frame, if any"""
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename != _THIS_FILE:
+            return f"{filename[len(_APP_ROOT):]}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return None
+
+
+class LoopMonitor:
+    """Measures event loop lag; optionally attributes blocks to call sites"""
+
+    def __init__(self):
+        self.sites: Dict[str, dict] = {}  # call site -> {"count", "max_seconds", "leaf"}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread: Optional[int] = None
+        self._due = 0.0  # time.monotonic() the monitor task should wake at
+        self._pending: Optional[dict] = None  # stacks sampled during the current block
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, interval: Optional[float] = None, threshold: Optional[float] = None,
+              detect: Optional[bool] = None) -> None:
+        """Start on the running loop (call from inside it)"""
+        if self.running:
+            return
+        interval = interval or settings.LOOP_MONITOR_INTERVAL_SECONDS
+        threshold = threshold or settings.LOOP_BLOCK_THRESHOLD_SECONDS
+        if detect is None:
+            detect = settings.DEBUG or settings.LOOP_BLOCK_DETECTOR
+        self._loop_thread = threading.get_ident()
+        self._due = time.monotonic() + interval
+        self._task = asyncio.get_running_loop().create_task(self._run(interval, threshold))
+        if detect:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, args=(interval, threshold),
+                                              name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, interval: float, threshold: float) -> None:
+        while True:
+            self._due = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.monotonic() - self._due)
+            loop_lag.observe(lag)
+            if lag > threshold:
+                loop_blocked.inc()
+                self._record_block(lag)
+
+    def _watch(self, interval: float, threshold: float) -> None:
+        """Watchdog thread: sample the loop thread's stack for as long as it is blocked"""
+        poll = min(interval, threshold) / 2
+        while not self._stop.wait(poll):
+            due = self._due
+            if time.monotonic() - due <= threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None or frame.f_code.co_name == "select":
+                continue  # Waiting in the selector: late, but not blocked
+            key = (_call_site(frame), f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} "
+                                      f"({frame.f_code.co_name})")
+            with self._lock:
+                if self._pending is None or self._pending["due"] != due:
+                    self._pending = {"due": due, "samples": Counter(), "stacks": {}}
+                pending = self._pending
+                pending["samples"][key] += 1
+                new = key not in pending["stacks"]
+            if new:
+                pending["stacks"][key] = "".join(traceback.format_stack(frame))
+
+    def _record_block(self, lag: float) -> None:
+        """On the loop, once it runs again: attribute the block to the site sampled most during it"""
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None or pending["due"] != self._due:
+            return
+        (site, leaf), _ = pending["samples"].most_common(1)[0]
+        stack = pending["stacks"].get((site, leaf), "")
+        site = site or "outside app/"
+        blocking_calls.inc(site=site)
+        with self._lock:
+            seen = self.sites.get(site)
+            if seen is None:
+                self.sites[site] = {"count": 1, "max_seconds": lag, "leaf": leaf}
+            else:
+                seen["count"] += 1
+                seen["max_seconds"] = max(seen["max_seconds"], lag)
+        if seen is None:
+            logger.warning("Event loop blocked %.0f ms at %s (in %s):\n%s", lag * 1000, site, leaf, stack)
+
+    def report(self) -> list:
+        """Blocking call sites, most frequent first"""
+        with self._lock:
+            return sorted(({"site": site, **info} for site, info in self.sites.items()),
+                          key=lambda entry: entry["count"], reverse=True)
+
+
+loop_monitor = LoopMonitor()
@@ -1,19 +1,74 @@
 """
 FastAPI application entry point
 """
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app import tracing
 from app.config import settings
-from app.database import Base, engine
-from app.routers import auth, user, character, diet, exercise, sleep, assistant
+from app.loop_monitor import loop_monitor
+from app.metrics import registry
+from app.profiling import ProfilingMiddleware, continuous_profiler
+from app.request_metrics import RequestMetricsMiddleware, instrument_engine
+from app.services.auth import password_context
+from app.services.gemini import gemini_service
+from app.services.llm_usage import usage_accounting
+from app.services.resilience import set_deadline, reset_deadline
+from app.services.scenario_pool import scenario_pool
+from app.services.warmup import run_warmup_loop
+from app.database import SessionLocal, engine, init_db
+from app.routers import auth, user, character, diet, exercise, sleep, assistant, admin
 from app.routers.work import router as work_router
 
-# Create database tables (skip if DATABASE_URL not configured)
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    print(f"Warning: Could not connect to database: {e}")
-    print("App will start but database operations will fail")
+instrument_engine(engine)
+tracing.instrument_engine(engine, SessionLocal)
+
+
+def prewarm():
+    """Load what the first requests would otherwise load (heavy SDKs are imported lazily)"""
+    try:
+        gemini_service.load_models()
+        password_context()
+    except Exception as e:
+        print(f"Warning: Pre-warm failed, first requests will load it instead: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the schema, then start background tasks without delaying readiness"""
+    # Create database tables (skip if DATABASE_URL not configured)
+    if settings.DATABASE_CREATE_SCHEMA:
+        try:
+            await asyncio.to_thread(init_db)
+        except Exception as e:
+            print(f"Warning: Could not connect to database: {e}")
+            print("App will start but database operations will fail")
+
+    background_tasks = [asyncio.create_task(usage_accounting.run(settings.LLM_USAGE_FLUSH_SECONDS))]
+    if settings.STARTUP_PREWARM:
+        background_tasks.append(asyncio.create_task(asyncio.to_thread(prewarm)))
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    if settings.WARMUP_ENABLED and settings.USDA_API_KEY:
+        background_tasks.append(asyncio.create_task(run_warmup_loop()))
+    if settings.WORKPLACE_POOL_ENABLED and settings.GEMINI_API_KEY:
+        background_tasks.append(asyncio.create_task(scenario_pool.run(settings.WORKPLACE_POOL_WORKERS)))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    continuous_profiler.stop()
+    await loop_monitor.stop()
+    # Write usage recorded since the last flush
+    try:
+        await asyncio.to_thread(usage_accounting.flush)
+    except Exception as e:
+        print(f"Warning: Could not write Gemini usage: {e}")
+    await asyncio.to_thread(tracing.flush)
+
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -21,6 +76,7 @@ app = FastAPI(
     version=settings.APP_VERSION,
     debug=settings.DEBUG,
     redirect_slashes=False,
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -33,6 +89,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    """Give each request a deadline that upstream calls (USDA) must fit within"""
+    budget = settings.REQUEST_DEADLINE_SECONDS
+    client_timeout = request.headers.get("X-Request-Timeout")
+    if client_timeout:
+        try:
+            budget = min(budget, max(0.0, float(client_timeout)))
+        except ValueError:
+            pass
+
+    token = set_deadline(budget)
+    try:
+        return await call_next(request)
+    finally:
+        reset_deadline(token)
+
+
+# Profiles requests carrying X-Profile (no-op unless PROFILING_TOKEN is set)
+app.add_middleware(ProfilingMiddleware)
+
+# Opens the request span that SQL, USDA and Gemini spans attach to
+app.add_middleware(tracing.TracingMiddleware, router_app=app)
+
+# Outermost, so it times everything above including CORS and deadlines
+app.add_middleware(RequestMetricsMiddleware, router_app=app)
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(user.router)
@@ -42,6 +127,7 @@ app.include_router(exercise.router)
 app.include_router(sleep.router)
 app.include_router(assistant.router)
 app.include_router(work_router)
+app.include_router(admin.router)
 
 
 @app.get("/")
@@ -60,6 +146,12 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus-style metrics"""
+    return registry.render()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=settings.DEBUG)
\ No newline at end of file
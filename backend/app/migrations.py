@@ -0,0 +1,116 @@
+"""
+One-time schema migrations
+Adds model columns and indexes that existing tables don't have yet;
+init_db() (run at startup) only creates missing tables. Run once per deploy,
+before the new app version starts (Procfile `release`, Railway
+`preDeployCommand`), not from every worker:
+
+    python -m app.migrations [--database-url URL]
+
+On PostgreSQL:
+- Indexes are built with CREATE INDEX CONCURRENTLY IF NOT EXISTS, so writes
+  to the table are not blocked while they build.
+- A session advisory lock makes concurrent runs wait for each other instead
+  of racing between the check and the DDL.
+- Use a direct (session) connection, not a transaction pooler: neither the
+  advisory lock nor CONCURRENTLY works through one.
+"""
+import argparse
+import re
+from typing import List
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateIndex
+
+from app.config import settings
+from app.database import Base
+
+_ADVISORY_LOCK_ID = 0x6F797374  # Arbitrary, shared by every migration run
+_CREATE_INDEX = re.compile(r"^CREATE (UNIQUE )?INDEX ")
+
+
+def add_missing_columns(conn: Connection) -> List[str]:
+    """
+    Add nullable model columns that existing tables don't have yet
+    (e.g. diet_logs.fdc_id, added after the table was created)
+
+    Returns:
+        The statements run
+    """
+    inspector = inspect(conn)
+    if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+    applied = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            statement = f"ALTER TABLE {table.name} ADD COLUMN {if_not_exists}{column.name} {column_type}"
+            conn.execute(text(statement))
+            applied.append(statement)
+    return applied
+
+
+def add_missing_indexes(conn: Connection) -> List[str]:
+    """
+    Create model indexes that existing tables don't have yet
+
+    Returns:
+        The statements run
+    """
+    inspector = inspect(conn)
+    concurrently = conn.dialect.name == "postgresql"
+    applied = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+            if concurrently:
+                statement = _CREATE_INDEX.sub(r"CREATE \1INDEX CONCURRENTLY ", statement, count=1)
+            conn.execute(text(statement))
+            applied.append(statement)
+    return applied
+
+
+def migrate(database_url: str = None) -> List[str]:
+    """Create missing tables, then add missing columns and indexes; returns the DDL run"""
+    import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+    engine = create_engine(database_url or settings.DATABASE_URL)
+    try:
+        Base.metadata.create_all(bind=engine)
+        # Autocommit: CREATE INDEX CONCURRENTLY can't run inside a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            postgres = conn.dialect.name == "postgresql"
+            if postgres:
+                conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+            try:
+                return add_missing_columns(conn) + add_missing_indexes(conn)
+            finally:
+                if postgres:
+                    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _ADVISORY_LOCK_ID})
+    finally:
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add missing columns and indexes to an existing database")
+    parser.add_argument("--database-url", help="defaults to DATABASE_URL; use a direct connection on Postgres")
+    args = parser.parse_args()
+
+    applied = migrate(args.database_url)
+    for statement in applied:
+        print(statement)
+    print(f"{len(applied)} schema changes applied")
+
+
+if __name__ == "__main__":
+    main()
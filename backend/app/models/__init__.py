@@ -4,17 +4,29 @@ Database models
 from app.models.user import User
 from app.models.character import Character
 from app.models.diet import DietLog
+from app.models.food_search import FoodSearch
 from app.models.exercise import ExerciseLog
 from app.models.sleep import SleepLog
 from app.models.workplace import WorkplaceEvent
 from app.models.work import WorkLog
+from app.models.llm_cache import LLMCacheEntry
+from app.models.conversation import PearlConversation, PearlMessage
+from app.models.daily_advice import DailyAdvice, DailyAdviceRun
+from app.models.llm_usage import LLMUsageDaily
 
 __all__ = [
     "User",
     "Character",
     "DietLog",
+    "FoodSearch",
     "ExerciseLog",
     "SleepLog",
     "WorkplaceEvent",
     "WorkLog",
+    "LLMCacheEntry",
+    "PearlConversation",
+    "PearlMessage",
+    "DailyAdvice",
+    "DailyAdviceRun",
+    "LLMUsageDaily",
 ]
\ No newline at end of file
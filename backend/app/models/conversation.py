@@ -0,0 +1,50 @@
+"""
+Pearl conversation database models
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.database import Base
+
+
+class PearlConversation(Base):
+    """A chat thread with Pearl, stored server-side"""
+    __tablename__ = "pearl_conversations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    # Rolling summary of turns that were compacted out of the history
+    summary = Column(Text, default="")
+    summary_tokens = Column(Integer, default=0)
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    messages = relationship(
+        "PearlMessage",
+        back_populates="conversation",
+        cascade="all, delete-orphan",
+        order_by="PearlMessage.id"
+    )
+
+
+class PearlMessage(Base):
+    """One turn (user or Pearl) in a conversation"""
+    __tablename__ = "pearl_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("pearl_conversations.id"), nullable=False, index=True)
+
+    role = Column(String, nullable=False)  # user, model
+    content = Column(Text, nullable=False)
+    token_count = Column(Integer, default=0)  # Estimated
+    summarized = Column(Boolean, default=False)  # Folded into the conversation summary
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    conversation = relationship("PearlConversation", back_populates="messages")
@@ -0,0 +1,43 @@
+"""
+Daily advice database models
+"""
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Text
+from datetime import datetime
+from app.database import Base
+
+
+class DailyAdvice(Base):
+    """Latest pre-generated daily advice for a user (one row per user)"""
+    __tablename__ = "daily_advice"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    advice = Column(Text, nullable=False)
+
+    # Bucketed character state + activity the advice was written for;
+    # a different fingerprint means the user's situation has changed
+    context_fingerprint = Column(String(64), nullable=False)
+
+    run_id = Column(Integer, ForeignKey("daily_advice_runs.id"))
+
+    # Timestamps
+    generated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DailyAdviceRun(Base):
+    """One run of the daily advice batch job (progress doubles as the resume cursor)"""
+    __tablename__ = "daily_advice_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_date = Column(Date, nullable=False, index=True)
+    status = Column(String, default="running")  # running, completed, failed
+
+    # Progress
+    total_users = Column(Integer, default=0)
+    processed = Column(Integer, default=0)
+    succeeded = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    last_user_id = Column(Integer, default=0)  # Users are processed in id order
+
+    # Timestamps
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
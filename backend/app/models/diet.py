@@ -1,7 +1,7 @@
 """
 Diet log database model
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -10,6 +10,10 @@ from app.database import Base
 class DietLog(Base):
     """Food/meal tracking log"""
     __tablename__ = "diet_logs"
+    __table_args__ = (
+        # Per-user recent-activity windows (assistant context, daily totals)
+        Index("ix_diet_logs_user_id_logged_at", "user_id", "logged_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -17,6 +21,7 @@ class DietLog(Base):
     # Food details
     food_name = Column(String, nullable=False)
     meal_type = Column(String)  # breakfast, lunch, dinner, snack
+    fdc_id = Column(Integer, index=True)  # USDA FoodData Central ID (server-resolved logs)
 
     # Nutrition info (from USDA API)
     calories = Column(Float, default=0.0)
@@ -0,0 +1,17 @@
+"""
+Food search popularity database model
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.database import Base
+
+
+class FoodSearch(Base):
+    """How often a food search (as typed, normalized) was run; ranks the warm-up set"""
+    __tablename__ = "food_searches"
+
+    query = Column(String(200), primary_key=True)  # Stripped, lowercased, single-spaced
+    searches = Column(Integer, default=0)
+
+    # Timestamps
+    last_searched_at = Column(DateTime, default=datetime.utcnow)
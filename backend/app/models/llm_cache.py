@@ -0,0 +1,19 @@
+"""
+LLM response cache database model
+"""
+from sqlalchemy import Column, String, DateTime, Text
+from datetime import datetime
+from app.database import Base
+
+
+class LLMCacheEntry(Base):
+    """Persistent tier of the LLM response cache (shared across workers and deploys)"""
+    __tablename__ = "llm_cache_entries"
+
+    key = Column(String(64), primary_key=True)  # sha256 of kind + scope + canonical prompt
+    kind = Column(String, nullable=False)  # advice, workplace_scenario
+    response = Column(Text, nullable=False)  # JSON-encoded response
+
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,24 @@
+"""
+Gemini usage accounting database model
+"""
+from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, UniqueConstraint
+from app.database import Base
+
+
+class LLMUsageDaily(Base):
+    """A user's Gemini usage for one day and operation (advice, pearl_chat, ...)"""
+    __tablename__ = "llm_usage_daily"
+    __table_args__ = (UniqueConstraint("user_id", "day", "operation", name="uq_llm_usage_daily"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    day = Column(Date, nullable=False)  # UTC
+    operation = Column(String, nullable=False)
+
+    requests = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    prompt_tokens = Column(Integer, default=0)  # Includes cached tokens
+    cached_tokens = Column(Integer, default=0)
+    response_tokens = Column(Integer, default=0)
+    cost_usd = Column(Float, default=0.0)
+    latency_seconds = Column(Float, default=0.0)  # Sum; divide by requests for the mean
@@ -1,7 +1,7 @@
 """
 Sleep log database model
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -10,6 +10,10 @@ from app.database import Base
 class SleepLog(Base):
     """Sleep tracking log"""
     __tablename__ = "sleep_logs"
+    __table_args__ = (
+        # Per-user recent-activity windows (assistant context, daily totals)
+        Index("ix_sleep_logs_user_id_logged_at", "user_id", "logged_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -0,0 +1,240 @@
+"""
+On-demand sampling profiler
+A background thread samples every thread's Python stack at a fixed interval
+and counts them as folded stacks ("outer;inner;leaf count"), the input format
+of flamegraph.pl, speedscope and most flame graph viewers.
+
+- Per request: send the X-Profile header with PROFILING_TOKEN and the
+  request is sampled every PROFILING_INTERVAL_SECONDS while it runs. The
+  response carries X-Profile-Id; fetch the profile from
+  GET /api/admin/profiles/{id}.
+- Continuous: POST /api/admin/profiling/continuous samples all traffic on this
+  worker at a low rate until stopped; GET returns the aggregate.
+
+Sampling sees threads, not requests, so a per-request profile also includes
+whatever else the worker ran at the same time. Idle frames (event loop
+select, threadpool workers waiting for work) are dropped.
+"""
+import asyncio
+import hmac
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from app.config import settings
+from app.metrics import registry
+
+profiled_requests = registry.counter("profiled_requests_total", "Requests profiled on demand via X-Profile")
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+
+# (file name suffix, function) of frames where a thread is waiting, not working
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("_thread.py", "_worker"),  # anyio worker threads waiting for a job
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_APP_ROOT):
+        filename = filename[len(_APP_ROOT):]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return any(code.co_filename.endswith(suffix) and code.co_name == name for suffix, name in _IDLE_FRAMES)
+
+
+class StackSampler:
+    """Samples all threads' stacks every `interval` seconds into folded-stack counts"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{next(self._ids)}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        """Record one stack per busy thread (profiler threads excluded)"""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, str(ident))
+            if name.startswith("profiler-") or _is_idle(frame):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(name.split(" (", 1)[0])  # Thread as the root frame
+            stacks.append(";".join(reversed(labels)))
+        with self._lock:
+            self.samples += 1
+            self.stacks.update(stacks)
+
+    def folded(self, reset: bool = False) -> str:
+        """Folded stacks, heaviest first; `reset` starts a new aggregate"""
+        with self._lock:
+            folded = "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+            if reset:
+                self.stacks.clear()
+                self.samples = 0
+                self.started_at = time.time()
+        return folded
+
+
+class ProfileStore:
+    """The last PROFILING_KEEP per-request profiles, optionally also written to PROFILING_DIR"""
+
+    def __init__(self, keep: int, directory: Optional[str] = None):
+        self.keep = keep
+        self.directory = directory
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id: str, profile: dict) -> None:
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.keep:
+                self._profiles.popitem(last=False)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{profile_id}.folded"), "w", encoding="utf-8") as f:
+                f.write(profile["folded"])
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> list:
+        with self._lock:
+            return [{"id": profile_id, **{k: v for k, v in profile.items() if k != "folded"}}
+                    for profile_id, profile in reversed(self._profiles.items())]
+
+
+class ContinuousProfiler:
+    """Low-rate sampling of everything this worker runs, aggregated until reset"""
+
+    def __init__(self):
+        self.sampler: Optional[StackSampler] = None
+
+    @property
+    def running(self) -> bool:
+        return self.sampler is not None and self.sampler.running
+
+    def start(self, interval: float) -> None:
+        if self.running:
+            return
+        self.sampler = StackSampler(interval)
+        self.sampler.start()
+
+    def stop(self) -> None:
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def status(self) -> dict:
+        sampler = self.sampler
+        return {
+            "running": self.running,
+            "interval_seconds": sampler.interval if sampler else None,
+            "samples": sampler.samples if sampler else 0,
+            "started_at": sampler.started_at if sampler else None,
+        }
+
+
+profile_store = ProfileStore(settings.PROFILING_KEEP, settings.PROFILING_DIR)
+continuous_profiler = ContinuousProfiler()
+
+
+def token_matches(token: Optional[str]) -> bool:
+    """True if profiling is enabled and `token` is PROFILING_TOKEN"""
+    expected = settings.PROFILING_TOKEN
+    return bool(expected and token and hmac.compare_digest(token.encode(), expected.encode()))
+
+
+def _requested_token(scope) -> Optional[str]:
+    """The X-Profile header; never the query string, which ends up in access logs"""
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            return value.decode("latin-1")
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that carry a valid X-Profile token"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.PROFILING_TOKEN or not token_matches(_requested_token(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{os.getpid()}-{int(time.time())}-{next(self._ids)}"
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        sampler = StackSampler(settings.PROFILING_INTERVAL_SECONDS)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            seconds = time.perf_counter() - start
+            # Joining the sampler thread and writing to PROFILING_DIR block, so keep them off the loop
+            await asyncio.to_thread(sampler.stop)
+            profiled_requests.inc()
+            await asyncio.to_thread(profile_store.add, profile_id, {
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status,
+                "seconds": round(seconds, 4),
+                "samples": sampler.samples,
+                "interval_seconds": sampler.interval,
+                "folded": sampler.folded(),
+            })
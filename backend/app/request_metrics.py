@@ -0,0 +1,211 @@
+"""
+Per-route HTTP and SQL metrics
+RequestMetricsMiddleware records latency, status codes and in-flight requests
+per route template (e.g. /api/work/log), plus how many SQL statements each
+request executed and how long they took, via SQLAlchemy cursor events.
+
+With DEBUG on, it also logs requests that run the same statement shape
+QUERY_REPEAT_THRESHOLD or more times (the usual sign of an N+1 loop).
+count_queries() gives scripts the same per-block counts.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by method, route template and status code"
+)
+http_seconds = registry.histogram(
+    "http_request_seconds", "HTTP request latency by method and route template (until the last body chunk)"
+)
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests in progress by method and route template")
+db_statements = registry.histogram(
+    "http_request_db_statements", "SQL statements executed per request by method and route template",
+    buckets=(0, 1, 2, 3, 5, 8, 12, 20, 30, 50, 100)
+)
+db_seconds = registry.histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request by method and route template"
+)
+db_statements_total = registry.counter(
+    "db_statements_total", "SQL statements executed, inside a request or not"
+)
+db_repeated_statements = registry.counter(
+    "http_request_repeated_statements_total",
+    "Requests that repeated one statement shape past QUERY_REPEAT_THRESHOLD, by method and route (DEBUG only)"
+)
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%s|:\w+|%\(\w+\)s)\s*,)*\s*(?:\?|%s|:\w+|%\(\w+\)s)\s*\)")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Statement with literals and IN-list lengths folded, so repeats of one query compare equal"""
+    shape = _IN_LIST.sub("(?...)", statement)
+    shape = _NUMBER.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class QueryStats:
+    """SQL statements executed while handling one request (or one count_queries() block)"""
+
+    __slots__ = ("statements", "seconds", "shapes")
+
+    def __init__(self, track_shapes: bool = False):
+        self.statements = 0
+        self.seconds = 0.0
+        self.shapes: Optional[Counter] = Counter() if track_shapes else None
+
+    def add(self, other: "QueryStats") -> None:
+        self.statements += other.statements
+        self.seconds += other.seconds
+        if self.shapes is not None and other.shapes is not None:
+            self.shapes.update(other.shapes)
+
+    def repeated(self, threshold: int) -> list:
+        """(shape, count) for statement shapes run at least `threshold` times, most repeated first"""
+        if not self.shapes:
+            return []
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+# Mutated in place, so statements run in threadpool workers (sync routes and
+# dependencies get a copy of the context) still count towards the request
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Statements executed so far by the current request (None outside a request)"""
+    return _query_stats.get()
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """
+    Count the statements run inside the block, including by in-process
+    requests (e.g. through httpx.ASGITransport)
+
+        with count_queries() as stats:
+            await client.post("/api/work/log", json=...)
+        assert stats.statements <= 17
+    """
+    stats = QueryStats(track_shapes=True)
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    db_statements_total.inc()
+    stats = _query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+        if stats.shapes is not None:
+            stats.shapes[statement_shape(statement)] += 1
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; drop its start time
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time every statement `engine` executes"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def route_template(app, scope) -> str:
+    """Path template of the route that will handle `scope`, e.g. /api/diet/{log_id}"""
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+        if match == Match.PARTIAL and partial is None:
+            # Path matches but not the method (CORS preflight, 405)
+            partial = getattr(route, "path", None)
+    # Unmatched paths share one label so 404 scans can't blow up cardinality
+    return partial or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording per-route request and SQL metrics
+
+    Pure ASGI rather than @app.middleware("http") so streamed responses are
+    timed until their last chunk and their SQL is counted.
+    """
+
+    def __init__(self, app, router_app):
+        self.app = app
+        self.router_app = router_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.router_app, scope)
+        outer = _query_stats.get()
+        # Shapes are tracked in DEBUG, or when a count_queries() block wants them
+        stats = QueryStats(track_shapes=settings.DEBUG or (outer is not None and outer.shapes is not None))
+        token = _query_stats.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec(method=method, route=route)
+            http_requests.inc(method=method, route=route, status=str(status))
+            http_seconds.observe(elapsed, method=method, route=route)
+            db_statements.observe(stats.statements, method=method, route=route)
+            db_seconds.observe(stats.seconds, method=method, route=route)
+            _query_stats.reset(token)
+            if outer is not None:
+                outer.add(stats)
+            self._report_repeats(method, route, stats)
+
+    @staticmethod
+    def _report_repeats(method: str, route: str, stats: QueryStats) -> None:
+        repeated = stats.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        if not repeated:
+            return
+        db_repeated_statements.inc(method=method, route=route)
+        for shape, count in repeated:
+            logger.warning("Possible N+1: %s %s ran %d x %s", method, route, count, shape[:300])
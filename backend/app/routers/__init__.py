@@ -1,8 +1,8 @@
 """
 API routers
 """
-from app.routers import auth, user, character, diet, exercise, sleep, assistant
+from app.routers import auth, user, character, diet, exercise, sleep, assistant, admin
 
-__all__ = ["auth", "user", "character", "diet", "exercise", "sleep", "assistant"]
+__all__ = ["auth", "user", "character", "diet", "exercise", "sleep", "assistant", "admin"]
 
 # Note: work router is imported directly in main.py to avoid circular import
\ No newline at end of file
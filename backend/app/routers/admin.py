@@ -0,0 +1,68 @@
+"""
+Admin API routes (profiling and event loop blocking)
+Authorized by the X-Profiling-Token header matching PROFILING_TOKEN; with no
+token configured the routes answer 404. Profiles are per worker.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.loop_monitor import loop_monitor
+from app.profiling import continuous_profiler, profile_store, token_matches
+
+
+def require_profiling_token(x_profiling_token: Optional[str] = Header(None)):
+    """Allow the request only with a valid profiling token"""
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not token_matches(x_profiling_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid profiling token")
+
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"], dependencies=[Depends(require_profiling_token)])
+
+
+@router.get("/profiles")
+def list_profiles():
+    """Stored per-request profiles on this worker, newest first"""
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    """One per-request profile as folded stacks (flamegraph.pl / speedscope input)"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profile["folded"]
+
+
+@router.post("/profiling/continuous")
+def start_continuous_profiling(interval: Optional[float] = Query(None, gt=0, le=1)):
+    """Start low-rate sampling of all requests on this worker"""
+    continuous_profiler.start(interval or settings.PROFILING_CONTINUOUS_INTERVAL_SECONDS)
+    return continuous_profiler.status()
+
+
+@router.get("/profiling/continuous", response_class=PlainTextResponse)
+def get_continuous_profile(reset: bool = False):
+    """Folded stacks aggregated since the start (or the last reset)"""
+    sampler = continuous_profiler.sampler
+    if sampler is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Continuous profiling was never started")
+    return sampler.folded(reset=reset)
+
+
+@router.delete("/profiling/continuous")
+def stop_continuous_profiling():
+    """Stop continuous sampling; the aggregate stays readable until the next start"""
+    continuous_profiler.stop()
+    return continuous_profiler.status()
+
+
+@router.get("/blocking-calls")
+def get_blocking_calls():
+    """Call sites caught blocking this worker's event loop (needs DEBUG or LOOP_BLOCK_DETECTOR)"""
+    return loop_monitor.report()
@@ -1,24 +1,44 @@
 """
 AI Assistant API routes (Gemini + USDA)
 """
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import json
+import time
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from datetime import datetime, timedelta
+from pydantic import BaseModel, Field
 
+from app.config import settings
 from app.database import get_db
-from app.models import User, Character, DietLog, ExerciseLog, SleepLog
+from app.metrics import registry
+from app.models import User
+from app.services import conversations
+from app.services import daily_advice
+from app.services.assistant_context import get_assistant_context
 from app.services.auth import get_current_user
-from app.services.gemini import gemini_service
-from app.services.usda import usda_service
+from app.services.gemini import gemini_service, ADVICE_ERROR_PREFIX, PEARL_ERROR_REPLY
+from app.services.llm_usage import usage_accounting
+from app.services.resilience import LimiterTimeout
+from app.services.scenario_pool import record_event, scenario_pool, state_bucket
+from app.services.usda import usda_service, USDARequestError, USDAUnavailableError
+from app.services.warmup import record_search
 
 router = APIRouter(prefix="/api/assistant", tags=["AI Assistant"])
 
+pearl_time_to_first_token = registry.histogram(
+    "pearl_time_to_first_token_seconds", "Time from request to the first streamed Pearl chunk"
+)
+pearl_stream_cancellations = registry.counter(
+    "pearl_stream_cancellations_total", "Streamed Pearl replies abandoned by the client"
+)
+
 
 class HealthAdviceRequest(BaseModel):
     """Request schema for health advice"""
     query: str | None = None
-    days: int = 7
+    days: int = Field(7, ge=1, le=30)
 
 
 class FoodSearchRequest(BaseModel):
@@ -27,66 +47,183 @@ class FoodSearchRequest(BaseModel):
     page_size: int = 10
 
 
+class FoodsDetailsRequest(BaseModel):
+    """Request schema for resolving several foods at once"""
+    fdc_ids: list[int] = Field(..., min_length=1, max_length=100)
+
+
 class PearlChatRequest(BaseModel):
-    """Request schema for Pearl chat"""
+    """Request schema for Pearl chat
+
+    Pass the conversation_id from a previous reply to continue that
+    conversation; its history is kept server-side. conversation_history is
+    only used when starting a new conversation (older clients).
+    """
     message: str
+    conversation_id: int | None = None
     conversation_history: list | None = None
 
 
+def _assistant_busy() -> HTTPException:
+    """The LLM scheduler shed this call: its queue would outlast the wait deadline"""
+    return HTTPException(
+        status_code=429,
+        detail="Pearl is busy right now, try again in a moment",
+        headers={"Retry-After": "5"}
+    )
+
+
+def _load_pearl_history(db: Session, user_id: int, request: PearlChatRequest) -> tuple[int | None, list]:
+    """
+    Resolve the conversation and build the history to send with this message
+
+    A new conversation has no id yet; it is created with its first successful reply.
+    """
+    if request.conversation_id is not None:
+        conversation = conversations.get_conversation(db, user_id, request.conversation_id)
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        conversation_id = conversation.id
+        history = conversations.build_history(db, conversation)
+    else:
+        conversation_id = None
+        history = conversations.cap_client_history(request.conversation_history)
+
+    conversations.prompt_tokens.observe(
+        conversations.history_tokens(history) + conversations.estimate_tokens(request.message)
+    )
+    return conversation_id, history
+
+
+def _store_pearl_turn(
+    db: Session, user_id: int, conversation_id: int | None, message: str, reply: str
+) -> tuple[int | None, bool]:
+    """
+    Save the exchange, starting the conversation if it is new (failed replies are skipped)
+
+    Returns:
+        The conversation id (None if nothing was stored), and whether the
+        conversation has outgrown its history budget and should be compacted
+    """
+    if not reply or reply.startswith(PEARL_ERROR_REPLY):
+        return conversation_id, False
+    try:
+        if conversation_id is None:
+            conversation_id = conversations.create_conversation(db, user_id).id
+        active_tokens = conversations.append_turn(db, conversation_id, message, reply)
+    finally:
+        db.close()
+    return conversation_id, active_tokens > settings.PEARL_HISTORY_TOKEN_BUDGET
+
+
 @router.post("/pearl/chat")
 async def chat_with_pearl(
     request: PearlChatRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Chat with Pearl AI assistant"""
-    # Get character state for context
-    character = db.query(Character).filter(Character.user_id == current_user.id).first()
-    character_state = None
-    if character:
-        character_state = {
-            "stamina": character.stamina,
-            "energy": character.energy,
-            "nutrition": character.nutrition,
-            "mood": character.mood,
-            "stress": character.stress
-        }
-
-    # Get recent logs (last 7 days)
-    start_date = datetime.utcnow() - timedelta(days=7)
-    recent_logs = None
-
-    if character:
-        diet_logs = db.query(DietLog).filter(
-            DietLog.user_id == current_user.id,
-            DietLog.logged_at >= start_date
-        ).all()
-
-        exercise_logs = db.query(ExerciseLog).filter(
-            ExerciseLog.user_id == current_user.id,
-            ExerciseLog.logged_at >= start_date
-        ).all()
-
-        sleep_logs = db.query(SleepLog).filter(
-            SleepLog.user_id == current_user.id,
-            SleepLog.logged_at >= start_date
-        ).all()
-
-        recent_logs = {
-            "diet": [{"calories": log.calories} for log in diet_logs],
-            "exercise": [{"duration_minutes": log.duration_minutes} for log in exercise_logs],
-            "sleep": [{"duration_hours": log.duration_hours} for log in sleep_logs]
-        }
+    user_id = current_user.id  # Read before the session below commits and closes
+    context = get_assistant_context(db, user_id)
+    conversation_id, history = _load_pearl_history(db, user_id, request)
+
+    # Return the DB connection to the pool before waiting on Gemini
+    db.close()
 
     # Chat with Pearl
-    response = gemini_service.pearl_chat(
-        user_message=request.message,
-        character_state=character_state,
-        recent_logs=recent_logs,
-        conversation_history=request.conversation_history
+    try:
+        response = await gemini_service.pearl_chat(
+            user_message=request.message,
+            character_state=context.character_state,
+            log_summary=context.log_summary if context.character_state else None,
+            conversation_history=history,
+            user_id=user_id
+        )
+    except LimiterTimeout:
+        raise _assistant_busy()
+
+    conversation_id, needs_compaction = _store_pearl_turn(db, user_id, conversation_id, request.message, response)
+    if needs_compaction:
+        background_tasks.add_task(conversations.compact_conversation, conversation_id)
+    return {"response": response, "conversation_id": conversation_id}
+
+
+@router.post("/pearl/chat/stream")
+async def stream_chat_with_pearl(
+    request: PearlChatRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Chat with Pearl, streaming the reply as Server-Sent Events
+
+    Events:
+        data: {"text": "..."}      one chunk of the reply
+        event: done                the reply is complete; data has the "conversation_id"
+        event: error               generation failed; data has a "detail"
+    """
+    started_at = time.monotonic()
+    user_id = current_user.id  # Read before the session below commits and closes
+    context = get_assistant_context(db, user_id)
+    conversation_id, history = _load_pearl_history(db, user_id, request)
+
+    # Return the DB connection to the pool before waiting on Gemini
+    db.close()
+
+    needs_compaction = False
+
+    async def compact_if_needed():
+        if needs_compaction:
+            await conversations.compact_conversation(conversation_id)
+
+    async def events():
+        nonlocal conversation_id, needs_compaction
+        stream = gemini_service.pearl_chat_stream(
+            user_message=request.message,
+            character_state=context.character_state,
+            log_summary=context.log_summary if context.character_state else None,
+            conversation_history=history,
+            user_id=user_id
+        )
+        first_chunk = True
+        reply = []
+        try:
+            async for text in stream:
+                if first_chunk:
+                    pearl_time_to_first_token.observe(time.monotonic() - started_at)
+                    first_chunk = False
+                if await http_request.is_disconnected():
+                    pearl_stream_cancellations.inc()
+                    return
+                reply.append(text)
+                yield f"data: {json.dumps({'text': text})}\n\n"
+            # Only complete replies become part of the conversation
+            conversation_id, needs_compaction = _store_pearl_turn(
+                db, user_id, conversation_id, request.message, "".join(reply)
+            )
+            yield f"event: done\ndata: {json.dumps({'conversation_id': conversation_id})}\n\n"
+        except LimiterTimeout:
+            yield _sse_error("Pearl is busy right now, try again in a moment")
+        except asyncio.CancelledError:
+            # Client went away mid-stream; stop generating tokens nobody reads
+            pearl_stream_cancellations.inc()
+            raise
+        except Exception as e:
+            yield _sse_error(f"{PEARL_ERROR_REPLY} Error: {str(e)}")
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(compact_if_needed)
     )
 
-    return {"response": response}
+
+def _sse_error(detail: str) -> str:
+    return f"event: error\ndata: {json.dumps({'detail': detail})}\n\n"
 
 
 @router.post("/advice")
@@ -95,50 +232,40 @@ async def get_health_advice(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get personalized health advice from Gemini AI"""
-    # Get character state
-    character = db.query(Character).filter(Character.user_id == current_user.id).first()
-    if not character:
+    """Get personalized health advice from Gemini AI
+
+    Plain daily advice (no query, default window) is served from the nightly
+    batch while the user's situation matches what it was written for.
+    """
+    user_id = current_user.id
+    context = get_assistant_context(db, user_id, request.days)
+    if not context.character_state:
         raise HTTPException(status_code=404, detail="Character not found")
 
-    character_state = {
-        "stamina": character.stamina,
-        "energy": character.energy,
-        "nutrition": character.nutrition,
-        "mood": character.mood,
-        "stress": character.stress
-    }
-
-    # Get recent logs
-    start_date = datetime.utcnow() - timedelta(days=request.days)
-
-    diet_logs = db.query(DietLog).filter(
-        DietLog.user_id == current_user.id,
-        DietLog.logged_at >= start_date
-    ).all()
+    is_daily = request.query is None and request.days == daily_advice.ADVICE_DAYS
+    if is_daily:
+        stored = daily_advice.get_fresh_advice(db, user_id, context)
+        if stored:
+            daily_advice.advice_requests.inc(result="stored")
+            return {"advice": stored}
+        daily_advice.advice_requests.inc(result="live")
 
-    exercise_logs = db.query(ExerciseLog).filter(
-        ExerciseLog.user_id == current_user.id,
-        ExerciseLog.logged_at >= start_date
-    ).all()
-
-    sleep_logs = db.query(SleepLog).filter(
-        SleepLog.user_id == current_user.id,
-        SleepLog.logged_at >= start_date
-    ).all()
-
-    recent_logs = {
-        "diet": [{"calories": log.calories} for log in diet_logs],
-        "exercise": [{"duration_minutes": log.duration_minutes} for log in exercise_logs],
-        "sleep": [{"duration_hours": log.duration_hours} for log in sleep_logs]
-    }
+    # Return the DB connection to the pool before waiting on Gemini
+    db.close()
 
     # Generate advice
-    advice = gemini_service.generate_health_advice(
-        character_state=character_state,
-        recent_logs=recent_logs,
-        user_query=request.query
-    )
+    try:
+        advice = await gemini_service.generate_health_advice(
+            character_state=context.character_state,
+            log_summary=context.log_summary,
+            user_query=request.query,
+            user_id=user_id
+        )
+    except LimiterTimeout:
+        raise _assistant_busy()
+
+    if is_daily and gemini_service.model and not advice.startswith(ADVICE_ERROR_PREFIX):
+        daily_advice.store_advice(db, user_id, advice, daily_advice.context_fingerprint(context))
 
     return {"advice": advice}
 
@@ -149,28 +276,65 @@ async def generate_workplace_scenario(
     db: Session = Depends(get_db)
 ):
     """Generate a workplace scenario based on current health state"""
-    character = db.query(Character).filter(Character.user_id == current_user.id).first()
-    if not character:
+    context = get_assistant_context(db, current_user.id)
+    if not context.character_state:
         raise HTTPException(status_code=404, detail="Character not found")
 
     character_state = {
-        "stamina": character.stamina,
-        "energy": character.energy,
-        "mood": character.mood,
-        "stress": character.stress
+        field: context.character_state[field] for field in ("stamina", "energy", "mood", "stress")
     }
 
-    scenario = gemini_service.generate_workplace_scenario(character_state)
+    # Serve a pre-generated scenario for this state bucket when one is ready
+    scenario = scenario_pool.take(state_bucket(character_state))
+    if scenario is None:
+        # Return the DB connection to the pool before waiting on Gemini
+        db.close()
+
+        try:
+            scenario = await gemini_service.generate_workplace_scenario(
+                character_state, user_id=current_user.id
+            )
+        except LimiterTimeout:
+            raise _assistant_busy()
+
+    if scenario.get("event_type") not in ("error", "generic"):
+        try:
+            record_event(db, current_user.id, character_state, scenario)
+        finally:
+            db.close()
     return scenario
 
 
+@router.get("/usage")
+async def get_gemini_usage(
+    days: int = 7,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get your Gemini usage (tokens, latency, estimated cost) per day and operation for the past N days"""
+    rows = usage_accounting.daily_totals(db, current_user.id, max(1, min(days, 90)))
+    fields = ("requests", "errors", "prompt_tokens", "cached_tokens", "response_tokens", "cost_usd",
+              "latency_seconds")
+    total = {field: sum(row[field] for row in rows) for field in fields}
+    total["cost_usd"] = round(total["cost_usd"], 6)
+    total["latency_seconds"] = round(total["latency_seconds"], 3)
+    return {"days": rows, "total": total}
+
+
 @router.post("/food-search")
 async def search_foods(
     request: FoodSearchRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Search for foods in USDA database"""
-    results = await usda_service.search_foods(request.query, request.page_size)
+    try:
+        results = await usda_service.search_foods(request.query, request.page_size)
+    except USDAUnavailableError:
+        raise HTTPException(status_code=503, detail="USDA food database is temporarily unavailable")
+    except USDARequestError as e:
+        raise HTTPException(status_code=400, detail=f"USDA could not run this search: {e}")
+    background_tasks.add_task(record_search, request.query)
     return {"foods": results}
 
 
@@ -180,7 +344,10 @@ async def get_food_details(
     current_user: User = Depends(get_current_user)
 ):
     """Get detailed nutrition information for a food"""
-    food_data = await usda_service.get_food_details(fdc_id)
+    try:
+        food_data = await usda_service.get_food_details(fdc_id)
+    except USDAUnavailableError:
+        raise HTTPException(status_code=503, detail="USDA food database is temporarily unavailable")
     if not food_data:
         raise HTTPException(status_code=404, detail="Food not found")
 
@@ -188,4 +355,37 @@ async def get_food_details(
     return {
         "food": food_data.get("description", "Unknown"),
         "nutrition": nutrition
-    }
\ No newline at end of file
+    }
+
+
+@router.post("/foods")
+async def get_foods_details(
+    request: FoodsDetailsRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Get nutrition information for several foods (e.g. a whole meal) in one round trip
+
+    "missing" lists foods USDA doesn't have; "unavailable" lists foods that
+    couldn't be fetched because USDA failed (retry those later).
+    """
+    try:
+        details = await usda_service.get_foods_details(request.fdc_ids)
+    except USDAUnavailableError:
+        raise HTTPException(status_code=503, detail="USDA food database is temporarily unavailable")
+
+    foods = []
+    missing = []
+    unavailable = set(details.unavailable)
+    for fdc_id in dict.fromkeys(request.fdc_ids):
+        food_data = details.foods.get(fdc_id)
+        if not food_data:
+            if fdc_id not in unavailable:
+                missing.append(fdc_id)
+            continue
+        foods.append({
+            "fdc_id": fdc_id,
+            "food": food_data.get("description", "Unknown"),
+            "nutrition": usda_service.parse_nutrition(food_data)
+        })
+
+    return {"foods": foods, "missing": missing, "unavailable": details.unavailable}
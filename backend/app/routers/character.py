@@ -8,6 +8,7 @@ from app.database import get_db
 from app.models import User, Character
 from app.schemas import CharacterResponse, CharacterUpdate
 from app.services.auth import get_current_user
+from app.services.assistant_context import invalidate_assistant_context
 
 router = APIRouter(prefix="/api/character", tags=["Character"])
 
@@ -51,6 +52,7 @@ async def update_character(
 
     db.commit()
     db.refresh(character)
+    invalidate_assistant_context(current_user.id)
 
     return character
 
@@ -9,7 +9,9 @@ from app.database import get_db
 from app.models import User, DietLog, Character, ExerciseLog, SleepLog, WorkLog
 from app.schemas import DietLogCreate, DietLogUpdate, DietLogResponse
 from app.services.auth import get_current_user
+from app.services.assistant_context import invalidate_assistant_context
 from app.services import health_calculator as hc
+from app.services.usda import usda_service, USDAUnavailableError
 
 router = APIRouter(prefix="/api/diet", tags=["Diet"])
 
@@ -100,28 +102,68 @@ def _apply_oyster_bonus(db: Session, user_id: int) -> bool:
     return True
 
 
+async def _resolve_usda_nutrition(fdc_id: int, serving_grams: float) -> dict:
+    """Look up a USDA food (cached) and scale its nutrition to the serving"""
+    try:
+        food_data = await usda_service.get_food_details(fdc_id)
+    except USDAUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="USDA food database is temporarily unavailable"
+        )
+    if not food_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Food not found"
+        )
+
+    nutrition = usda_service.scale_nutrition(usda_service.parse_nutrition(food_data), serving_grams)
+    return {
+        "food_name": usda_service._format_description(food_data.get("description", "")),
+        "calories": nutrition["calories"],
+        "protein": nutrition["protein"],
+        "carbs": nutrition["carbs"],
+        "fat": nutrition["fat"],
+        "fiber": nutrition["fiber"],
+        "serving_size": serving_grams,
+        "serving_unit": "g",
+    }
+
+
 @router.post("", response_model=DietLogResponse, status_code=status.HTTP_201_CREATED)
 async def create_diet_log(
     diet_log: DietLogCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Create a new diet log entry and update character nutrition"""
+    """Create a new diet log entry and update character nutrition
+
+    When fdc_id is given, nutrition is resolved from USDA server-side and any
+    client-sent values are ignored.
+    """
+    log_data = diet_log.model_dump(exclude={"serving_grams"})
+    if diet_log.fdc_id is not None:
+        resolved = await _resolve_usda_nutrition(diet_log.fdc_id, diet_log.serving_grams)
+        if diet_log.food_name:
+            resolved.pop("food_name")  # Keep the name the user picked
+        log_data.update(resolved)
+
     new_log = DietLog(
         user_id=current_user.id,
-        **diet_log.model_dump()
+        **log_data
     )
     db.add(new_log)
     db.commit()
     db.refresh(new_log)
 
     # Easter egg: check for oyster in food name
-    if "oyster" in diet_log.food_name.lower():
+    if "oyster" in new_log.food_name.lower():
         _apply_oyster_bonus(db, current_user.id)
     else:
         # Normal recalculation for non-oyster foods
         _recalculate_character_nutrition(db, current_user.id)
 
+    invalidate_assistant_context(current_user.id)
     return new_log
 
 
@@ -183,6 +225,7 @@ async def update_diet_log(
 
     db.commit()
     db.refresh(log)
+    invalidate_assistant_context(current_user.id)
     return log
 
 
@@ -204,4 +247,5 @@ async def delete_diet_log(
         )
 
     db.delete(log)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    invalidate_assistant_context(current_user.id)
\ No newline at end of file
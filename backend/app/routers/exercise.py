@@ -10,6 +10,7 @@ from app.database import get_db
 from app.models import User, ExerciseLog, Character, DietLog, SleepLog, WorkLog
 from app.schemas import ExerciseLogCreate, ExerciseLogUpdate, ExerciseLogResponse
 from app.services.auth import get_current_user
+from app.services.assistant_context import invalidate_assistant_context
 from app.services import health_calculator as hc
 
 router = APIRouter(prefix="/api/exercise", tags=["Exercise"])
@@ -121,6 +122,7 @@ async def create_exercise_log(
     # Recalculate character stamina and stress
     _recalculate_character_exercise(db, current_user.id, int(new_log.duration_minutes or 0))
 
+    invalidate_assistant_context(current_user.id)
     return new_log
 
 
@@ -176,4 +178,5 @@ async def delete_exercise_log(
         )
 
     db.delete(log)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    invalidate_assistant_context(current_user.id)
\ No newline at end of file
@@ -10,6 +10,7 @@ from app.database import get_db
 from app.models import User, SleepLog, Character, DietLog, ExerciseLog, WorkLog
 from app.schemas import SleepLogCreate, SleepLogUpdate, SleepLogResponse
 from app.services.auth import get_current_user
+from app.services.assistant_context import invalidate_assistant_context
 from app.services import health_calculator as hc
 
 router = APIRouter(prefix="/api/sleep", tags=["Sleep"])
@@ -136,6 +137,7 @@ async def create_sleep_log(
     # Recalculate character stats based on sleep
     _recalculate_character_sleep(db, current_user.id, float(new_log.duration_hours or 0))
 
+    invalidate_assistant_context(current_user.id)
     return new_log
 
 
@@ -191,4 +193,5 @@ async def delete_sleep_log(
         )
 
     db.delete(log)
-    db.commit()
\ No newline at end of file
+    db.commit()
+    invalidate_assistant_context(current_user.id)
\ No newline at end of file
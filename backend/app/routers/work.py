@@ -11,6 +11,7 @@ from app.database import get_db
 from app.models import User, Character, DietLog, ExerciseLog, SleepLog, WorkLog
 from app.schemas.work import WorkLogCreate, WorkLogResponse, WorkStats, HealthRecalculateResponse
 from app.services.auth import get_current_user
+from app.services.assistant_context import invalidate_assistant_context
 from app.services import health_calculator as hc
 
 router = APIRouter(prefix="/api/work", tags=["Work"])
@@ -270,6 +271,7 @@ async def log_work(
         pranked_boss=is_prank
     )
 
+    invalidate_assistant_context(current_user.id)
     return new_log
 
 
@@ -352,6 +354,7 @@ async def delete_work_log(
         _recalculate_and_update_character(
             db, character, diet_logs, exercise_logs, sleep_logs, work_logs
         )
+    invalidate_assistant_context(current_user.id)
 
 
 @router.post("/recalculate", response_model=HealthRecalculateResponse)
@@ -368,6 +371,7 @@ async def recalculate_health(
     character = _recalculate_and_update_character(
         db, character, diet_logs, exercise_logs, sleep_logs, work_logs
     )
+    invalidate_assistant_context(current_user.id)
 
     return HealthRecalculateResponse(
         stamina=character.stamina,
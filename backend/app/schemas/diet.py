@@ -1,7 +1,7 @@
 """
 Diet log schemas
 """
-from pydantic import BaseModel, ConfigDict, field_serializer
+from pydantic import BaseModel, ConfigDict, Field, field_serializer, model_validator
 from datetime import datetime, timezone
 
 
@@ -25,12 +25,28 @@ class DietLogBase(BaseModel):
     serving_size: float = 1.0
     serving_unit: str = "serving"
     notes: str | None = None
+    fdc_id: int | None = None  # USDA FoodData Central ID, when logged from a search
 
 
 class DietLogCreate(DietLogBase):
-    """Diet log creation schema"""
+    """Diet log creation schema
+
+    Either send nutrition values directly, or send fdc_id + serving_grams and
+    the server resolves and scales nutrition from USDA (food_name optional).
+    """
+    food_name: str | None = None
+    serving_grams: float | None = Field(default=None, gt=0, le=5000)
     logged_at: datetime | None = None
 
+    @model_validator(mode="after")
+    def check_food_source(self):
+        if self.fdc_id is None:
+            if not self.food_name:
+                raise ValueError("food_name is required when fdc_id is not given")
+        elif self.serving_grams is None:
+            raise ValueError("serving_grams is required when fdc_id is given")
+        return self
+
 
 class DietLogUpdate(BaseModel):
     """Diet log update schema"""
@@ -0,0 +1,110 @@
+"""
+Assistant context snapshot
+Character state plus recent activity totals for Pearl and health advice,
+loaded with one aggregate query and cached per user until their next log.
+
+Invalidation is per process; other workers pick up changes when the TTL
+(ASSISTANT_CONTEXT_TTL_SECONDS) expires.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.metrics import registry
+from app.models import Character, DietLog, ExerciseLog, SleepLog, User
+from app.services.cache import TTLCache
+
+context_requests = registry.counter(
+    "assistant_context_requests_total", "Assistant context lookups by result (hit, miss)"
+)
+
+STATE_FIELDS = ("stamina", "energy", "nutrition", "mood", "stress")
+WINDOWS_PER_USER = 4  # Cached `days` windows kept per user; the oldest is dropped first
+
+
+@dataclass(frozen=True)
+class AssistantContext:
+    """What the assistant knows about a user for one request"""
+    character_state: Optional[dict]  # None if the user has no character yet
+    log_summary: dict  # meals, calories, exercises, exercise_minutes, sleep_nights, avg_sleep_hours
+    days: int
+
+
+# user_id -> {days: AssistantContext}
+_contexts = TTLCache(maxsize=10000, ttl=settings.ASSISTANT_CONTEXT_TTL_SECONDS)
+
+
+def _window_total(model, column, user_id: int, since: datetime):
+    return select(func.coalesce(func.sum(column), 0)).where(
+        model.user_id == user_id,
+        model.logged_at >= since
+    ).scalar_subquery()
+
+
+def _window_count(model, user_id: int, since: datetime):
+    return select(func.count(model.id)).where(
+        model.user_id == user_id,
+        model.logged_at >= since
+    ).scalar_subquery()
+
+
+def load_assistant_context(db: Session, user_id: int, days: int = 7) -> AssistantContext:
+    """Character state and activity totals for the last `days` days, in one query"""
+    since = datetime.utcnow() - timedelta(days=days)
+    stmt = select(
+        Character.id,
+        *(getattr(Character, field) for field in STATE_FIELDS),
+        _window_count(DietLog, user_id, since),
+        _window_total(DietLog, DietLog.calories, user_id, since),
+        _window_count(ExerciseLog, user_id, since),
+        _window_total(ExerciseLog, ExerciseLog.duration_minutes, user_id, since),
+        _window_count(SleepLog, user_id, since),
+        _window_total(SleepLog, SleepLog.duration_hours, user_id, since),
+    ).select_from(User).outerjoin(Character, Character.user_id == User.id).where(User.id == user_id)
+
+    row = db.execute(stmt).one()
+    character_id, *state, meals, calories, exercises, minutes, nights, sleep_hours = row
+
+    character_state = None
+    if character_id is not None:
+        character_state = dict(zip(STATE_FIELDS, state))
+
+    return AssistantContext(
+        character_state=character_state,
+        log_summary={
+            "meals": meals,
+            "calories": float(calories),
+            "exercises": exercises,
+            "exercise_minutes": float(minutes),
+            "sleep_nights": nights,
+            "avg_sleep_hours": float(sleep_hours) / nights if nights else 0.0,
+        },
+        days=days
+    )
+
+
+def get_assistant_context(db: Session, user_id: int, days: int = 7) -> AssistantContext:
+    """Cached load_assistant_context"""
+    per_user = _contexts.get(user_id)
+    if per_user is not None and days in per_user:
+        context_requests.inc(result="hit")
+        return per_user[days]
+
+    context_requests.inc(result="miss")
+    context = load_assistant_context(db, user_id, days)
+    if per_user is None:
+        per_user = {}
+        _contexts.set(user_id, per_user)
+    elif len(per_user) >= WINDOWS_PER_USER:
+        per_user.pop(next(iter(per_user)))
+    per_user[days] = context
+    return context
+
+
+def invalidate_assistant_context(user_id: int) -> None:
+    """Drop a user's cached context; call after anything that changes their logs or character"""
+    _contexts.pop(user_id)
@@ -0,0 +1,207 @@
+"""
+Explicit context caching for large, static prompt prefixes
+Keeps a Gemini cached-content entry alive for a system instruction and hands
+out models bound to it, falling back to the inline instruction whenever the
+cache is unavailable.
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+context_cache_events = registry.counter(
+    "context_cache_events_total", "Context cache lifecycle events (created, refreshed, invalidated, failed)"
+)
+
+
+@dataclass
+class CacheHandle:
+    """A live cached-content entry"""
+    name: str
+    expires_at: float  # time.monotonic() deadline
+    tokens: int = 0
+    resource: object = None  # Backend-specific object (e.g. caching.CachedContent)
+
+
+class ContextCacheBackend(ABC):
+    """
+    Where cached contexts live
+
+    Implementations are synchronous; CachedSystemInstruction runs them in a thread.
+    """
+
+    @abstractmethod
+    def create(self, model_name: str, system_instruction: str, ttl: float) -> CacheHandle:
+        ...
+
+    @abstractmethod
+    def extend(self, handle: CacheHandle, ttl: float) -> CacheHandle:
+        ...
+
+    @abstractmethod
+    def delete(self, handle: CacheHandle) -> None:
+        ...
+
+    @abstractmethod
+    def model_for(self, handle: CacheHandle):
+        """A GenerativeModel-like object whose requests use the cached context"""
+
+    @abstractmethod
+    def is_unusable(self, error: Exception) -> bool:
+        """Whether a request using the cached context failed because the entry itself is gone"""
+
+
+class GeminiContextCacheBackend(ContextCacheBackend):
+    """google.generativeai cached content"""
+
+    def create(self, model_name: str, system_instruction: str, ttl: float) -> CacheHandle:
+        from datetime import timedelta
+        from google.generativeai import caching
+
+        cached = caching.CachedContent.create(
+            model=model_name,
+            display_name="pearl-system-instruction",
+            system_instruction=system_instruction,
+            ttl=timedelta(seconds=ttl)
+        )
+        usage = getattr(cached, "usage_metadata", None)
+        return CacheHandle(
+            name=cached.name,
+            expires_at=time.monotonic() + ttl,
+            tokens=getattr(usage, "total_token_count", 0) or 0,
+            resource=cached
+        )
+
+    def extend(self, handle: CacheHandle, ttl: float) -> CacheHandle:
+        from datetime import timedelta
+
+        handle.resource.update(ttl=timedelta(seconds=ttl))
+        handle.expires_at = time.monotonic() + ttl
+        return handle
+
+    def delete(self, handle: CacheHandle) -> None:
+        handle.resource.delete()
+
+    def model_for(self, handle: CacheHandle):
+        import google.generativeai as genai
+
+        return genai.GenerativeModel.from_cached_content(handle.resource)
+
+    def is_unusable(self, error: Exception) -> bool:
+        from google.api_core import exceptions
+
+        return isinstance(error, (exceptions.NotFound, exceptions.PermissionDenied))
+
+
+class CachedSystemInstruction:
+    """
+    Keeps a system instruction in a context cache and serves models bound to it
+
+    - The entry is created lazily on first use.
+    - Within `refresh_before` seconds of expiry its TTL is extended in the
+      background while requests keep using the still-valid entry.
+    - If creating or extending fails, model() returns None (callers use the
+      inline instruction) and creation is retried after `retry_after` seconds.
+    - A request error drops the entry only if the backend says the entry is
+      gone or inaccessible; rate limits, server errors and safety blocks keep
+      it, so errors don't create (and bill) a new entry each time.
+    """
+
+    def __init__(
+        self,
+        backend: ContextCacheBackend,
+        model_name: str,
+        system_instruction: str,
+        ttl: float = 3600,
+        refresh_before: float = 300,
+        retry_after: float = 600
+    ):
+        self.backend = backend
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.ttl = ttl
+        self.refresh_before = refresh_before
+        self.retry_after = retry_after
+        self.handle: Optional[CacheHandle] = None
+        self._model = None
+        self._failed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._delete_task: Optional[asyncio.Task] = None
+
+    async def model(self):
+        """Model using the cached instruction, or None to fall back to inline"""
+        now = time.monotonic()
+        handle = self.handle
+        if handle and now < handle.expires_at:
+            if handle.expires_at - now < self.refresh_before and not self._refreshing():
+                self._refresh_task = asyncio.ensure_future(self._extend(handle))
+            return self._model
+
+        if self._failed_at is not None and now - self._failed_at < self.retry_after:
+            return None
+
+        async with self._lock:
+            if not self.handle or time.monotonic() >= self.handle.expires_at:
+                await self._create()
+        return self._model
+
+    def invalidate(self, error: Exception) -> bool:
+        """
+        Drop the entry if `error` (from a request using it) shows it is unusable
+
+        The old entry is deleted in the background and the next model()
+        creates a new one.
+
+        Returns:
+            True if the entry was dropped and the request should be retried inline
+        """
+        handle = self.handle
+        if handle is None or not self.backend.is_unusable(error):
+            return False
+        self.handle = None
+        self._model = None
+        context_cache_events.inc(event="invalidated")
+        self._delete_task = asyncio.ensure_future(self._delete(handle))
+        return True
+
+    def _refreshing(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+
+    async def _create(self) -> None:
+        try:
+            handle = await asyncio.to_thread(
+                self.backend.create, self.model_name, self.system_instruction, self.ttl
+            )
+            self._model = self.backend.model_for(handle)
+            self.handle = handle
+            self._failed_at = None
+            context_cache_events.inc(event="created")
+        except Exception as e:
+            logger.warning("Context cache unavailable, using inline instruction: %s", e)
+            self.handle = None
+            self._model = None
+            self._failed_at = time.monotonic()
+            context_cache_events.inc(event="failed")
+
+    async def _delete(self, handle: CacheHandle) -> None:
+        try:
+            await asyncio.to_thread(self.backend.delete, handle)
+        except Exception as e:
+            # Already gone, or not ours to delete; it expires with its TTL either way
+            logger.info("Context cache entry %s not deleted: %s", handle.name, e)
+
+    async def _extend(self, handle: CacheHandle) -> None:
+        try:
+            await asyncio.to_thread(self.backend.extend, handle, self.ttl)
+            context_cache_events.inc(event="refreshed")
+        except Exception as e:
+            # The entry stays usable until it expires; model() recreates it after that
+            logger.warning("Context cache refresh failed: %s", e)
+            context_cache_events.inc(event="failed")
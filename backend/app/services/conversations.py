@@ -0,0 +1,229 @@
+"""
+Pearl conversation store
+Keeps chat history server-side and compacts older turns into a rolling
+summary once the history exceeds PEARL_HISTORY_TOKEN_BUDGET.
+"""
+import logging
+from typing import List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import registry
+from app.models import PearlConversation, PearlMessage
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+prompt_tokens = registry.histogram(
+    "pearl_prompt_tokens", "Estimated history + message tokens sent per Pearl turn", buckets=TOKEN_BUCKETS
+)
+compactions = registry.counter("pearl_compactions_total", "Pearl conversation compactions")
+compaction_conflicts = registry.counter(
+    "pearl_compaction_conflicts_total", "Pearl compactions discarded because another one got there first"
+)
+
+# Conversations being compacted by this process; others are caught by the
+# compare-and-set in compact_conversation
+_compacting: Set[int] = set()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def get_conversation(db: Session, user_id: int, conversation_id: int) -> Optional[PearlConversation]:
+    """A conversation owned by user_id, or None"""
+    return db.query(PearlConversation).filter(
+        PearlConversation.id == conversation_id,
+        PearlConversation.user_id == user_id
+    ).first()
+
+
+def create_conversation(db: Session, user_id: int) -> PearlConversation:
+    conversation = PearlConversation(user_id=user_id, summary="", summary_tokens=0)
+    db.add(conversation)
+    db.commit()
+    db.refresh(conversation)
+    return conversation
+
+
+def _active_messages(db: Session, conversation_id: int) -> List[PearlMessage]:
+    """Messages not yet folded into the summary, oldest first"""
+    return db.query(PearlMessage).filter(
+        PearlMessage.conversation_id == conversation_id,
+        PearlMessage.summarized == False  # noqa: E712
+    ).order_by(PearlMessage.id).all()
+
+
+def _turn_tokens(turn: dict) -> int:
+    return turn.get("tokens") or estimate_tokens(" ".join(str(p) for p in turn["parts"]))
+
+
+def _truncate(turn: dict, tokens: int) -> dict:
+    """A turn cut down to about `tokens` tokens"""
+    text = " ".join(str(p) for p in turn["parts"])
+    return {"role": turn["role"], "parts": [text[:tokens * 4].rstrip() + " ..."], "tokens": tokens}
+
+
+def _trim_to_budget(turns: List[dict], budget: int) -> List[dict]:
+    """
+    Keep the newest turns whose tokens fit the budget
+
+    Gemini history must start with a user turn, so a leading model turn is
+    dropped. If not even the newest exchange (last user turn onwards) fits,
+    it is kept with its longest turns truncated rather than sending no
+    history at all.
+    """
+    kept = []
+    used = 0
+    for turn in reversed(turns):
+        tokens = _turn_tokens(turn)
+        if used + tokens > budget:
+            break
+        kept.append(turn)
+        used += tokens
+    kept.reverse()
+    while kept and kept[0]["role"] != "user":
+        kept.pop(0)
+
+    if not kept:
+        last_user = next((i for i in range(len(turns) - 1, -1, -1) if turns[i]["role"] == "user"), None)
+        if last_user is not None:
+            exchange = turns[last_user:]
+            share = max(1, budget // len(exchange))
+            kept = [turn if _turn_tokens(turn) <= share else _truncate(turn, share) for turn in exchange]
+    return [{"role": turn["role"], "parts": turn["parts"]} for turn in kept]
+
+
+def build_history(db: Session, conversation: PearlConversation) -> List[dict]:
+    """
+    Gemini chat history for a stored conversation, capped at the prompt budget
+
+    The rolling summary (if any) is replayed as the first exchange.
+    """
+    history = []
+    budget = settings.PEARL_PROMPT_TOKEN_BUDGET
+    if conversation.summary:
+        history = [
+            {"role": "user", "parts": [f"(Summary of our conversation so far: {conversation.summary})"]},
+            {"role": "model", "parts": ["Got it, I remember."]},
+        ]
+        budget -= conversation.summary_tokens
+
+    turns = [
+        {"role": m.role, "parts": [m.content], "tokens": m.token_count}
+        for m in _active_messages(db, conversation.id)
+    ]
+    return history + _trim_to_budget(turns, max(0, budget))
+
+
+def cap_client_history(conversation_history: list) -> List[dict]:
+    """Cap a client-supplied history (legacy clients) at the prompt budget"""
+    turns = []
+    for turn in conversation_history or []:
+        if not isinstance(turn, dict) or "role" not in turn:
+            continue
+        parts = turn.get("parts") or [turn.get("content", "")]
+        turns.append({"role": turn["role"], "parts": [str(p) for p in parts]})
+    return _trim_to_budget(turns, settings.PEARL_PROMPT_TOKEN_BUDGET)
+
+
+def history_tokens(history: List[dict]) -> int:
+    return sum(estimate_tokens(" ".join(str(p) for p in turn["parts"])) for turn in history)
+
+
+def append_turn(db: Session, conversation_id: int, user_message: str, reply: str) -> int:
+    """
+    Store one user message and Pearl's reply
+
+    Returns:
+        Estimated tokens in the conversation's unsummarized history
+    """
+    db.add_all([
+        PearlMessage(conversation_id=conversation_id, role="user",
+                     content=user_message, token_count=estimate_tokens(user_message)),
+        PearlMessage(conversation_id=conversation_id, role="model",
+                     content=reply, token_count=estimate_tokens(reply)),
+    ])
+    db.commit()
+
+    return db.query(func.coalesce(func.sum(PearlMessage.token_count), 0)).filter(
+        PearlMessage.conversation_id == conversation_id,
+        PearlMessage.summarized == False  # noqa: E712
+    ).scalar()
+
+
+async def compact_conversation(conversation_id: int) -> None:
+    """
+    Fold the oldest turns into the rolling summary
+
+    Keeps the newest turns worth half of PEARL_HISTORY_TOKEN_BUDGET verbatim.
+    Runs after the response is sent, with its own session.
+
+    Concurrent compactions of one conversation (in other requests or
+    workers) would summarize the same turns from the same old summary, so
+    the result is only written if every turn it folds in is still
+    unsummarized; otherwise it is discarded.
+    """
+    from app.services.gemini import gemini_service
+
+    if conversation_id in _compacting:
+        return
+    _compacting.add(conversation_id)
+    db = SessionLocal()
+    try:
+        conversation = db.query(PearlConversation).filter(PearlConversation.id == conversation_id).first()
+        if not conversation:
+            return
+
+        messages = _active_messages(db, conversation_id)
+        if sum(m.token_count for m in messages) <= settings.PEARL_HISTORY_TOKEN_BUDGET:
+            return
+
+        keep_budget = settings.PEARL_HISTORY_TOKEN_BUDGET // 2
+        kept = 0
+        split = len(messages)
+        while split > 0 and kept + messages[split - 1].token_count <= keep_budget:
+            split -= 1
+            kept += messages[split].token_count
+        # Keep whole exchanges: the kept part must start with a user turn
+        while split < len(messages) and messages[split].role != "user":
+            split += 1
+
+        older = messages[:split]
+        if not older:
+            return
+
+        db.close()  # Don't hold a connection while the summary is generated
+        summary = await gemini_service.summarize_conversation(
+            conversation.summary,
+            [(m.role, m.content) for m in older],
+            max_tokens=settings.PEARL_SUMMARY_TOKEN_BUDGET
+        )
+
+        # Compare-and-set: claim the turns only if nobody summarized them meanwhile
+        claimed = db.query(PearlMessage).filter(
+            PearlMessage.id.in_([m.id for m in older]),
+            PearlMessage.summarized == False  # noqa: E712
+        ).update({PearlMessage.summarized: True}, synchronize_session=False)
+        if claimed != len(older):
+            db.rollback()
+            compaction_conflicts.inc()
+            return
+
+        db.query(PearlConversation).filter(PearlConversation.id == conversation_id).update(
+            {PearlConversation.summary: summary, PearlConversation.summary_tokens: estimate_tokens(summary)},
+            synchronize_session=False
+        )
+        db.commit()
+        compactions.inc()
+    except Exception as e:
+        logger.warning("Pearl conversation %s compaction failed: %s", conversation_id, e)
+    finally:
+        db.close()
+        _compacting.discard(conversation_id)
@@ -0,0 +1,229 @@
+"""
+Daily advice batch job
+Pre-generates each active user's daily advice overnight so the morning rush
+of POST /api/assistant/advice calls is served from the database.
+
+Run nightly (e.g. a cron service):
+    python -m app.services.daily_advice [--chunk-size 20] [--no-resume]
+
+An interrupted run is resumed from its last completed chunk when the job is
+started again the same day.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import select, union
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import registry
+from app.models import Character, DailyAdvice, DailyAdviceRun, DietLog, ExerciseLog, SleepLog
+from app.services.assistant_context import AssistantContext, load_assistant_context
+from app.services.llm_cache import quantize_log_summary, quantize_state
+
+logger = logging.getLogger(__name__)
+
+ADVICE_DAYS = 7  # Activity window of the default advice request
+
+advice_requests = registry.counter(
+    "daily_advice_requests_total", "Advice requests without a query by source (stored, live)"
+)
+batch_users = registry.counter("daily_advice_batch_users_total", "Users processed by result (ok, error)")
+batch_progress = registry.gauge("daily_advice_batch_progress", "Share of the current run's users processed")
+batch_throughput = registry.gauge("daily_advice_batch_users_per_second", "Throughput of the last run")
+
+
+def context_fingerprint(context: AssistantContext) -> str:
+    """Hash of the bucketed state and activity that advice is written for"""
+    canonical = json.dumps({
+        "state": quantize_state(context.character_state),
+        "activity": quantize_log_summary(context.log_summary),
+    }, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_fresh_advice(db: Session, user_id: int, context: AssistantContext) -> Optional[str]:
+    """Stored advice if it is recent and the user's situation hasn't changed since, else None"""
+    stored = db.get(DailyAdvice, user_id)
+    if not stored:
+        return None
+    if datetime.utcnow() - stored.generated_at > timedelta(hours=settings.DAILY_ADVICE_MAX_AGE_HOURS):
+        return None
+    if stored.context_fingerprint != context_fingerprint(context):
+        return None
+    return stored.advice
+
+
+def store_advice(db: Session, user_id: int, advice: str, fingerprint: str, run_id: int = None) -> None:
+    db.merge(DailyAdvice(
+        user_id=user_id,
+        advice=advice,
+        context_fingerprint=fingerprint,
+        run_id=run_id,
+        generated_at=datetime.utcnow()
+    ))
+    db.commit()
+
+
+def active_user_ids(db: Session, after_id: int = 0, limit: int = None) -> List[int]:
+    """Users with a character who logged anything in the last DAILY_ADVICE_ACTIVE_DAYS, by id"""
+    since = datetime.utcnow() - timedelta(days=settings.DAILY_ADVICE_ACTIVE_DAYS)
+    logged = union(*(
+        select(model.user_id).where(model.logged_at >= since)
+        for model in (DietLog, ExerciseLog, SleepLog)
+    )).subquery()
+    stmt = select(Character.user_id).where(
+        Character.user_id.in_(select(logged.c.user_id)),
+        Character.user_id > after_id
+    ).order_by(Character.user_id)
+    if limit:
+        stmt = stmt.limit(limit)
+    return list(db.scalars(stmt))
+
+
+def _start_run(db: Session, resume: bool) -> DailyAdviceRun:
+    """Today's unfinished run (to resume) or a new one"""
+    if resume:
+        run = db.query(DailyAdviceRun).filter(
+            DailyAdviceRun.run_date == date.today(),
+            DailyAdviceRun.status != "completed"
+        ).order_by(DailyAdviceRun.id.desc()).first()
+        if run:
+            logger.info("Resuming daily advice run %d after user %d (%d/%d done)",
+                        run.id, run.last_user_id, run.processed, run.total_users)
+            run.status = "running"
+            db.commit()
+            return run
+
+    run = DailyAdviceRun(run_date=date.today(), status="running", total_users=len(active_user_ids(db)))
+    db.add(run)
+    db.commit()
+    return run
+
+
+async def _advise(context: AssistantContext, user_id: int) -> Optional[str]:
+    from app.services.gemini import gemini_service, ADVICE_ERROR_PREFIX
+    from app.services.resilience import LimiterTimeout, PriorityScheduler
+
+    try:
+        advice = await gemini_service.generate_health_advice(
+            context.character_state,
+            context.log_summary,
+            user_id=user_id,
+            priority=PriorityScheduler.BACKGROUND
+        )
+    except LimiterTimeout:
+        return None
+    return None if advice.startswith(ADVICE_ERROR_PREFIX) else advice
+
+
+async def run_daily_advice_batch(chunk_size: int = None, resume: bool = True) -> dict:
+    """
+    Generate and store daily advice for every active user
+
+    Users are processed in id order, `chunk_size` Gemini calls at a time;
+    progress is committed after each chunk so a restarted job resumes there.
+
+    Returns:
+        Run summary (run_id, status, processed, succeeded, failed, seconds, users_per_second)
+    """
+    from app.services.gemini import gemini_service
+
+    await gemini_service.ensure_models()
+    if not gemini_service.model:
+        raise RuntimeError("GEMINI_API_KEY is not configured")
+
+    chunk_size = chunk_size or settings.DAILY_ADVICE_CHUNK_SIZE
+    db = SessionLocal()
+    start = time.monotonic()
+    processed_now = 0
+    run_id = None
+    try:
+        run = _start_run(db, resume)
+        run_id = run.id
+        while True:
+            user_ids = active_user_ids(db, after_id=run.last_user_id, limit=chunk_size)
+            if not user_ids:
+                break
+
+            contexts = {user_id: load_assistant_context(db, user_id, ADVICE_DAYS) for user_id in user_ids}
+            db.commit()  # Ends the read transaction so no connection is held while Gemini works
+            results = await asyncio.gather(*(_advise(contexts[uid], uid) for uid in user_ids))
+
+            for user_id, advice in zip(user_ids, results):
+                if advice is None:
+                    run.failed += 1
+                    batch_users.inc(result="error")
+                    continue
+                db.merge(DailyAdvice(
+                    user_id=user_id,
+                    advice=advice,
+                    context_fingerprint=context_fingerprint(contexts[user_id]),
+                    run_id=run.id,
+                    generated_at=datetime.utcnow()
+                ))
+                run.succeeded += 1
+                batch_users.inc(result="ok")
+
+            run.processed += len(user_ids)
+            run.last_user_id = user_ids[-1]
+            db.commit()
+
+            processed_now += len(user_ids)
+            elapsed = time.monotonic() - start
+            batch_progress.set(run.processed / run.total_users if run.total_users else 1.0)
+            logger.info("Daily advice run %d: %d/%d users (%d failed), %.1f users/s",
+                        run.id, run.processed, run.total_users, run.failed, processed_now / elapsed)
+
+        run.status = "completed"
+        run.finished_at = datetime.utcnow()
+        db.commit()
+
+        elapsed = time.monotonic() - start
+        throughput = processed_now / elapsed if elapsed else 0.0
+        batch_throughput.set(throughput)
+        return {
+            "run_id": run.id,
+            "status": run.status,
+            "total_users": run.total_users,
+            "processed": run.processed,
+            "succeeded": run.succeeded,
+            "failed": run.failed,
+            "seconds": round(elapsed, 2),
+            "users_per_second": round(throughput, 2),
+        }
+    except BaseException:
+        # Keep the cursor; the next start today resumes from the last committed chunk
+        db.rollback()
+        if run_id is not None:
+            db.query(DailyAdviceRun).filter(DailyAdviceRun.id == run_id).update({DailyAdviceRun.status: "failed"})
+            db.commit()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate daily advice for active users")
+    parser.add_argument("--chunk-size", type=int, default=settings.DAILY_ADVICE_CHUNK_SIZE,
+                        help="Gemini calls in flight at once")
+    parser.add_argument("--no-resume", action="store_true", help="start a new run even if today's is unfinished")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    from app.database import init_db
+    init_db()
+
+    summary = asyncio.run(run_daily_advice_batch(args.chunk_size, resume=not args.no_resume))
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,51 @@
 """
 Google Gemini AI service integration
 """
-import google.generativeai as genai
+import asyncio
+import threading
+import time
+from typing import AsyncIterator
+from app import tracing
 from app.config import settings
-
-
-class GeminiService:
-    """Service for interacting with Google Gemini AI"""
-
-    def __init__(self):
-        if settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-
-            # Pearl AI Assistant with personality
-            pearl_system_instruction = """You are Pearl (珍珠), a reliable health companion who lives inside the Oystraz app. You're the friend who's always got your back - chill but competent, laid-back but trustworthy.
+from app.metrics import registry
+from app.services.context_cache import CachedSystemInstruction, GeminiContextCacheBackend
+from app.services.llm_cache import (
+    llm_cache,
+    quantize_log_summary,
+    quantize_state,
+    user_scope,
+    SHARED_SCOPE,
+)
+from app.services.llm_usage import token_counts, usage_accounting
+from app.services.model_router import ModelRouter, FAST, PRIMARY
+from app.services.resilience import LimiterTimeout, PriorityScheduler
+from app.services.semantic_cache import SemanticAnswerCache, answer_cache_requests, is_general_question
+
+# Prefix of Pearl's reply when generation fails (such replies are not stored)
+PEARL_ERROR_REPLY = "Oof, something broke on my end."
+
+# Prefix of advice text when generation fails
+ADVICE_ERROR_PREFIX = "Error generating advice:"
+
+# Context caching needs an explicit model version
+PEARL_MODEL_NAME = f"models/{settings.GEMINI_MODEL}"
+
+# GeminiService attributes built by load_models()
+_MODEL_ATTRIBUTES = ("model", "pearl_model", "fast_model", "pearl_fast_model", "pearl_context")
+
+pearl_input_tokens = registry.histogram(
+    "pearl_input_tokens", "Prompt tokens per Pearl request (includes cached tokens)",
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000)
+)
+pearl_cached_input_tokens = registry.counter(
+    "pearl_cached_input_tokens_total", "Pearl prompt tokens served from the context cache"
+)
+pearl_request_seconds = registry.histogram(
+    "pearl_request_seconds", "Pearl request latency by instruction source"
+)
+
+# Pearl AI Assistant with personality
+PEARL_SYSTEM_INSTRUCTION = """You are Pearl (珍珠), a reliable health companion who lives inside the Oystraz app. You're the friend who's always got your back - chill but competent, laid-back but trustworthy.
 
 Your Background:
 - Food Science major with a serious love for food. You LIGHT UP when talking about nutrition, ingredients, cooking, or anything food-related.
@@ -131,47 +162,251 @@ TIPS TO SHARE:
 - Balanced diet with protein and fiber keeps nutrition high.
 - In the Work game, if you catch 24+ fish, the seal automatically pranks the octopus boss to relieve stress!"""
 
-            self.pearl_model = genai.GenerativeModel(
-                'gemini-2.5-flash',
-                system_instruction=pearl_system_instruction
+
+class GeminiService:
+    """Service for interacting with Google Gemini AI"""
+
+    def __init__(self):
+        # Orders, rate-limits and caps in-flight LLM calls per worker
+        self.scheduler = PriorityScheduler(
+            "gemini",
+            max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+            queue_timeouts={
+                PriorityScheduler.INTERACTIVE: settings.GEMINI_QUEUE_TIMEOUT_SECONDS,
+                PriorityScheduler.STANDARD: settings.GEMINI_QUEUE_TIMEOUT_SECONDS,
+                PriorityScheduler.BACKGROUND: settings.GEMINI_BACKGROUND_QUEUE_TIMEOUT_SECONDS,
+            },
+            rate_per_second=(settings.GEMINI_REQUESTS_PER_MINUTE / 60
+                             if settings.GEMINI_REQUESTS_PER_MINUTE else None),
+            burst=settings.GEMINI_RATE_BURST
+        )
+
+        # Shared answers to general questions about how the metrics work
+        self.answer_cache = None
+        if settings.PEARL_ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                threshold=settings.PEARL_ANSWER_CACHE_THRESHOLD,
+                ttl=settings.PEARL_ANSWER_CACHE_TTL_SECONDS,
+                max_entries=settings.PEARL_ANSWER_CACHE_SIZE
             )
-        else:
-            self.model = None
-            self.pearl_model = None
 
-    def generate_health_advice(
+        # Primary or fast model per call, by operation, prompt size and rolling latency
+        self.router = ModelRouter(
+            slos=settings.GEMINI_LATENCY_SLOS,
+            fast_operations=tuple(settings.GEMINI_FAST_OPERATIONS),
+            large_prompt_tokens=settings.GEMINI_LARGE_PROMPT_TOKENS,
+            fast_available=bool(settings.GEMINI_API_KEY and settings.GEMINI_FAST_MODEL)
+        )
+
+        # Models are built on first use (see __getattr__) so importing the app doesn't load the SDK
+        self._models_lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        # Only called for attributes not set yet; bench fakes assign these directly
+        if name in _MODEL_ATTRIBUTES:
+            self.load_models()
+            return self.__dict__[name]
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    async def ensure_models(self) -> None:
+        """load_models() in a thread, so first use (or waiting on the pre-warm) doesn't stall the event loop"""
+        if not all(name in self.__dict__ for name in _MODEL_ATTRIBUTES):
+            await asyncio.to_thread(self.load_models)
+
+    def load_models(self) -> None:
+        """Configure the SDK and build the models; attributes already set are kept"""
+        with self._models_lock:
+            if all(name in self.__dict__ for name in _MODEL_ATTRIBUTES):
+                return
+            models = dict.fromkeys(_MODEL_ATTRIBUTES)
+            if settings.GEMINI_API_KEY:
+                import google.generativeai as genai
+
+                genai.configure(api_key=settings.GEMINI_API_KEY)
+                models["model"] = genai.GenerativeModel(settings.GEMINI_MODEL)
+
+                # Pearl AI Assistant with personality
+                models["pearl_model"] = genai.GenerativeModel(
+                    PEARL_MODEL_NAME,
+                    system_instruction=PEARL_SYSTEM_INSTRUCTION
+                )
+
+                if settings.GEMINI_FAST_MODEL:
+                    models["fast_model"] = genai.GenerativeModel(settings.GEMINI_FAST_MODEL)
+                    models["pearl_fast_model"] = genai.GenerativeModel(
+                        settings.GEMINI_FAST_MODEL,
+                        system_instruction=PEARL_SYSTEM_INSTRUCTION
+                    )
+
+                # Serve Pearl's instruction from a context cache instead of resending it
+                if settings.PEARL_CONTEXT_CACHE_ENABLED:
+                    models["pearl_context"] = CachedSystemInstruction(
+                        GeminiContextCacheBackend(),
+                        model_name=PEARL_MODEL_NAME,
+                        system_instruction=PEARL_SYSTEM_INSTRUCTION,
+                        ttl=settings.PEARL_CONTEXT_CACHE_TTL_SECONDS,
+                        refresh_before=settings.PEARL_CONTEXT_CACHE_REFRESH_SECONDS,
+                        retry_after=settings.PEARL_CONTEXT_CACHE_RETRY_SECONDS
+                    )
+            for name, value in models.items():
+                self.__dict__.setdefault(name, value)
+
+    async def _generate(
+        self,
+        operation: str,
+        model,
+        contents,
+        priority: str = PriorityScheduler.STANDARD,
+        user_id: int = None,
+        route: str = PRIMARY
+    ):
+        """Run generate_content without blocking the event loop, accounted under `operation`"""
+        start = time.monotonic()
+        with _trace_call(operation, model, route, priority) as span:
+            try:
+                async with self.scheduler.slot(priority, user_id):
+                    call_start = time.monotonic()
+                    _trace_queued(span, call_start - start)
+                    try:
+                        response = await model.generate_content_async(contents)
+                    except Exception as e:
+                        self.router.observe_failure(route, operation, e)
+                        raise
+                    self.router.observe(route, operation, time.monotonic() - call_start)
+            except Exception as e:
+                _record_failure(operation, e, time.monotonic() - start, user_id)
+                raise
+            _trace_usage(span, response)
+        usage_accounting.record(operation, response, time.monotonic() - start, user_id)
+        return response
+
+    async def _send_chat(
+        self,
+        operation: str,
+        model,
+        history: list,
+        message: str,
+        user_id: int = None,
+        route: str = PRIMARY
+    ):
+        """Continue a chat session without blocking the event loop, accounted under `operation`"""
+        start = time.monotonic()
+        with _trace_call(operation, model, route, PriorityScheduler.INTERACTIVE) as span:
+            try:
+                async with self.scheduler.slot(PriorityScheduler.INTERACTIVE, user_id):
+                    call_start = time.monotonic()
+                    _trace_queued(span, call_start - start)
+                    try:
+                        chat = model.start_chat(history=history)
+                        response = await chat.send_message_async(message)
+                    except Exception as e:
+                        self.router.observe_failure(route, operation, e)
+                        raise
+                    self.router.observe(route, operation, time.monotonic() - call_start)
+            except Exception as e:
+                _record_failure(operation, e, time.monotonic() - start, user_id)
+                raise
+            _trace_usage(span, response)
+        usage_accounting.record(operation, response, time.monotonic() - start, user_id)
+        return response
+
+    def _route(self, operation: str, contents) -> tuple:
+        """(route, model) for a call with these contents"""
+        route = self.router.choose(operation, _estimate_tokens(contents))
+        if route == FAST and self.fast_model is not None:
+            return FAST, self.fast_model
+        return PRIMARY, self.model
+
+    async def _pearl_models(self, route: str = PRIMARY) -> list:
+        """(source, model) pairs to try for a Pearl request, cached instruction first"""
+        if route == FAST and self.pearl_fast_model is not None:
+            return [("inline", self.pearl_fast_model)]
+        if self.pearl_context:
+            cached = await self.pearl_context.model()
+            if cached is not None:
+                return [("cached", cached), ("inline", self.pearl_model)]
+        return [("inline", self.pearl_model)]
+
+    def _cached_answer(self, user_message: str) -> tuple:
+        """
+        Check the answer cache for a general question
+
+        Returns:
+            (is_general, cached answer or None). General questions are answered
+            without the user's stats or history so the answer can be shared.
+        """
+        if self.answer_cache is None:
+            return False, None
+        if not is_general_question(user_message):
+            answer_cache_requests.inc(result="personal")
+            return False, None
+        answer = self.answer_cache.get(user_message) or None  # An empty answer is never served
+        answer_cache_requests.inc(result="hit" if answer is not None else "miss")
+        return True, answer
+
+    async def generate_health_advice(
         self,
         character_state: dict,
-        recent_logs: dict,
-        user_query: str = None
+        log_summary: dict,
+        user_query: str = None,
+        user_id: int = None,
+        priority: str = PriorityScheduler.STANDARD
     ) -> str:
         """
         Generate personalized health advice based on character state and recent activity
 
+        With LLM_CACHE_ENABLED, metrics and totals are bucketed before building
+        the prompt and the response is cached on that prompt. Answers to a
+        user_query are cached only for that user_id.
+
         Args:
             character_state: Dict with stamina, energy, nutrition, mood, stress
-            recent_logs: Dict with recent diet, exercise, and sleep logs
+            log_summary: Recent activity counts and totals (see AssistantContext)
             user_query: Optional specific question from user
+            user_id: Owner of user_query; required to cache answers to it
+            priority: Scheduler priority class (BACKGROUND for batch generation)
 
         Returns:
             AI-generated health advice
         """
+        await self.ensure_models()
         if not self.model:
             return "Gemini AI is not configured. Please add GEMINI_API_KEY to your environment."
 
+        use_cache = settings.LLM_CACHE_ENABLED and (not user_query or user_id is not None)
+        if use_cache:
+            character_state = quantize_state(character_state)
+            log_summary = quantize_log_summary(log_summary)
+
         # Build context prompt
-        prompt = self._build_health_prompt(character_state, recent_logs, user_query)
+        prompt = self._build_health_prompt(character_state, log_summary, user_query)
+
+        cache_key = None
+        if use_cache:
+            scope = user_scope(user_id) if user_query else SHARED_SCOPE
+            cache_key = llm_cache.make_key("advice", prompt, scope)
+            cached = await llm_cache.get("advice", cache_key)
+            if cached is not None:
+                return cached
 
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            start = time.monotonic()
+            route, model = self._route("advice", prompt)
+            response = await self._generate("advice", model, prompt, priority, user_id, route)
+            advice = response.text
+        except LimiterTimeout:
+            raise
         except Exception as e:
-            return f"Error generating advice: {str(e)}"
+            return f"{ADVICE_ERROR_PREFIX} {str(e)}"
+
+        if cache_key:
+            await llm_cache.set("advice", cache_key, advice, time.monotonic() - start)
+        return advice
 
     def _build_health_prompt(
         self,
         character_state: dict,
-        recent_logs: dict,
+        log_summary: dict,
         user_query: str = None
     ) -> str:
         """Build a structured prompt for health advice"""
@@ -185,7 +420,7 @@ Current Health Metrics:
 - Stress: {character_state.get('stress', 0)}/100
 
 Recent Activity Summary:
-{self._format_recent_logs(recent_logs)}
+{self._format_log_summary(log_summary)}
 
 Provide personalized, actionable advice based on this data. Focus on:
 1. Identifying patterns and potential issues
@@ -200,46 +435,28 @@ Provide personalized, actionable advice based on this data. Focus on:
         prompt += "\nProvide your advice in a friendly, conversational tone (2-3 paragraphs):"
         return prompt
 
-    def _format_recent_logs(self, logs: dict) -> str:
-        """Format recent logs into readable text"""
+    def _format_log_summary(self, summary: dict) -> str:
+        """Format a recent activity summary into readable text"""
         formatted = []
 
-        if 'diet' in logs and logs['diet']:
-            total_calories = sum(log.get('calories', 0) for log in logs['diet'])
-            formatted.append(f"- Diet: {len(logs['diet'])} meals logged, ~{int(total_calories)} calories")
+        if summary["meals"]:
+            formatted.append(f"- Diet: {summary['meals']} meals logged, ~{int(summary['calories'])} calories")
 
-        if 'exercise' in logs and logs['exercise']:
-            total_minutes = sum(log.get('duration_minutes', 0) for log in logs['exercise'])
-            formatted.append(f"- Exercise: {len(logs['exercise'])} activities, {int(total_minutes)} minutes total")
+        if summary["exercises"]:
+            formatted.append(f"- Exercise: {summary['exercises']} activities, {int(summary['exercise_minutes'])} minutes total")
 
-        if 'sleep' in logs and logs['sleep']:
-            avg_sleep = sum(log.get('duration_hours', 0) for log in logs['sleep']) / len(logs['sleep'])
-            formatted.append(f"- Sleep: {len(logs['sleep'])} nights logged, avg {avg_sleep:.1f} hours")
+        if summary["sleep_nights"]:
+            formatted.append(f"- Sleep: {summary['sleep_nights']} nights logged, avg {summary['avg_sleep_hours']:.1f} hours")
 
         return "\n".join(formatted) if formatted else "No recent activity logged"
 
-    def pearl_chat(
+    def _build_pearl_message(
         self,
         user_message: str,
         character_state: dict = None,
-        recent_logs: dict = None,
-        conversation_history: list = None
+        log_summary: dict = None
     ) -> str:
-        """
-        Chat with Pearl AI assistant with personality
-
-        Args:
-            user_message: User's message to Pearl
-            character_state: Optional current character health metrics
-            recent_logs: Optional recent activity logs
-            conversation_history: Optional list of previous messages for context
-
-        Returns:
-            Pearl's response
-        """
-        if not self.pearl_model:
-            return "Hey, I'm not configured right now. Ask the dev to add GEMINI_API_KEY!"
-
+        """Prefix the user's message with their current stats and recent activity"""
         # Build context with health data if available
         context = ""
         if character_state:
@@ -257,39 +474,231 @@ Provide personalized, actionable advice based on this data. Focus on:
             context += f"Stress: {stress:.1f}/100 {'(HIGH! needs attention)' if stress >= 60 else '(low, good!)' if stress < 30 else ''}\n"
             context += "=== When user asks about their stats, mood, stress, etc. - USE THESE VALUES! ===\n"
 
-        if recent_logs:
-            context += f"\n[Recent activity:\n{self._format_recent_logs(recent_logs)}]\n"
+        if log_summary:
+            context += f"\n[Recent activity:\n{self._format_log_summary(log_summary)}]\n"
 
         # Build full prompt with context
-        full_message = context + "\nUser: " + user_message if context else user_message
+        return context + "\nUser: " + user_message if context else user_message
+
+    async def pearl_chat(
+        self,
+        user_message: str,
+        character_state: dict = None,
+        log_summary: dict = None,
+        conversation_history: list = None,
+        user_id: int = None
+    ) -> str:
+        """
+        Chat with Pearl AI assistant with personality
+
+        General questions about how the metrics work are answered from the
+        semantic answer cache when a similar question was answered before.
+
+        Args:
+            user_message: User's message to Pearl
+            character_state: Optional current character health metrics
+            log_summary: Optional recent activity counts and totals
+            conversation_history: Optional list of previous messages for context
+            user_id: Caller, for fair scheduling across users
+
+        Returns:
+            Pearl's response
+        """
+        await self.ensure_models()
+        if not self.pearl_model:
+            return "Hey, I'm not configured right now. Ask the dev to add GEMINI_API_KEY!"
+
+        general, cached = self._cached_answer(user_message)
+        if cached is not None:
+            return cached
+        if general:
+            character_state = log_summary = conversation_history = None
+
+        full_message = self._build_pearl_message(user_message, character_state, log_summary)
+        # Only an answer to the bare question (no stats, activity or history) may be shared
+        shareable = general and full_message == user_message and not conversation_history
+        route = self.router.choose("pearl_chat", _pearl_prompt_tokens(conversation_history, full_message))
+
+        error = None
+        for source, model in await self._pearl_models(route):
+            try:
+                start = time.monotonic()
+                # Start chat with history if provided
+                if conversation_history:
+                    response = await self._send_chat(
+                        "pearl_chat", model, conversation_history, full_message, user_id, route
+                    )
+                else:
+                    response = await self._generate(
+                        "pearl_chat", model, full_message, PriorityScheduler.INTERACTIVE, user_id, route
+                    )
+
+                _record_pearl_usage(response, source, time.monotonic() - start)
+                if shareable and response.text:
+                    self.answer_cache.set(user_message, response.text)
+                return response.text
+            except LimiterTimeout:
+                raise
+            except Exception as e:
+                error = e
+                # Retry inline only if the cache entry itself is gone; other errors would fail again
+                if source != "cached" or not self.pearl_context.invalidate(e):
+                    break
+
+        return f"{PEARL_ERROR_REPLY} Error: {str(error)}"
+
+    async def pearl_chat_stream(
+        self,
+        user_message: str,
+        character_state: dict = None,
+        log_summary: dict = None,
+        conversation_history: list = None,
+        user_id: int = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream Pearl's reply as text chunks while Gemini generates it
+
+        Closing the generator early (e.g. the client disconnected) cancels the
+        upstream stream so no more tokens are generated.
 
+        Yields:
+            Text chunks of Pearl's response
+        """
+        await self.ensure_models()
+        if not self.pearl_model:
+            yield "Hey, I'm not configured right now. Ask the dev to add GEMINI_API_KEY!"
+            return
+
+        general, cached = self._cached_answer(user_message)
+        if cached is not None:
+            yield cached
+            return
+        if general:
+            character_state = log_summary = conversation_history = None
+
+        full_message = self._build_pearl_message(user_message, character_state, log_summary)
+        # Only an answer to the bare question (no stats, activity or history) may be shared
+        shareable = general and full_message == user_message and not conversation_history
+        route = self.router.choose("pearl_stream", _pearl_prompt_tokens(conversation_history, full_message))
+
+        start = time.monotonic()
+        result = "cancelled"  # Until the stream completes or fails
+        chunk = None
+        attempt_start = first_chunk_at = None
+        # Not made current: the generator may be resumed from another context
+        span = tracing.start_span("gemini pearl_stream", tracing.CLIENT, **{
+            "gen_ai.system": "gemini", "gen_ai.operation.name": "pearl_stream", "gemini.route": route,
+            "gemini.priority": PriorityScheduler.INTERACTIVE,
+        })
         try:
-            # Start chat with history if provided
-            if conversation_history:
-                chat = self.pearl_model.start_chat(history=conversation_history)
-                response = chat.send_message(full_message)
-            else:
-                response = self.pearl_model.generate_content(full_message)
-
-            return response.text
+            async with self.scheduler.slot(PriorityScheduler.INTERACTIVE, user_id):
+                _trace_queued(span, time.monotonic() - start)
+                models = await self._pearl_models(route)
+                for attempt, (source, model) in enumerate(models):
+                    attempt_start = time.monotonic()
+                    try:
+                        if conversation_history:
+                            chat = model.start_chat(history=conversation_history)
+                            response = await chat.send_message_async(full_message, stream=True)
+                        else:
+                            response = await model.generate_content_async(full_message, stream=True)
+                        break
+                    except Exception as e:
+                        # Retry inline only if the cache entry itself is gone; other errors would fail again
+                        if source != "cached" or attempt == len(models) - 1 or not self.pearl_context.invalidate(e):
+                            raise
+
+                reply = []
+                stream = aiter(response)
+                try:
+                    async for chunk in stream:
+                        if first_chunk_at is None:
+                            # Streams are routed on time to first chunk
+                            first_chunk_at = time.monotonic()
+                            self.router.observe(route, "pearl_stream", first_chunk_at - attempt_start)
+                            if span is not None:
+                                span.set_attribute("gemini.first_chunk_seconds", round(first_chunk_at - start, 4))
+                        if chunk.text:
+                            reply.append(chunk.text)
+                            yield chunk.text
+                    # Usage is reported on the final chunk
+                    _record_pearl_usage(chunk, source, time.monotonic() - attempt_start)
+                    result = "ok"
+                    if shareable and reply:
+                        # Only complete, non-empty replies (not blocked or empty streams) are shared
+                        self.answer_cache.set(user_message, "".join(reply))
+                finally:
+                    # Stops pulling chunks early; grpc.aio cancels the call once the response is released
+                    await stream.aclose()
+        except LimiterTimeout:
+            result = "shed"
+            raise
         except Exception as e:
-            return f"Oof, something broke on my end. Error: {str(e)}"
+            result = type(e).__name__
+            if attempt_start is not None and first_chunk_at is None:
+                self.router.observe_failure(route, "pearl_stream", e)
+            if span is not None:
+                span.record_error(e)
+            raise
+        finally:
+            usage_accounting.record(
+                "pearl_stream", chunk if result == "ok" else None, time.monotonic() - start, user_id, result
+            )
+            if span is not None:
+                span.set_attribute("gemini.result", result)
+                _trace_usage(span, chunk if result == "ok" else None)
+                span.end()
 
-    def generate_workplace_scenario(self, character_state: dict) -> dict:
+    async def summarize_conversation(
+        self,
+        previous_summary: str,
+        messages: list,
+        max_tokens: int
+    ) -> str:
         """
-        Generate a workplace scenario based on character's health state
+        Fold older Pearl chat turns into a rolling summary
+
+        Falls back to a truncated transcript if Gemini is unavailable.
+
+        Args:
+            previous_summary: Summary of turns compacted earlier ("" if none)
+            messages: (role, content) tuples, oldest first
+            max_tokens: Approximate size limit for the summary
 
         Returns:
-            Dict with event_type, description, and possible outcomes
+            Updated summary text
         """
-        if not self.model:
-            return {
-                "event_type": "generic",
-                "description": "Gemini AI not configured",
-                "outcomes": []
-            }
+        await self.ensure_models()
+        transcript = "\n".join(
+            f"{'User' if role == 'user' else 'Pearl'}: {content}" for role, content in messages
+        )
+        max_chars = max_tokens * 4
+
+        if self.model:
+            prompt = f"""Summarize this conversation between a user and Pearl, their health companion.
+Keep facts Pearl should remember: the user's goals, foods and habits they mentioned, advice already given.
+Write at most {max_tokens // 2} words in plain sentences.
+
+Earlier summary:
+{previous_summary or "(none)"}
+
+New messages:
+{transcript}
+"""
+            try:
+                route, model = self._route("summarize", prompt)
+                response = await self._generate("summarize", model, prompt, PriorityScheduler.BACKGROUND, route=route)
+                return response.text.strip()[:max_chars]
+            except Exception:
+                pass
+
+        # Keep the most recent part of the transcript
+        combined = f"{previous_summary}\n{transcript}".strip()
+        return combined[-max_chars:]
 
-        prompt = f"""Based on these health metrics, generate a realistic workplace scenario:
+    def _build_workplace_prompt(self, character_state: dict) -> str:
+        """Build the prompt for a workplace scenario"""
+        return f"""Based on these health metrics, generate a realistic workplace scenario:
 
 Stamina: {character_state.get('stamina', 0)}/100
 Energy: {character_state.get('energy', 0)}/100
@@ -307,14 +716,58 @@ Description: [2-3 sentences describing the scenario]
 Likely Outcome: [success/struggle/mixed based on stats]
 """
 
+    async def generate_workplace_scenario(
+        self,
+        character_state: dict,
+        use_cache: bool = True,
+        user_id: int = None,
+        priority: str = PriorityScheduler.STANDARD
+    ) -> dict:
+        """
+        Generate a workplace scenario based on character's health state
+
+        Args:
+            character_state: Dict with stamina, energy, mood, stress
+            use_cache: False to always generate a fresh scenario (e.g. to fill the scenario pool)
+            user_id: Caller, for fair scheduling across users
+            priority: Scheduler priority class (BACKGROUND for pre-generation)
+
+        Returns:
+            Dict with event_type, description, and possible outcomes
+        """
+        await self.ensure_models()
+        if not self.model:
+            return {
+                "event_type": "generic",
+                "description": "Gemini AI not configured",
+                "outcomes": []
+            }
+
+        use_cache = use_cache and settings.LLM_CACHE_ENABLED
+        if use_cache:
+            character_state = quantize_state(character_state)
+
+        prompt = self._build_workplace_prompt(character_state)
+
+        cache_key = None
+        if use_cache:
+            cache_key = llm_cache.make_key("workplace_scenario", prompt)
+            cached = await llm_cache.get("workplace_scenario", cache_key)
+            if cached is not None:
+                return cached
+
         try:
-            response = self.model.generate_content(prompt)
+            start = time.monotonic()
+            route, model = self._route("workplace_scenario", prompt)
+            response = await self._generate("workplace_scenario", model, prompt, priority, user_id, route)
             # Parse response (simplified - in production, use structured output)
-            return {
+            scenario = {
                 "event_type": "workplace_event",
                 "description": response.text,
                 "outcome": "mixed"
             }
+        except LimiterTimeout:
+            raise
         except Exception as e:
             return {
                 "event_type": "error",
@@ -322,6 +775,58 @@ Likely Outcome: [success/struggle/mixed based on stats]
                 "outcome": "neutral"
             }
 
+        if cache_key:
+            await llm_cache.set("workplace_scenario", cache_key, scenario, time.monotonic() - start)
+        return scenario
+
+
+def _estimate_tokens(contents) -> int:
+    """Rough token count (~4 characters each), for routing before the call"""
+    return len(str(contents)) // 4
+
+
+def _pearl_prompt_tokens(history: list, message: str) -> int:
+    return _estimate_tokens(PEARL_SYSTEM_INSTRUCTION) + _estimate_tokens(history or "") + _estimate_tokens(message)
+
+
+def _trace_call(operation: str, model, route: str, priority: str):
+    """Child span for one Gemini call (None when the request is not traced)"""
+    return tracing.span(f"gemini {operation}", tracing.CLIENT, **{
+        "gen_ai.system": "gemini",
+        "gen_ai.operation.name": operation,
+        "gen_ai.request.model": getattr(model, "model_name", None) or settings.GEMINI_MODEL,
+        "gemini.route": route,
+        "gemini.priority": priority,
+    })
+
+
+def _trace_queued(span, seconds: float) -> None:
+    if span is not None:
+        span.set_attribute("gemini.queue_seconds", round(seconds, 4))
+
+
+def _trace_usage(span, response) -> None:
+    if span is not None and response is not None:
+        prompt, cached, output = token_counts(response)
+        span.set_attribute("gen_ai.usage.input_tokens", prompt)
+        span.set_attribute("gen_ai.usage.cached_input_tokens", cached)
+        span.set_attribute("gen_ai.usage.output_tokens", output)
+
+
+def _record_failure(operation: str, error: Exception, seconds: float, user_id: int = None) -> None:
+    result = "shed" if isinstance(error, LimiterTimeout) else type(error).__name__
+    usage_accounting.record(operation, None, seconds, user_id, result)
+
+
+def _record_pearl_usage(response, source: str, seconds: float) -> None:
+    """Record input tokens and latency of a Pearl request"""
+    pearl_request_seconds.observe(seconds, instruction=source)
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    pearl_input_tokens.observe(usage.prompt_token_count or 0, instruction=source)
+    pearl_cached_input_tokens.inc(getattr(usage, "cached_content_token_count", 0) or 0)
+
 
 # Singleton instance
 gemini_service = GeminiService()
\ No newline at end of file
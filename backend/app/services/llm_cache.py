@@ -0,0 +1,141 @@
+"""
+LLM response cache
+Caches Gemini responses for prompts built from bucketed health metrics, so
+users in functionally identical states share one generation.
+
+Two tiers: an in-process TTL cache and the llm_cache_entries table.
+Responses to a user's free-text question are scoped to that user and are
+never served to anyone else.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import registry
+from app.models import LLMCacheEntry
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+cache_requests = registry.counter(
+    "llm_cache_requests_total", "LLM cache lookups by kind and result (memory, db, miss)"
+)
+latency_saved = registry.counter(
+    "llm_cache_latency_saved_seconds_total", "Estimated LLM latency avoided by cache hits"
+)
+
+SHARED_SCOPE = "shared"
+
+
+def quantize(value: float, band: int = None) -> int:
+    """Round a 0-100 metric to the nearest band (e.g. 73.4 -> 75 for 5-point bands)"""
+    band = band or settings.LLM_CACHE_BAND
+    return int(band * round(float(value or 0) / band))
+
+
+def quantize_state(character_state: dict) -> dict:
+    """Bucket every metric in a character state dict"""
+    return {name: quantize(value) for name, value in character_state.items()}
+
+
+def quantize_log_summary(summary: dict) -> dict:
+    """Bucket activity totals coarsely enough that similar weeks share a prompt"""
+    return {
+        "meals": 3 * round(summary["meals"] / 3) if summary["meals"] else 0,
+        "calories": 500 * round(summary["calories"] / 500),
+        "exercises": summary["exercises"],
+        "exercise_minutes": 30 * round(summary["exercise_minutes"] / 30),
+        "sleep_nights": summary["sleep_nights"],
+        "avg_sleep_hours": round(summary["avg_sleep_hours"] * 2) / 2,
+    }
+
+
+def user_scope(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class LLMResponseCache:
+    """Two-tier cache keyed on (kind, scope, canonical prompt)"""
+
+    def __init__(self):
+        self.memory = TTLCache(maxsize=settings.LLM_CACHE_MEMORY_SIZE, ttl=settings.LLM_CACHE_TTL_SECONDS)
+        self._miss_latency: dict[str, float] = {}  # EWMA of generation latency per kind
+        self._writes = 0
+
+    @staticmethod
+    def make_key(kind: str, prompt: str, scope: str = SHARED_SCOPE) -> str:
+        canonical = json.dumps({"kind": kind, "scope": scope, "prompt": prompt}, sort_keys=True)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def get(self, kind: str, key: str) -> Optional[Any]:
+        """Look up memory, then the database; None on miss"""
+        value = self.memory.get(key)
+        if value is not None:
+            self._record_hit(kind, "memory")
+            return value
+
+        try:
+            value = await asyncio.to_thread(self._db_get, key)
+        except Exception as e:
+            logger.warning("LLM cache read failed: %s", e)
+            value = None
+
+        if value is None:
+            cache_requests.inc(kind=kind, result="miss")
+            return None
+
+        self.memory.set(key, value)
+        self._record_hit(kind, "db")
+        return value
+
+    async def set(self, kind: str, key: str, value: Any, generation_seconds: float) -> None:
+        """Store a fresh response in both tiers"""
+        previous = self._miss_latency.get(kind)
+        self._miss_latency[kind] = generation_seconds if previous is None else 0.8 * previous + 0.2 * generation_seconds
+
+        self.memory.set(key, value)
+        try:
+            await asyncio.to_thread(self._db_set, kind, key, value)
+        except Exception as e:
+            logger.warning("LLM cache write failed: %s", e)
+
+    def _record_hit(self, kind: str, tier: str) -> None:
+        cache_requests.inc(kind=kind, result=tier)
+        latency_saved.inc(self._miss_latency.get(kind, 0.0), kind=kind)
+
+    def _db_get(self, key: str) -> Optional[Any]:
+        db = SessionLocal()
+        try:
+            entry = db.query(LLMCacheEntry).filter(
+                LLMCacheEntry.key == key,
+                LLMCacheEntry.expires_at > datetime.utcnow()
+            ).first()
+            return json.loads(entry.response) if entry else None
+        finally:
+            db.close()
+
+    def _db_set(self, kind: str, key: str, value: Any) -> None:
+        db = SessionLocal()
+        try:
+            self._writes += 1
+            if self._writes % 100 == 0:
+                db.query(LLMCacheEntry).filter(LLMCacheEntry.expires_at <= datetime.utcnow()).delete()
+            db.merge(LLMCacheEntry(
+                key=key,
+                kind=kind,
+                response=json.dumps(value),
+                created_at=datetime.utcnow(),
+                expires_at=datetime.utcnow() + timedelta(seconds=settings.LLM_CACHE_TTL_SECONDS)
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+
+# Singleton instance
+llm_cache = LLMResponseCache()
@@ -0,0 +1,196 @@
+"""
+Gemini usage accounting
+Tokens, latency, errors and estimated cost of every GeminiService call, by
+operation (advice, pearl_chat, ...). Totals are exported on /metrics and
+per-user daily totals are kept in llm_usage_daily.
+
+Per-user usage is accumulated in memory and written in batches every
+LLM_USAGE_FLUSH_SECONDS, so accounting adds no database writes to requests.
+"""
+import asyncio
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, add_to_row
+from app.metrics import registry
+from app.models import LLMUsageDaily
+
+logger = logging.getLogger(__name__)
+
+gemini_requests = registry.counter(
+    "gemini_requests_total", "Gemini calls by operation and result (ok, shed, or the error type)"
+)
+gemini_seconds = registry.histogram(
+    "gemini_request_seconds", "Gemini call latency by operation (including queueing)",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0)
+)
+gemini_prompt_tokens = registry.histogram(
+    "gemini_prompt_tokens", "Prompt tokens per Gemini call by operation (including cached tokens)",
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000, 32000)
+)
+gemini_tokens = registry.counter(
+    "gemini_tokens_total", "Gemini tokens by operation and kind (prompt, cached, response)"
+)
+gemini_cost = registry.counter("gemini_cost_usd_total", "Estimated Gemini cost in USD by operation")
+gemini_over_budget = registry.counter(
+    "gemini_over_budget_total", "Gemini calls over the latency or prompt token budget by operation and budget"
+)
+
+# Order of the per-user counters in UsageAccounting._pending
+_FIELDS = ("requests", "errors", "prompt_tokens", "cached_tokens", "response_tokens", "cost_usd", "latency_seconds")
+
+UsageKey = Tuple[int, date, str]  # user_id, day, operation
+
+
+def token_counts(response) -> Tuple[int, int, int]:
+    """(prompt, cached, response) tokens from a response's usage metadata; zeros if absent"""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return 0, 0, 0
+    prompt = getattr(usage, "prompt_token_count", 0) or 0
+    cached = getattr(usage, "cached_content_token_count", 0) or 0
+    output = (getattr(usage, "candidates_token_count", 0) or 0) + (getattr(usage, "thoughts_token_count", 0) or 0)
+    return prompt, cached, output
+
+
+def estimate_cost(prompt: int, cached: int, output: int) -> float:
+    """USD at the configured per-million-token prices"""
+    return (
+        (prompt - cached) * settings.GEMINI_INPUT_USD_PER_MTOK
+        + cached * settings.GEMINI_CACHED_INPUT_USD_PER_MTOK
+        + output * settings.GEMINI_OUTPUT_USD_PER_MTOK
+    ) / 1_000_000
+
+
+class UsageAccounting:
+    """Records Gemini calls on /metrics and accumulates per-user daily totals"""
+
+    def __init__(self):
+        self._pending: Dict[UsageKey, list] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        operation: str,
+        response=None,
+        seconds: float = 0.0,
+        user_id: Optional[int] = None,
+        result: str = "ok"
+    ) -> None:
+        """
+        Account for one Gemini call
+
+        Args:
+            operation: What the call was for (advice, pearl_chat, ...)
+            response: Response (or final stream chunk) carrying usage_metadata; None on error
+            seconds: Wall time of the call
+            user_id: Caller, for per-user totals (None for shared/background work)
+            result: "ok", "shed" or the error type
+        """
+        prompt, cached, output = token_counts(response)
+        cost = estimate_cost(prompt, cached, output)
+
+        gemini_requests.inc(operation=operation, result=result)
+        gemini_seconds.observe(seconds, operation=operation)
+        if response is not None:
+            gemini_prompt_tokens.observe(prompt, operation=operation)
+            gemini_tokens.inc(prompt, operation=operation, kind="prompt")
+            gemini_tokens.inc(cached, operation=operation, kind="cached")
+            gemini_tokens.inc(output, operation=operation, kind="response")
+            gemini_cost.inc(cost, operation=operation)
+
+        if seconds > settings.GEMINI_LATENCY_BUDGET_SECONDS:
+            gemini_over_budget.inc(operation=operation, budget="latency")
+            logger.warning("Gemini %s took %.1fs (%d prompt tokens, user %s)", operation, seconds, prompt, user_id)
+        if prompt > settings.GEMINI_PROMPT_TOKEN_BUDGET:
+            gemini_over_budget.inc(operation=operation, budget="prompt_tokens")
+            logger.warning("Gemini %s prompt was %d tokens (user %s)", operation, prompt, user_id)
+
+        if user_id is None:
+            return
+        values = (1, 0 if result == "ok" else 1, prompt, cached, output, cost, seconds)
+        key = (user_id, datetime.utcnow().date(), operation)
+        with self._lock:
+            totals = self._pending.setdefault(key, [0] * len(_FIELDS))
+            for i, value in enumerate(values):
+                totals[i] += value
+
+    def flush(self) -> int:
+        """Add pending per-user totals to llm_usage_daily; returns rows written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        db = SessionLocal()
+        written = []
+        try:
+            for key, values in pending.items():
+                self._add(db, *key, values)
+                written.append(key)
+            return len(written)
+        except Exception:
+            # Put back what wasn't written so the next flush retries it
+            with self._lock:
+                for key, values in pending.items():
+                    if key in written:
+                        continue
+                    totals = self._pending.setdefault(key, [0] * len(_FIELDS))
+                    for i, value in enumerate(values):
+                        totals[i] += value
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _add(db: Session, user_id: int, day: date, operation: str, values: list) -> None:
+        # One atomic upsert: concurrent flushes from other workers add to the same row
+        add_to_row(db, LLMUsageDaily, {"user_id": user_id, "day": day, "operation": operation},
+                   dict(zip(_FIELDS, values)))
+        db.commit()
+
+    async def run(self, interval: float) -> None:
+        """Flush every `interval` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logger.warning("Could not write Gemini usage: %s", e)
+
+    def daily_totals(self, db: Session, user_id: int, days: int = 7) -> list:
+        """
+        A user's usage per day and operation over the last `days` days, newest
+        first, including totals not yet written
+        """
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        totals: Dict[Tuple[date, str], list] = {}
+        rows = db.query(LLMUsageDaily).filter(
+            LLMUsageDaily.user_id == user_id,
+            LLMUsageDaily.day >= since
+        ).all()
+        for row in rows:
+            totals[(row.day, row.operation)] = [getattr(row, field) for field in _FIELDS]
+
+        with self._lock:
+            for (pending_user, day, operation), values in self._pending.items():
+                if pending_user != user_id or day < since:
+                    continue
+                current = totals.setdefault((day, operation), [0] * len(_FIELDS))
+                for i, value in enumerate(values):
+                    current[i] += value
+
+        return [
+            {"day": day.isoformat(), "operation": operation,
+             **dict(zip(_FIELDS, values)), "cost_usd": round(values[5], 6), "latency_seconds": round(values[6], 3)}
+            for (day, operation), values in sorted(totals.items(), key=lambda item: (-item[0][0].toordinal(), item[0][1]))
+        ]
+
+
+# Singleton instance
+usage_accounting = UsageAccounting()
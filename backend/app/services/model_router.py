@@ -0,0 +1,141 @@
+"""
+Latency-aware Gemini model routing
+Picks the model for each call: the primary model by default, the fast model
+for operations routed to it outright (e.g. summaries), for prompts too large
+to answer within the operation's latency SLO, and while the primary model's
+rolling p95 for that operation is over its SLO. While degraded, one call in
+`probe_every` still goes to the primary, and the primary is trusted again once
+its last `min_samples` probes are back within the SLO.
+"""
+from typing import Dict, Optional
+
+from app.metrics import registry
+from app.services.resilience import LatencyTracker
+
+PRIMARY = "primary"
+FAST = "fast"
+
+route_requests = registry.counter(
+    "gemini_route_requests_total", "Gemini calls by operation, route (primary, fast) and reason"
+)
+route_seconds = registry.histogram(
+    "gemini_route_seconds", "Upstream Gemini latency by operation and route (time to first chunk when streaming)",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0)
+)
+route_failures = registry.counter(
+    "gemini_route_failures_total", "Failed Gemini calls by operation, route and error type (not in the latency SLO)"
+)
+route_degraded = registry.gauge(
+    "gemini_route_degraded", "1 while an operation is routed to the fast model because the primary is over its SLO"
+)
+
+
+class ModelRouter:
+    """
+    Chooses PRIMARY or FAST per call and tracks upstream latency per route
+
+    Args:
+        slos: operation -> p95 latency SLO in seconds (operations without one never fall back)
+        fast_operations: operations always served by the fast model
+        large_prompt_tokens: prompts above this go to the fast model on SLO'd operations
+        fast_available: False when no fast model is configured (everything goes to PRIMARY)
+        percentile: Rolling percentile compared against the SLO
+        probe_every: While degraded, send every Nth call to the primary anyway
+    """
+
+    def __init__(
+        self,
+        slos: Dict[str, float],
+        fast_operations: tuple = (),
+        large_prompt_tokens: Optional[int] = None,
+        fast_available: bool = True,
+        percentile: float = 95,
+        probe_every: int = 5,
+        window: int = 50,
+        min_samples: int = 10
+    ):
+        self.slos = dict(slos)
+        self.fast_operations = frozenset(fast_operations)
+        self.large_prompt_tokens = large_prompt_tokens
+        self.fast_available = fast_available
+        self.percentile = percentile
+        self.probe_every = probe_every
+        self._window = window
+        self._min_samples = min_samples
+        self._trackers: Dict[tuple, LatencyTracker] = {}
+        self._degraded_calls: Dict[str, int] = {}
+        self._probes: Dict[str, LatencyTracker] = {}
+
+    def _tracker(self, route: str, operation: str) -> LatencyTracker:
+        key = (route, operation)
+        if key not in self._trackers:
+            self._trackers[key] = LatencyTracker(window=self._window, min_samples=self._min_samples)
+        return self._trackers[key]
+
+    def p95(self, operation: str, route: str = PRIMARY) -> Optional[float]:
+        """Rolling latency percentile of a route for an operation (None until enough samples)"""
+        return self._tracker(route, operation).percentile(self.percentile)
+
+    def _pick(self, operation: str, prompt_tokens: int) -> tuple:
+        if not self.fast_available:
+            return PRIMARY, "default"
+        if operation in self.fast_operations:
+            return FAST, "operation"
+
+        slo = self.slos.get(operation)
+        if slo is None:
+            return PRIMARY, "default"
+        if self.large_prompt_tokens and prompt_tokens > self.large_prompt_tokens:
+            return FAST, "prompt_size"
+
+        if operation not in self._degraded_calls:
+            p95 = self.p95(operation)
+            if p95 is None or p95 <= slo:
+                return PRIMARY, "default"
+            # Judge recovery on recent probe calls only, not on the samples that tripped the SLO
+            self._degraded_calls[operation] = 0
+            self._probes[operation] = LatencyTracker(window=self._min_samples, min_samples=self._min_samples)
+            route_degraded.set(1, operation=operation)
+        else:
+            p95 = self._probes[operation].percentile(self.percentile)
+            if p95 is not None and p95 <= slo:
+                del self._degraded_calls[operation]
+                del self._probes[operation]
+                self._tracker(PRIMARY, operation).samples.clear()
+                route_degraded.set(0, operation=operation)
+                return PRIMARY, "default"
+
+        self._degraded_calls[operation] += 1
+        if self._degraded_calls[operation] % self.probe_every == 0:
+            return PRIMARY, "probe"
+        return FAST, "slo"
+
+    def choose(self, operation: str, prompt_tokens: int = 0) -> str:
+        """Route for one call; recorded on /metrics with the reason it was chosen"""
+        route, reason = self._pick(operation, prompt_tokens)
+        route_requests.inc(operation=operation, route=route, reason=reason)
+        return route
+
+    def observe(self, route: str, operation: str, seconds: float) -> None:
+        """Record the upstream latency of a successful call made on `route`"""
+        self._tracker(route, operation).record(seconds)
+        if route == PRIMARY and operation in self._probes:
+            self._probes[operation].record(seconds)
+        route_seconds.observe(seconds, route=route, operation=operation)
+
+    def observe_failure(self, route: str, operation: str, error: Exception) -> None:
+        """
+        Count a failed call made on `route`
+
+        Kept out of the latency window: a fast-failing call would otherwise
+        pull the p95 down and a timed-out one push it up.
+        """
+        route_failures.inc(route=route, operation=operation, error=type(error).__name__)
+
+    def status(self) -> dict:
+        """Rolling p95 per operation and route, and which operations are degraded"""
+        return {
+            "p95": {f"{operation}/{route}": tracker.percentile(self.percentile)
+                    for (route, operation), tracker in sorted(self._trackers.items())},
+            "degraded": sorted(self._degraded_calls),
+        }
@@ -0,0 +1,196 @@
+"""
+USDA nutrient lookup table
+Maps FoodData Central nutrient IDs to the fixed set of fields Oystraz tracks
+"""
+import csv
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+
+
+# Bundled copy of the FDC nutrient table (repo root: data/raw/nutrient.csv)
+DEFAULT_NUTRIENT_TABLE = Path(__file__).resolve().parents[3] / "data" / "raw" / "nutrient.csv"
+
+# Fields extracted from every food, in slot order.
+# Each field lists candidate nutrient IDs from most to least preferred:
+# - 1008 is "Energy" in kcal; Foundation foods only report the Atwater
+#   variants (2047 general, 2048 specific), so those are fallbacks.
+#   1062 ("Energy" in kJ) is intentionally absent.
+NUTRIENT_FIELDS: Tuple[Tuple[str, Tuple[int, ...]], ...] = (
+    # Macros
+    ("calories", (1008, 2047, 2048)),
+    ("protein", (1003,)),
+    ("carbs", (1005, 1050, 2039)),
+    ("fat", (1004,)),
+    ("fiber", (1079,)),
+    # Micronutrients
+    ("sugar", (2000,)),
+    ("saturated_fat", (1258,)),
+    ("cholesterol", (1253,)),
+    ("sodium", (1093,)),
+    ("potassium", (1092,)),
+    ("calcium", (1087,)),
+    ("iron", (1089,)),
+    ("vitamin_c", (1162,)),
+    ("vitamin_d", (1114,)),
+)
+
+FIELD_NAMES: Tuple[str, ...] = tuple(name for name, _ in NUTRIENT_FIELDS)
+MACRO_FIELDS: Tuple[str, ...] = ("calories", "protein", "carbs", "fat", "fiber")
+CALORIES_SLOT = FIELD_NAMES.index("calories")
+# Calorie nutrient ID -> priority, for the search-result fast path
+_CALORIE_PRIORITY: Dict[int, int] = {nutrient_id: priority for priority, nutrient_id
+                                     in enumerate(NUTRIENT_FIELDS[CALORIES_SLOT][1])}
+_NO_PRIORITY = 1 << 8
+
+# Legacy SR nutrient numbers for the IDs above, used when the bundled
+# table is not deployed (e.g. Railway only ships the backend directory)
+_FALLBACK_NUMBERS: Dict[int, str] = {
+    1008: "208", 2047: "957", 2048: "958", 1003: "203", 1005: "205",
+    1050: "205.2", 2039: "956", 1004: "204", 1079: "291", 2000: "269",
+    1258: "606", 1253: "601", 1093: "307", 1092: "306", 1087: "301",
+    1089: "303", 1162: "401", 1114: "328",
+}
+
+
+class NutrientTable:
+    """Lookup from FDC nutrient ID / nutrient number to (slot, priority)"""
+
+    def __init__(self, id_numbers: Dict[int, str]):
+        self.by_id: Dict[int, Tuple[int, int]] = {}
+        self.by_number: Dict[str, Tuple[int, int]] = {}
+
+        for slot, (_, nutrient_ids) in enumerate(NUTRIENT_FIELDS):
+            for priority, nutrient_id in enumerate(nutrient_ids):
+                self.by_id[nutrient_id] = (slot, priority)
+                number = id_numbers.get(nutrient_id)
+                if number:
+                    self.by_number[number] = (slot, priority)
+
+    def lookup(self, nutrient: dict) -> Optional[Tuple[int, int]]:
+        """
+        Resolve one foodNutrients entry to its slot
+
+        Handles all three FDC shapes:
+        - search results: {"nutrientId": 1008, "value": ...}
+        - full details: {"nutrient": {"id": 1008, ...}, "amount": ...}
+        - abridged: {"number": "208", "amount": ...}
+        """
+        nutrient_id = nutrient.get("nutrientId")
+        if nutrient_id is None:
+            inner = nutrient.get("nutrient")
+            if inner is not None:
+                nutrient_id = inner.get("id")
+        if nutrient_id is not None:
+            return self.by_id.get(nutrient_id)
+
+        number = nutrient.get("number") or nutrient.get("nutrientNumber")
+        if number is not None:
+            return self.by_number.get(str(number))
+        return None
+
+
+def _read_nutrient_numbers(path: Path) -> Dict[int, str]:
+    """Read id -> nutrient_nbr for the IDs we track from the FDC nutrient CSV"""
+    wanted = {nutrient_id for _, ids in NUTRIENT_FIELDS for nutrient_id in ids}
+    numbers: Dict[int, str] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            nutrient_id = int(row["id"])
+            if nutrient_id in wanted:
+                numbers[nutrient_id] = row["nutrient_nbr"]
+    return numbers
+
+
+@lru_cache(maxsize=1)
+def get_nutrient_table() -> NutrientTable:
+    """Load the nutrient table once per process"""
+    path = Path(settings.USDA_NUTRIENT_TABLE) if settings.USDA_NUTRIENT_TABLE else DEFAULT_NUTRIENT_TABLE
+    try:
+        numbers = _read_nutrient_numbers(path)
+    except (OSError, KeyError, ValueError):
+        numbers = {}
+    return NutrientTable({**_FALLBACK_NUMBERS, **numbers})
+
+
+def extract_nutrients(food_nutrients: List[dict]) -> List[Optional[float]]:
+    """
+    Extract tracked nutrients in a single pass over foodNutrients
+
+    Args:
+        food_nutrients: The "foodNutrients" list of any FDC response
+
+    Returns:
+        List of values indexed like FIELD_NAMES (None when not reported)
+    """
+    table = get_nutrient_table()
+    by_id = table.by_id
+    values: List[Optional[float]] = [None] * len(NUTRIENT_FIELDS)
+    best = [_NO_PRIORITY] * len(NUTRIENT_FIELDS)  # Lower priority wins
+
+    for nutrient in food_nutrients:
+        # Search results carry nutrientId directly; skip the general lookup
+        nutrient_id = nutrient.get("nutrientId")
+        hit = by_id.get(nutrient_id) if nutrient_id is not None else table.lookup(nutrient)
+        if hit is None:
+            continue
+        slot, priority = hit
+        if priority >= best[slot]:
+            continue
+        value = nutrient.get("value")
+        if value is None:
+            value = nutrient.get("amount")
+        if value is None:
+            continue
+        values[slot] = float(value)
+        best[slot] = priority
+
+    return values
+
+
+def extract_calories(food_nutrients: List[dict]) -> Optional[float]:
+    """
+    Extract kcal only, stopping at the first "Energy" (1008) entry
+
+    Used for search results, where calories are the only nutrient shown.
+    Search results carry nutrientId on every entry, so they take a direct
+    dict lookup; other shapes go through the general table lookup.
+    """
+    if not food_nutrients or "nutrientId" not in food_nutrients[0]:
+        return _extract_calories_any_shape(food_nutrients)
+
+    priority_of = _CALORIE_PRIORITY.get
+    calories: Optional[float] = None
+    best = _NO_PRIORITY
+    for nutrient in food_nutrients:
+        priority = priority_of(nutrient.get("nutrientId"))
+        if priority is None or priority >= best:
+            continue
+        value = nutrient.get("value")
+        if value is None:
+            continue
+        calories, best = float(value), priority
+        if best == 0:
+            break
+    return calories
+
+
+def _extract_calories_any_shape(food_nutrients: List[dict]) -> Optional[float]:
+    table = get_nutrient_table()
+    calories: Optional[float] = None
+    best = _NO_PRIORITY
+    for nutrient in food_nutrients:
+        hit = table.lookup(nutrient)
+        if hit is None or hit[0] != CALORIES_SLOT or hit[1] >= best:
+            continue
+        value = nutrient.get("value")
+        if value is None:
+            value = nutrient.get("amount")
+        if value is None:
+            continue
+        calories, best = float(value), hit[1]
+        if best == 0:
+            break
+    return calories
@@ -0,0 +1,350 @@
+"""
+Resilience helpers for upstream calls
+Circuit breaker, per-request deadlines, hedged requests and concurrency limits
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from app.metrics import registry
+
+T = TypeVar("T")
+
+# Absolute monotonic deadline of the request being served (None = no deadline)
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+breaker_state = registry.gauge(
+    "circuit_breaker_state", "Circuit breaker state (0=closed, 1=half_open, 2=open)"
+)
+breaker_transitions = registry.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state transitions"
+)
+breaker_rejections = registry.counter(
+    "circuit_breaker_rejections_total", "Calls rejected while the circuit was open"
+)
+hedged_requests = registry.counter(
+    "hedged_requests_total", "Hedge requests fired after the latency threshold"
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current request has no time left for an upstream call"""
+
+
+def set_deadline(seconds: float):
+    """Start a deadline for the current request. Returns a token for reset_deadline."""
+    return _request_deadline.set(time.monotonic() + seconds)
+
+
+def reset_deadline(token) -> None:
+    _request_deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None if unbounded"""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def timeout_within_deadline(default: float) -> float:
+    """Clamp an upstream timeout to the current request's remaining time"""
+    remaining = remaining_time()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, remaining)
+
+
+class CircuitBreaker:
+    """
+    Classic three-state circuit breaker
+
+    - closed: calls flow; consecutive failures are counted
+    - open: calls are rejected until reset_timeout has passed
+    - half_open: a single probe call decides whether to close or re-open
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        breaker_state.set(0, breaker=name)
+
+    def _transition(self, state: str) -> None:
+        if state == self.state:
+            return
+        self.state = state
+        breaker_state.set(self._STATE_VALUES[state], breaker=self.name)
+        breaker_transitions.inc(breaker=self.name, state=state)
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream right now"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                breaker_rejections.inc(breaker=self.name)
+                return False
+            self._transition(self.HALF_OPEN)
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                breaker_rejections.inc(breaker=self.name)
+                return False
+            self._probe_in_flight = True
+
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probe_in_flight = False
+        self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(self.OPEN)
+
+    def release(self) -> None:
+        """End a call that neither succeeded nor failed (e.g. our own deadline hit)"""
+        self._probe_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies for percentile lookups"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """pct-th percentile in seconds, or None until enough samples exist"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+async def hedged(factory: Callable[[], Awaitable[T]], delay: float, name: str = "") -> T:
+    """
+    Run factory(); if it hasn't finished after `delay` seconds, start a
+    second attempt and return whichever completes successfully first.
+    """
+    first = asyncio.ensure_future(factory())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    hedged_requests.inc(upstream=name)
+    second = asyncio.ensure_future(factory())
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+            if not pending:
+                # Both attempts failed; surface the original error
+                return first.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class LimiterTimeout(Exception):
+    """Raised when a call is shed because it would wait too long for a slot"""
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate: Optional[float], burst: int):
+        self.rate = rate
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        if self.rate is None:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def seconds_until_token(self) -> float:
+        if self.rate is None:
+            return 0.0
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class PriorityScheduler:
+    """
+    Admission control for an upstream API
+
+    - Priority classes are served strictly in order (interactive first).
+    - Within a class, waiting users are served round-robin, so one user's
+      burst of calls queues behind everyone else's next call.
+    - At most `max_concurrency` calls run at once, started no faster than
+      the token bucket allows.
+    - A call is shed with LimiterTimeout when its class's queue deadline
+      passes, or up front when the projected wait already exceeds it.
+
+    Usage:
+        async with scheduler.slot(PriorityScheduler.INTERACTIVE, user_id):
+            await call_upstream()
+    """
+
+    INTERACTIVE = "interactive"
+    STANDARD = "standard"
+    BACKGROUND = "background"
+    PRIORITIES = (INTERACTIVE, STANDARD, BACKGROUND)
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        queue_timeouts: Dict[str, float],
+        rate_per_second: Optional[float] = None,
+        burst: int = 1
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.queue_timeouts = queue_timeouts
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.in_flight = 0
+        # priority -> user key -> waiters (futures) in arrival order; dict order is the round-robin
+        self._queues: Dict[str, Dict[object, deque]] = {p: {} for p in self.PRIORITIES}
+        self._depth: Dict[str, int] = {p: 0 for p in self.PRIORITIES}
+        self._service_time = 1.0  # EWMA seconds a call holds its slot
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self._in_flight_gauge = registry.gauge("llm_scheduler_in_flight", "Calls holding a scheduler slot")
+        self._queue_depth = registry.gauge("llm_scheduler_queue_depth", "Calls waiting, by priority")
+        self._queue_wait = registry.histogram(
+            "llm_scheduler_queue_wait_seconds", "Time calls waited for a slot, by priority"
+        )
+        self._shed = registry.counter(
+            "llm_scheduler_shed_total", "Calls rejected by priority and reason (projected, timeout)"
+        )
+
+    def projected_wait(self, priority: str) -> float:
+        """Rough wait for a new call: everything queued at or above its priority, drained in parallel"""
+        rank = self.PRIORITIES.index(priority)
+        ahead = sum(self._depth[p] for p in self.PRIORITIES[:rank + 1])
+        if self.in_flight < self.max_concurrency and ahead == 0:
+            return 0.0
+        return (ahead + 1) * self._service_time / self.max_concurrency
+
+    @asynccontextmanager
+    async def slot(self, priority: str = STANDARD, user_id: Optional[int] = None):
+        timeout = self.queue_timeouts.get(priority, 10.0)
+        if self.projected_wait(priority) > timeout:
+            self._shed.inc(scheduler=self.name, priority=priority, reason="projected")
+            raise LimiterTimeout(f"{self.name} is overloaded, try again shortly")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(user_id, deque()).append(waiter)
+        self._set_depth(priority, 1)
+        queued_at = time.monotonic()
+        self._dispatch()
+
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                self._release()  # Granted just as the caller went away
+            else:
+                waiter.cancel()
+                self._remove(priority, user_id, waiter)
+            raise
+
+        if not waiter.done():
+            waiter.cancel()
+            self._remove(priority, user_id, waiter)
+            self._shed.inc(scheduler=self.name, priority=priority, reason="timeout")
+            raise LimiterTimeout(f"{self.name} is busy, try again shortly")
+
+        started = time.monotonic()
+        self._queue_wait.observe(started - queued_at, scheduler=self.name, priority=priority)
+        try:
+            yield
+        finally:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - started)
+            self._release()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._in_flight_gauge.set(self.in_flight, scheduler=self.name)
+        self._dispatch()
+
+    def _set_depth(self, priority: str, delta: int) -> None:
+        self._depth[priority] += delta
+        self._queue_depth.set(self._depth[priority], scheduler=self.name, priority=priority)
+
+    def _remove(self, priority: str, user_id, waiter: asyncio.Future) -> None:
+        waiters = self._queues[priority].get(user_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self._set_depth(priority, -1)
+            if not waiters:
+                del self._queues[priority][user_id]
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in self.PRIORITIES:
+            users = self._queues[priority]
+            if not users:
+                continue
+            user_id = next(iter(users))
+            waiters = users.pop(user_id)
+            waiter = waiters.popleft()
+            if waiters:
+                users[user_id] = waiters  # Back of the round-robin
+            self._set_depth(priority, -1)
+            return waiter
+        return None
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters, respecting the rate limit"""
+        while self.in_flight < self.max_concurrency and any(self._depth.values()):
+            if not self.bucket.try_take():
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(
+                        self.bucket.seconds_until_token(), self._on_timer
+                    )
+                return
+            waiter = self._next_waiter()
+            self.in_flight += 1
+            self._in_flight_gauge.set(self.in_flight, scheduler=self.name)
+            waiter.set_result(None)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
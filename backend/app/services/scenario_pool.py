@@ -0,0 +1,182 @@
+"""
+Pre-generated workplace scenario pool
+Keeps a few scenarios ready per state bucket (low/mid/high stamina, energy,
+mood, stress) so POST /api/assistant/workplace-scenario doesn't wait on
+Gemini. Served scenarios are replaced in the background.
+"""
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.metrics import registry
+from app.models import Character, WorkplaceEvent
+from app.services.resilience import PriorityScheduler
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("stamina", "energy", "mood", "stress")
+LEVELS = ("low", "mid", "high")
+# Value each level is generated for
+LEVEL_VALUES = {"low": 25, "mid": 55, "high": 85}
+
+Bucket = Tuple[str, str, str, str]
+
+pool_requests = registry.counter(
+    "workplace_pool_requests_total", "Workplace scenario requests by result (hit, miss)"
+)
+pool_size = registry.gauge("workplace_pool_scenarios", "Scenarios ready in the pool")
+pool_generated = registry.counter(
+    "workplace_pool_generated_total", "Scenarios generated for the pool by result (ok, error)"
+)
+
+
+def level(value: float) -> str:
+    """low (<40), mid (40-69) or high (70+)"""
+    value = float(value or 0)
+    if value < 40:
+        return "low"
+    if value < 70:
+        return "mid"
+    return "high"
+
+
+def state_bucket(character_state: dict) -> Bucket:
+    return tuple(level(character_state.get(metric, 0)) for metric in METRICS)
+
+
+def bucket_state(bucket: Bucket) -> dict:
+    """Representative character state for a bucket"""
+    return {metric: LEVEL_VALUES[lvl] for metric, lvl in zip(METRICS, bucket)}
+
+
+class ScenarioPool:
+    """
+    Per-bucket queues of ready scenarios plus a refill queue
+
+    take() is O(1) and never waits on Gemini; run() is the background worker
+    that keeps every requested bucket topped up to `target` scenarios.
+    """
+
+    def __init__(self, target: int = 3):
+        self.target = target
+        self.scenarios: Dict[Bucket, Deque[dict]] = {}
+        self._pending: Dict[Bucket, int] = {}  # Refills queued or in progress
+        self._refills: Optional[asyncio.Queue] = None
+
+    def size(self) -> int:
+        return sum(len(ready) for ready in self.scenarios.values())
+
+    def take(self, bucket: Bucket) -> Optional[dict]:
+        """Pop a ready scenario for the bucket (None if empty) and schedule a refill"""
+        ready = self.scenarios.get(bucket)
+        scenario = ready.popleft() if ready else None
+        pool_requests.inc(result="hit" if scenario else "miss")
+        pool_size.set(self.size())
+        self.top_up(bucket)
+        return scenario
+
+    def top_up(self, bucket: Bucket) -> None:
+        """Queue enough refills to bring the bucket back to target"""
+        if self._refills is None:
+            return  # Worker not running
+        missing = self.target - len(self.scenarios.get(bucket, ())) - self._pending.get(bucket, 0)
+        for _ in range(max(0, missing)):
+            self._pending[bucket] = self._pending.get(bucket, 0) + 1
+            self._refills.put_nowait(bucket)
+
+    async def run(self, workers: int = 2, prefill: bool = True) -> None:
+        """Refill scenarios until cancelled"""
+        self._refills = asyncio.Queue()
+        if prefill:
+            for bucket in await asyncio.to_thread(active_buckets):
+                self.top_up(bucket)
+
+        tasks = [asyncio.create_task(self._worker()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._refills = None
+            self._pending.clear()
+
+    async def _worker(self) -> None:
+        from app.services.gemini import gemini_service
+
+        while True:
+            bucket = await self._refills.get()
+            try:
+                scenario = await gemini_service.generate_workplace_scenario(
+                    bucket_state(bucket), use_cache=False, priority=PriorityScheduler.BACKGROUND
+                )
+            except Exception as e:
+                scenario = {"event_type": "error", "description": str(e)}
+            finally:
+                self._pending[bucket] -= 1
+
+            if scenario.get("event_type") in ("error", "generic"):
+                pool_generated.inc(result="error")
+                # Back off; the next take() for this bucket queues it again
+                await asyncio.sleep(settings.WORKPLACE_POOL_RETRY_SECONDS)
+                continue
+
+            pool_generated.inc(result="ok")
+            self.scenarios.setdefault(bucket, deque()).append(scenario)
+            pool_size.set(self.size())
+
+
+def active_buckets() -> list:
+    """Buckets of existing characters, most common first"""
+    db = SessionLocal()
+    try:
+        rows = db.query(Character.stamina, Character.energy, Character.mood, Character.stress).all()
+    finally:
+        db.close()
+
+    counts: Dict[Bucket, int] = {}
+    for stamina, energy, mood, stress in rows:
+        bucket = state_bucket({"stamina": stamina, "energy": energy, "mood": mood, "stress": stress})
+        counts[bucket] = counts.get(bucket, 0) + 1
+    return sorted(counts, key=counts.get, reverse=True)
+
+
+_EVENT_TYPE = re.compile(r"Event Type:\s*\[?([A-Za-z /-]+)")
+_DESCRIPTION = re.compile(r"Description:\s*\[?(.+)")
+_TITLE_LENGTH = 100
+
+
+def record_event(db: Session, user_id: int, character_state: dict, scenario: dict) -> WorkplaceEvent:
+    """
+    Persist a served scenario as a WorkplaceEvent
+
+    event_type is the type Gemini gave (meeting, presentation, ...) and
+    event_name a title: the first sentence of the scenario's description.
+    """
+    description = scenario.get("description") or ""
+    event_type = _EVENT_TYPE.search(description)
+    body = _DESCRIPTION.search(description)
+    title = re.split(r"(?<=[.!?])\s", body.group(1).strip().rstrip("]"), maxsplit=1)[0] if body else ""
+    if len(title) > _TITLE_LENGTH:
+        title = title[:_TITLE_LENGTH - 3].rstrip() + "..."
+    event = WorkplaceEvent(
+        user_id=user_id,
+        event_type=event_type.group(1).strip().lower() if event_type else scenario.get("event_type", "workplace_event"),
+        event_name=title or "Workplace scenario",
+        outcome=scenario.get("outcome"),
+        character_state=character_state,
+        description=description
+    )
+    db.add(event)
+    db.commit()
+    db.refresh(event)
+    return event
+
+
+# Singleton instance
+scenario_pool = ScenarioPool(target=settings.WORKPLACE_POOL_SIZE)
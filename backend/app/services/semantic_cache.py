@@ -0,0 +1,228 @@
+"""
+Semantic answer cache for general Pearl questions
+Questions about how the app's metrics work ("how does stress work?", "what
+affects stamina") are answered from the static metrics reference in Pearl's
+system instruction, so near-duplicates can share one answer.
+
+Questions are embedded as hashed character n-gram and ordered word bigram
+vectors and matched by cosine similarity. Only general questions are cached: anything about the
+user's own state ("my", "I", "today") or that refers back to the conversation
+("it", "that") always goes to Gemini, and cached answers are generated
+without the user's stats or history.
+"""
+import re
+import time
+import zlib
+from typing import List, Optional
+
+from app.metrics import registry
+
+answer_cache_requests = registry.counter(
+    "pearl_answer_cache_requests_total", "Pearl answer cache lookups by result (hit, miss, personal)"
+)
+
+_WORDS = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# The question is about the user or continues the conversation
+PERSONAL_WORDS = frozenset({
+    "i", "i'm", "im", "i've", "ive", "i'd", "i'll", "my", "mine", "myself",
+    "we", "our", "us", "today", "tonight", "yesterday", "tomorrow", "now", "currently", "lately",
+    "it", "that", "this", "those", "these", "they", "them", "he", "she",
+})
+
+# What the metrics reference covers, by canonical topic. Questions only match
+# cached questions about the same topics ("sleep + stamina" never serves
+# "exercise + stamina"), then by wording.
+TOPICS = {
+    "stamina": ("stamina", "endurance"),
+    "energy": ("energy",),
+    "nutrition": ("nutrition", "nutritional"),
+    "mood": ("mood",),
+    "stress": ("stress",),
+    "xp": ("xp", "experience"),
+    "level": ("level", "levels", "leveling", "levelling"),
+    "metric": ("metric", "metrics", "stat", "stats", "parameter", "parameters"),
+    "decay": ("decay", "decays", "drop", "drops", "reset", "starve"),
+    "sleep": ("sleep", "sleeping"),
+    "exercise": ("exercise", "exercising", "workout", "workouts"),
+    "overwork": ("overwork", "overworking", "overtime"),
+    "prank": ("prank", "pranks", "pranking"),
+    "boss": ("boss", "octopus"),
+    "seal": ("seal",),
+    "calories": ("calorie", "calories", "kcal"),
+    "protein": ("protein",),
+    "fiber": ("fiber", "fibre"),
+    "fat": ("fat",),
+    "happy": ("happy",),
+    "tired": ("tired",),
+    "stressed": ("stressed",),
+    "angry": ("angry",),
+}
+_TOPIC_OF = {word: topic for topic, words in TOPICS.items() for word in words}
+
+# Common wordings of what is being asked, by canonical intent. "how" (how does
+# it work, what affects it) is also assumed when nothing else is asked.
+INTENTS = {
+    "how": (
+        "work", "works", "working", "affect", "affects", "change", "changes", "influence", "impact",
+        "calculate", "calculated", "computed", "formula", "score", "happens", "happen", "mean", "means",
+        "sources", "earn", "earned", "decided", "determined",
+    ),
+    "increase": ("increase", "increases", "raise", "raises", "gain", "boost", "improve", "build", "up"),
+    "decrease": ("decrease", "decreases", "reduce", "reduces", "lower", "lowers", "drain", "drains", "down"),
+    "default": ("default", "defaults", "start", "starts", "starting", "initial", "begin"),
+    "max": ("max", "maximum", "cap", "limit", "highest"),
+    "target": ("target", "goal", "needed", "need", "recommended"),
+}
+_INTENT_OF = {word: intent for intent, words in INTENTS.items() for word in words}
+
+# Words that carry no meaning for matching
+FILLER_WORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "be", "do", "does", "did", "can", "could", "would",
+    "what", "what's", "whats", "how", "why", "when", "which", "who", "of", "to", "in", "on", "for",
+    "about", "with", "and", "or", "you", "your", "me", "tell", "explain", "please", "pearl", "hey", "hi",
+    "get", "gets", "there", "any", "some", "much", "many", "way", "ways", "if", "will", "go", "goes",
+    "make", "makes", "over", "time", "app", "log", "logging", "don't", "dont", "character", "game",
+})
+
+
+def _words(text: str) -> List[str]:
+    return _WORDS.findall(text.lower().replace("’", "'"))
+
+
+def is_general_question(text: str) -> bool:
+    """True for questions about how the app works, not about the user's own situation"""
+    words = _words(text)
+    if not words or len(words) > 25:
+        return False
+    if any(word in PERSONAL_WORDS for word in words):
+        return False
+    return any(word in _TOPIC_OF for word in words)
+
+
+def topic_key(text: str) -> str:
+    """
+    Canonical topics a question is about in the order asked, joined by "|"
+    (e.g. sleep|stamina). Order matters: "how does sleep affect stress" and
+    "how does stress affect sleep" are different questions.
+    """
+    topics = {}
+    for word in _words(text):
+        if word in _TOPIC_OF:
+            topics.setdefault(_TOPIC_OF[word], None)
+    return "|".join(topics)
+
+
+def _stem(word: str) -> str:
+    return word.rstrip("s") if len(word) > 3 else word  # "levels" ~ "level"
+
+
+def embed(text: str, dim: int = 4096, ngram_range: tuple = (3, 5)):
+    """
+    L2-normalized hashed character n-gram and ordered word bigram counts
+    (sublinear) of what is asked
+
+    Topic words only count in bigrams, as their topic (lookups are already
+    restricted to the same topics), and known intent wordings are
+    canonicalized, so "what drains energy" and "what lowers energy" embed
+    alike while "what is the default energy" does not.
+    """
+    import numpy as np
+
+    vector = np.zeros(dim, dtype=np.float32)
+    sequence = [
+        _TOPIC_OF.get(word) or _INTENT_OF.get(word, word) for word in _words(text)
+        if word not in FILLER_WORDS
+    ]
+    words = [_stem(word) for word in sequence if word not in TOPICS]
+    for word in words or ["how"]:
+        padded = f" {word} "
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            for i in range(max(1, len(padded) - n + 1)):
+                vector[zlib.crc32(padded[i:i + n].encode("utf-8")) % dim] += 1.0
+    for first, second in zip(sequence, sequence[1:]):
+        vector[zlib.crc32(f"{_stem(first)}>{_stem(second)}".encode("utf-8")) % dim] += 1.0
+
+    np.log1p(vector, out=vector)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question similarity
+
+    Vectors are kept in one (entries x dim) matrix so a lookup is a single
+    matrix-vector product. Entries expire after `ttl` seconds; the oldest is
+    evicted beyond `max_entries`. numpy is imported on first use, not when
+    the app (and this singleton's owner) is imported.
+    """
+
+    def __init__(self, threshold: float = 0.8, ttl: float = 86400.0, max_entries: int = 500, dim: int = 4096):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.dim = dim
+        self._vectors = None  # (entries x dim) float32 array once something is stored
+        self._questions: List[str] = []
+        self._topics: List[str] = []
+        self._answers: List[str] = []
+        self._expires_at: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._answers)
+
+    def _drop(self, keep: List[bool]) -> None:
+        self._vectors = self._vectors[keep]
+        self._expires_at = [e for e, k in zip(self._expires_at, keep) if k]
+        self._questions = [q for q, k in zip(self._questions, keep) if k]
+        self._topics = [t for t, k in zip(self._topics, keep) if k]
+        self._answers = [a for a, k in zip(self._answers, keep) if k]
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        if len(self) and min(self._expires_at) < now:
+            self._drop([expires_at >= now for expires_at in self._expires_at])
+
+    def match(self, question: str) -> tuple:
+        """(score, index) of the most similar live entry on the same topics; (0.0, None) if none"""
+        self._purge_expired()
+        topics = topic_key(question)
+        if topics not in self._topics:
+            return 0.0, None
+        import numpy as np
+
+        scores = self._vectors @ embed(question, self.dim)
+        scores[np.array([t != topics for t in self._topics])] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] < 0:
+            return 0.0, None
+        return float(scores[best]), best
+
+    def get(self, question: str) -> Optional[str]:
+        """Cached answer to a question similar enough to this one, else None"""
+        score, index = self.match(question)
+        return self._answers[index] if index is not None and score >= self.threshold else None
+
+    def set(self, question: str, answer: str) -> None:
+        """Store an answer, replacing the entry for an equivalent question"""
+        import numpy as np
+
+        score, index = self.match(question)
+        if index is not None and score >= self.threshold:
+            self._drop([i != index for i in range(len(self))])
+
+        vector = embed(question, self.dim)[None, :]
+        self._vectors = vector if self._vectors is None else np.vstack([self._vectors, vector])
+        self._expires_at.append(time.monotonic() + self.ttl)
+        self._questions.append(question)
+        self._topics.append(topic_key(question))
+        self._answers.append(answer)
+
+        if len(self) > self.max_entries:
+            evict = len(self) - self.max_entries
+            self._drop([i >= evict for i in range(len(self))])
+
+    def clear(self) -> None:
+        self._vectors = None
+        self._questions, self._topics, self._answers, self._expires_at = [], [], [], []
@@ -1,29 +1,164 @@
 """
 USDA FoodData Central API service
 """
+import asyncio
+import time
 import httpx
-from typing import Optional, List
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict
+from app import tracing
 from app.config import settings
+from app.services.cache import TTLCache
+from app.services.nutrients import (
+    FIELD_NAMES,
+    MACRO_FIELDS,
+    extract_calories,
+    extract_nutrients,
+)
+from app.services.resilience import (
+    CircuitBreaker,
+    DeadlineExceeded,
+    LatencyTracker,
+    hedged,
+    timeout_within_deadline,
+)
+from app.metrics import registry
+
+usda_stale_responses = registry.counter(
+    "usda_stale_responses_total", "Searches served from cache because USDA was unavailable"
+)
+
+
+class USDAUnavailableError(Exception):
+    """USDA FoodData Central is unreachable, unhealthy or out of request time"""
+
+
+class USDARequestError(Exception):
+    """USDA rejected the request itself (a 4xx other than auth or rate limiting)"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# 4xx statuses that are about our key or quota rather than the request
+_UPSTREAM_4XX = (401, 403, 429)
+
+
+@dataclass
+class FoodsDetails:
+    """Result of a batch lookup"""
+    foods: Dict[int, dict] = field(default_factory=dict)  # fdc_id -> raw USDA food data
+    unavailable: List[int] = field(default_factory=list)  # Not fetched because USDA failed
 
 
 class USDAService:
     """Service for interacting with USDA FoodData Central API"""
 
     BASE_URL = "https://api.nal.usda.gov/fdc/v1"
+    MAX_IDS_PER_REQUEST = 20  # FDC limit for POST /foods
 
-    def __init__(self):
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.api_key = settings.USDA_API_KEY
+        self.base_url = settings.USDA_BASE_URL or self.BASE_URL
+        self.timeout = settings.USDA_TIMEOUT_SECONDS
+        self.hedge_percentile = settings.USDA_HEDGE_PERCENTILE
+        self._transport = transport  # Lets a local stub stand in for the real API
+
+        self.food_cache = TTLCache(
+            maxsize=settings.USDA_CACHE_MAX_FOODS,
+            ttl=settings.USDA_CACHE_TTL_SECONDS
+        )
+        # Kept well past freshness so it can serve as a fallback during outages
+        self.search_cache = TTLCache(maxsize=2000, ttl=7 * 86400)
+        self.breaker = CircuitBreaker(
+            "usda",
+            failure_threshold=settings.USDA_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.USDA_BREAKER_RESET_SECONDS
+        )
+        self.latency = LatencyTracker()
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=self._transport)
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """
+        Call USDA behind the circuit breaker and the current request deadline
+
+        4xx responses are returned to the caller; timeouts, transport errors
+        and 5xx responses count as upstream failures.
+
+        Raises:
+            USDAUnavailableError: circuit open, deadline exhausted or upstream failure
+        """
+        if not self.breaker.allow():
+            raise USDAUnavailableError("USDA circuit breaker is open")
+
+        try:
+            timeout = timeout_within_deadline(self.timeout)
+        except DeadlineExceeded as e:
+            self.breaker.release()
+            raise USDAUnavailableError(str(e)) from e
+
+        url = f"{self.base_url}{path}"
+        params = {**kwargs.pop("params", {}), "api_key": self.api_key}
+
+        async def attempt() -> httpx.Response:
+            with tracing.span(f"USDA {method}", tracing.CLIENT, **{
+                "http.request.method": method, "url.full": url, "server.address": "usda",
+            }) as span:
+                async with self._client() as client:
+                    start = time.monotonic()
+                    response = await client.request(method, url, params=params, timeout=timeout, **kwargs)
+                    if span is not None:
+                        span.set_attribute("http.response.status_code", response.status_code)
+                    if response.status_code >= 500:
+                        response.raise_for_status()
+                    self.latency.record(time.monotonic() - start)
+                    return response
+
+        hedge_delay = None
+        if self.hedge_percentile and method == "GET":
+            hedge_delay = self.latency.percentile(self.hedge_percentile)
+
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                response = await hedged(attempt, hedge_delay, name="usda")
+            else:
+                response = await attempt()
+        except (httpx.TimeoutException, httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, httpx.TimeoutException) and timeout < self.timeout:
+                # Our own request ran out of time; not the upstream's fault
+                self.breaker.release()
+            else:
+                self.breaker.record_failure()
+            raise USDAUnavailableError(f"USDA request failed: {e}") from e
+        except BaseException:
+            # Cancelled (client gone, losing hedge leg, warmup timeout) or a
+            # non-upstream error: free a half-open probe slot without a verdict
+            self.breaker.release()
+            raise
+
+        self.breaker.record_success()
+        return response
 
     async def search_foods(self, query: str, page_size: int = 10) -> List[dict]:
         """
         Search for foods in USDA database
 
+        Fresh results are cached for USDA_SEARCH_CACHE_TTL_SECONDS; while
+        USDA is unavailable the last cached result is served instead.
+
         Args:
             query: Food name to search for
             page_size: Number of results to return
 
         Returns:
             List of food items with basic info
+
+        Raises:
+            USDAUnavailableError: USDA is unavailable and nothing is cached
+            USDARequestError: USDA rejected the search (e.g. an invalid query)
         """
         if not self.api_key:
             return [{
@@ -32,9 +167,14 @@ class USDAService:
                 "dataType": "error"
             }]
 
-        url = f"{self.BASE_URL}/foods/search"
+        cache_key = (query.strip().lower(), page_size)
+        cached = self.search_cache.get(cache_key)
+        if cached is not None:
+            fetched_at, foods = cached
+            if time.monotonic() - fetched_at < settings.USDA_SEARCH_CACHE_TTL_SECONDS:
+                return foods
+
         params = {
-            "api_key": self.api_key,
             "query": query,
             "pageSize": page_size,
             # Include more data types for better coverage
@@ -42,58 +182,61 @@ class USDAService:
         }
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, timeout=10.0)
-                response.raise_for_status()
-                data = response.json()
-
-                # Process foods to include calorie information
-                foods = data.get("foods", [])
-                processed_foods = []
-                seen_descriptions = set()  # For simple deduplication
-
-                for food in foods:
-                    calories = self._extract_calories(food)
-
-                    # Format description with proper capitalization
-                    description = food.get("description", "Unknown Food")
-                    description = self._format_description(description)
-
-                    # Build contextual information
-                    data_type = food.get("dataType", "")
-                    brand = food.get("brandOwner", "")
-                    if brand:
-                        brand = self._clean_brand_name(brand)
-
-                    # Create detailed description
-                    # Only add brand name for branded foods, no labels for USDA data
-                    detailed_desc = description
-                    if brand:
-                        detailed_desc = f"{description} ({brand})"
-
-                    # Simple deduplication: skip very similar descriptions
-                    # Create a normalized key for comparison
-                    normalized_key = detailed_desc.lower().replace(" ", "")
-                    if normalized_key in seen_descriptions:
-                        continue
-                    seen_descriptions.add(normalized_key)
-
-                    food_item = {
-                        "fdcId": food.get("fdcId"),
-                        "description": detailed_desc,
-                        "dataType": data_type,
-                        "brandOwner": brand,
-                        "calories": calories
-                    }
-                    processed_foods.append(food_item)
-
-                return processed_foods
-        except Exception as e:
-            return [{
-                "description": f"Error: {str(e)}",
-                "fdcId": 0,
-                "dataType": "error"
-            }]
+            response = await self._request("GET", "/foods/search", params=params)
+            self._raise_for_status(response)
+        except USDAUnavailableError:
+            if cached is not None:
+                usda_stale_responses.inc()
+                return cached[1]
+            raise USDAUnavailableError("USDA FoodData Central is unavailable")
+
+        processed_foods = self._process_search_results(response.json())
+        self.search_cache.set(cache_key, (time.monotonic(), processed_foods))
+        return processed_foods
+
+    def _process_search_results(self, data: dict) -> List[dict]:
+        """Turn a raw /foods/search payload into deduplicated result rows"""
+        # Process foods to include calorie information
+        foods = data.get("foods", [])
+        processed_foods = []
+        seen_descriptions = set()  # For simple deduplication
+
+        for food in foods:
+            calories = self._extract_calories(food)
+
+            # Format description with proper capitalization
+            description = food.get("description", "Unknown Food")
+            description = self._format_description(description)
+
+            # Build contextual information
+            data_type = food.get("dataType", "")
+            brand = food.get("brandOwner", "")
+            if brand:
+                brand = self._clean_brand_name(brand)
+
+            # Create detailed description
+            # Only add brand name for branded foods, no labels for USDA data
+            detailed_desc = description
+            if brand:
+                detailed_desc = f"{description} ({brand})"
+
+            # Simple deduplication: skip very similar descriptions
+            # Create a normalized key for comparison
+            normalized_key = detailed_desc.lower().replace(" ", "")
+            if normalized_key in seen_descriptions:
+                continue
+            seen_descriptions.add(normalized_key)
+
+            food_item = {
+                "fdcId": food.get("fdcId"),
+                "description": detailed_desc,
+                "dataType": data_type,
+                "brandOwner": brand,
+                "calories": calories
+            }
+            processed_foods.append(food_item)
+
+        return processed_foods
 
     async def get_food_details(self, fdc_id: int) -> Optional[dict]:
         """
@@ -103,21 +246,106 @@ class USDAService:
             fdc_id: FoodData Central ID
 
         Returns:
-            Detailed food information including all nutrients
+            Detailed food information including all nutrients, or None if not found
+
+        Raises:
+            USDAUnavailableError: USDA is unavailable and the food is not cached
         """
         if not self.api_key:
             return None
 
-        url = f"{self.BASE_URL}/food/{fdc_id}"
-        params = {"api_key": self.api_key}
+        cached = self.food_cache.get(fdc_id)
+        if cached is not None:
+            return cached
 
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, timeout=10.0)
-                response.raise_for_status()
-                return response.json()
-        except Exception as e:
-            return {"error": str(e)}
+        response = await self._request("GET", f"/food/{fdc_id}")
+        if response.status_code >= 400:
+            return None
+
+        food_data = response.json()
+        self.food_cache.set(fdc_id, food_data)
+        return food_data
+
+    async def get_foods_details(self, fdc_ids: List[int]) -> FoodsDetails:
+        """
+        Get detailed nutrition information for several foods at once
+
+        Cached foods are served directly; the misses are fetched with the
+        FDC multi-food endpoint in chunks of MAX_IDS_PER_REQUEST.
+
+        Args:
+            fdc_ids: FoodData Central IDs (duplicates are ignored)
+
+        Returns:
+            The foods found, plus the IDs of chunks USDA failed to answer
+            (IDs in neither were not found)
+
+        Raises:
+            USDAUnavailableError: every chunk failed and nothing was cached
+        """
+        result = FoodsDetails()
+        if not self.api_key:
+            return result
+
+        misses: List[int] = []
+        for fdc_id in dict.fromkeys(fdc_ids):
+            cached = self.food_cache.get(fdc_id)
+            if cached is not None:
+                result.foods[fdc_id] = cached
+            else:
+                misses.append(fdc_id)
+
+        if not misses:
+            return result
+
+        chunks = [
+            misses[i:i + self.MAX_IDS_PER_REQUEST]
+            for i in range(0, len(misses), self.MAX_IDS_PER_REQUEST)
+        ]
+        responses = await asyncio.gather(
+            *(self._fetch_foods_chunk(chunk) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        for chunk, response in zip(chunks, responses):
+            if isinstance(response, (USDAUnavailableError, asyncio.CancelledError)):
+                result.unavailable.extend(chunk)
+                continue
+            if isinstance(response, USDARequestError):
+                continue  # USDA rejected the IDs; they count as not found
+            if isinstance(response, BaseException):
+                raise response
+            for food_data in response:
+                fdc_id = food_data.get("fdcId")
+                if fdc_id is None:
+                    continue
+                self.food_cache.set(fdc_id, food_data)
+                result.foods[fdc_id] = food_data
+
+        if len(result.unavailable) == len(misses) and not result.foods:
+            raise USDAUnavailableError("USDA FoodData Central is unavailable")
+        return result
+
+    async def _fetch_foods_chunk(self, fdc_ids: List[int]) -> List[dict]:
+        """Fetch up to MAX_IDS_PER_REQUEST foods with POST /foods"""
+        response = await self._request(
+            "POST", "/foods", json={"fdcIds": fdc_ids, "format": "full"}
+        )
+        self._raise_for_status(response)
+        return response.json()
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response) -> None:
+        """
+        Raises:
+            USDARequestError: USDA rejected the request (the caller's fault)
+            USDAUnavailableError: USDA refused our key or quota
+        """
+        if response.status_code < 400:
+            return
+        if response.status_code in _UPSTREAM_4XX:
+            raise USDAUnavailableError(f"USDA refused the request ({response.status_code})")
+        raise USDARequestError(response.status_code, f"USDA rejected the request ({response.status_code})")
 
     def _clean_brand_name(self, brand: str) -> str:
         """
@@ -193,17 +421,7 @@ class USDAService:
         Returns:
             Calories per 100g or None
         """
-        nutrients = food_item.get("foodNutrients", [])
-        for nutrient in nutrients:
-            # Look for Energy/Calories
-            name = nutrient.get("nutrientName", "").lower()
-            if "energy" in name or "calorie" in name:
-                # Prefer kcal over kJ
-                unit = nutrient.get("unitName", "").lower()
-                if "kcal" in unit or "calorie" in unit:
-                    return nutrient.get("value", 0.0)
-
-        return None
+        return extract_calories(food_item.get("foodNutrients", []))
 
     def parse_nutrition(self, food_data: dict) -> dict:
         """
@@ -213,34 +431,34 @@ class USDAService:
             food_data: Raw USDA food data
 
         Returns:
-            Dict with calories, protein, carbs, fat, fiber
-        """
-        nutrients = food_data.get("foodNutrients", [])
-        nutrition = {
-            "calories": 0.0,
-            "protein": 0.0,
-            "carbs": 0.0,
-            "fat": 0.0,
-            "fiber": 0.0
-        }
+            Dict with calories, protein, carbs, fat, fiber and tracked micronutrients
+        """
+        values = extract_nutrients(food_data.get("foodNutrients", []))
+        nutrition = {}
+        for name, value in zip(FIELD_NAMES, values):
+            if value is None:
+                # Macros default to 0 so clients can always sum them
+                value = 0.0 if name in MACRO_FIELDS else None
+            nutrition[name] = value
 
-        # Map USDA nutrient IDs to our fields
-        nutrient_map = {
-            "Energy": "calories",
-            "Protein": "protein",
-            "Carbohydrate, by difference": "carbs",
-            "Total lipid (fat)": "fat",
-            "Fiber, total dietary": "fiber"
-        }
+        return nutrition
 
-        for nutrient in nutrients:
-            name = nutrient.get("nutrientName", "")
-            for usda_name, our_name in nutrient_map.items():
-                if usda_name in name:
-                    nutrition[our_name] = nutrient.get("value", 0.0)
-                    break
+    def scale_nutrition(self, nutrition: dict, grams: float) -> dict:
+        """
+        Scale per-100g nutrition (as returned by parse_nutrition) to a serving
 
-        return nutrition
+        Args:
+            nutrition: Nutrition per 100 g
+            grams: Serving weight in grams
+
+        Returns:
+            Nutrition for the serving, rounded to 2 decimals
+        """
+        factor = grams / 100.0
+        return {
+            name: round(value * factor, 2) if value is not None else None
+            for name, value in nutrition.items()
+        }
 
 
 # Singleton instance
@@ -0,0 +1,125 @@
+"""
+Food cache warm-up
+Preloads the most-logged foods and most-run searches into the USDA caches so
+cold instances don't make the first users after a deploy pay full USDA
+latency. Searches are counted as users type them (food_searches), since
+logged food names are USDA descriptions nobody searches for.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import func
+
+from app.config import settings
+from app.database import SessionLocal, add_to_row
+from app.metrics import registry
+from app.models import DietLog, FoodSearch
+from app.services.usda import usda_service, USDAUnavailableError
+
+logger = logging.getLogger(__name__)
+
+warmup_runs = registry.counter("food_warmup_runs_total", "Food cache warm-up runs")
+warmup_foods = registry.gauge("food_warmup_foods", "Foods preloaded by the last warm-up run")
+warmup_seconds = registry.gauge("food_warmup_duration_seconds", "Duration of the last warm-up run")
+
+MAX_QUERY_LENGTH = 200  # food_searches.query
+
+
+def normalize_query(query: str) -> str:
+    """The form searches are counted and cached under (matches USDAService's search cache key)"""
+    return query.strip().lower()
+
+
+def record_search(query: str) -> None:
+    """Count one food search, as typed, towards the warm-up ranking; runs after the response"""
+    query = normalize_query(query)
+    if not query or len(query) > MAX_QUERY_LENGTH:
+        return
+    db = SessionLocal()
+    try:
+        add_to_row(db, FoodSearch, {"query": query}, {"searches": 1},
+                   assign={"last_searched_at": datetime.utcnow()})
+        db.commit()
+    except Exception as e:
+        logger.warning("Could not record food search: %s", e)
+    finally:
+        db.close()
+
+
+def popular_foods(limit: int) -> Tuple[List[int], List[str]]:
+    """
+    Most-logged USDA foods and most-run food searches
+
+    Returns:
+        (fdc_ids by diet_logs frequency, search queries by search frequency)
+    """
+    db = SessionLocal()
+    try:
+        fdc_ids = db.query(DietLog.fdc_id).filter(
+            DietLog.fdc_id.isnot(None)
+        ).group_by(
+            DietLog.fdc_id
+        ).order_by(
+            func.count(DietLog.id).desc()
+        ).limit(limit).all()
+        queries = db.query(FoodSearch.query).order_by(
+            FoodSearch.searches.desc(),
+            FoodSearch.last_searched_at.desc()
+        ).limit(limit).all()
+    finally:
+        db.close()
+
+    return [fdc_id for fdc_id, in fdc_ids], [query for query, in queries]
+
+
+async def warm_food_cache(limit: int, budget_seconds: float) -> int:
+    """
+    Preload popular foods' nutrient data and search results
+
+    Stops when budget_seconds is spent; whatever finished stays cached.
+
+    Returns:
+        Number of foods and searches preloaded
+    """
+    start = time.monotonic()
+    fdc_ids, queries = await asyncio.to_thread(popular_foods, limit)
+    loaded = 0
+
+    async def preload() -> None:
+        nonlocal loaded
+        if fdc_ids:
+            try:
+                loaded += len((await usda_service.get_foods_details(fdc_ids)).foods)
+            except USDAUnavailableError:
+                return
+        for query in queries:
+            try:
+                await usda_service.search_foods(query)
+                loaded += 1
+            except USDAUnavailableError:
+                return  # Upstream is down; the breaker will tell us when it's back
+
+    remaining = budget_seconds - (time.monotonic() - start)
+    try:
+        await asyncio.wait_for(preload(), timeout=max(0.0, remaining))
+    except asyncio.TimeoutError:
+        logger.info("Food warm-up hit its %.0fs budget", budget_seconds)
+
+    warmup_runs.inc()
+    warmup_foods.set(loaded)
+    warmup_seconds.set(time.monotonic() - start)
+    return loaded
+
+
+async def run_warmup_loop() -> None:
+    """Warm up once, then refresh the hot set every WARMUP_REFRESH_SECONDS"""
+    while True:
+        try:
+            loaded = await warm_food_cache(settings.WARMUP_TOP_FOODS, settings.WARMUP_BUDGET_SECONDS)
+            logger.info("Food warm-up preloaded %d items", loaded)
+        except Exception as e:
+            logger.warning("Food warm-up failed: %s", e)
+        await asyncio.sleep(settings.WARMUP_REFRESH_SECONDS)
@@ -0,0 +1,381 @@
+"""
+Request tracing in the OpenTelemetry data model
+TracingMiddleware opens a SERVER span per sampled request, with the method,
+route template, status and (once authenticated) user id as attributes.
+Inside it, each SQL statement, USDA HTTP call and Gemini call gets a child
+span, so a trace shows where a request's milliseconds went.
+
+Trace and span ids, kinds, attributes and status follow OpenTelemetry, and
+an incoming W3C `traceparent` header continues the caller's trace. Finished
+traces go to TRACING_EXPORTER:
+- "file": one OTLP/JSON ExportTraceServiceRequest per line in TRACING_FILE,
+  which the OpenTelemetry Collector's otlpjsonfile receiver can read.
+- "console": an indented span tree with offsets and durations on stderr.
+Exporting happens on a background thread, so neither serializing nor writing
+a trace runs on the event loop; call flush() to wait for queued traces.
+
+TRACING_SAMPLE_RATE picks the fraction of new traces recorded (by trace id,
+like TraceIdRatioBased); a caller's sampled flag wins. Child spans outside a
+recorded request are not recorded.
+"""
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.metrics import registry
+from app.request_metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+traces_dropped = registry.counter(
+    "traces_dropped_total", "Finished traces dropped because the exporter queue was full"
+)
+
+INTERNAL, SERVER, CLIENT = 1, 2, 3  # OTLP SpanKind values
+_STATUS_OK, _STATUS_ERROR = 1, 2
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE|JOIN)\s+\"?(\w+)", re.IGNORECASE)
+
+
+class Trace:
+    """Spans of one trace recorded by this process, exported when the root span ends"""
+
+    __slots__ = ("trace_id", "spans", "root")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.root: Optional["Span"] = None
+
+
+class Span:
+    """One timed operation; ended spans are collected on their Trace"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes", "start_ns", "end_ns",
+                 "status", "status_message")
+
+    def __init__(self, trace: Trace, name: str, kind: int, parent_id: Optional[str], attributes: dict):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = 0  # Unset
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = _STATUS_ERROR
+        self.status_message = str(error)[:200]
+        self.attributes["exception.type"] = type(error).__name__
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self.trace.spans.append(self)
+        if self is self.trace.root:
+            export(self.trace)
+
+
+# Mutable Span objects; threadpool workers see the request's span through the copied context
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def set_attribute(key: str, value) -> None:
+    """Set an attribute on the current request's root span (no-op when not tracing)"""
+    span = _current_span.get()
+    if span is not None:
+        span.trace.root.set_attribute(key, value)
+
+
+def start_span(name: str, kind: int = INTERNAL, **attributes) -> Optional[Span]:
+    """A child of the current span, or None when not tracing; the caller ends it"""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    return Span(parent.trace, name, kind, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name: str, kind: int = INTERNAL, **attributes) -> Iterator[Optional[Span]]:
+    """Run the block in a child span of the current span (yields None when not tracing)"""
+    child = start_span(name, kind, **attributes)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def _sampled(trace_id: str) -> bool:
+    rate = settings.TRACING_SAMPLE_RATE
+    return rate >= 1.0 or int(trace_id[16:], 16) < rate * 2 ** 64
+
+
+def _traceparent(scope) -> Optional[tuple]:
+    for name, value in scope.get("headers", ()):
+        if name == b"traceparent":
+            match = _TRACEPARENT.match(value.decode("latin-1").strip())
+            if match and match.group(1) != "0" * 32 and match.group(2) != "0" * 16:
+                return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+            return None
+    return None
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per sampled request (no-op without TRACING_EXPORTER)"""
+
+    def __init__(self, app, router_app):
+        self.app = app
+        self.router_app = router_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TRACING_EXPORTER:
+            await self.app(scope, receive, send)
+            return
+
+        parent = _traceparent(scope)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+            sampled = _sampled(trace_id)
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.router_app, scope)
+        trace = Trace(trace_id)
+        root = Span(trace, f"{method} {route}", SERVER, parent_id, {
+            "http.request.method": method,
+            "http.route": route,
+            "url.path": scope["path"],
+        })
+        trace.root = root
+        token = _current_span.set(root)
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.response.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = _STATUS_ERROR
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as e:
+            root.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            root.end()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.setdefault("trace_spans", [])
+    if _current_span.get() is None:
+        spans.append(None)
+        return
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "SQL"
+    table = _SQL_TABLE.search(statement)
+    child = start_span(f"{operation} {table.group(1)}" if table else operation, CLIENT, **{
+        "db.system": conn.dialect.name,
+        "db.operation": operation,
+        "db.statement": statement[:1000],
+    })
+    spans.append(child)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    child = conn.info["trace_spans"].pop()
+    if child is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            child.set_attribute("db.rows_affected", cursor.rowcount)
+        child.end()
+
+
+def _handle_error(exception_context):
+    spans = exception_context.connection.info.get("trace_spans") if exception_context.connection else None
+    if spans:
+        child = spans.pop()
+        if child is not None:
+            child.record_error(exception_context.original_exception)
+            child.end()
+
+
+def _before_commit(session):
+    session.info["trace_commit"] = start_span("COMMIT", INTERNAL, **{"db.operation": "COMMIT"})
+
+
+def _after_commit(session):
+    # Covers the flush (its statements have their own spans) and the COMMIT itself
+    child = session.info.pop("trace_commit", None)
+    if child is not None:
+        child.end()
+
+
+def instrument_engine(engine: Engine, sessions=None) -> None:
+    """
+    Give every statement `engine` executes inside a traced request its own
+    span, and each commit of a `sessions` (sessionmaker) session another
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+    if sessions is not None and not event.contains(sessions, "before_commit", _before_commit):
+        event.listen(sessions, "before_commit", _before_commit)
+        event.listen(sessions, "after_commit", _after_commit)
+
+
+# Exporters
+
+_export_lock = threading.Lock()
+
+
+def _attribute_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> dict:
+    """The trace as an OTLP/JSON ExportTraceServiceRequest"""
+    spans = []
+    for s in trace.spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": s.kind,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in s.attributes.items()],
+            "status": {"code": s.status, **({"message": s.status_message} if s.status_message else {})},
+        }
+        if s.parent_id:
+            otlp_span["parentSpanId"] = s.parent_id
+        spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": settings.TRACING_SERVICE_NAME}},
+            {"key": "service.version", "value": {"stringValue": settings.APP_VERSION}},
+        ]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+    }]}
+
+
+def format_tree(trace: Trace) -> str:
+    """Indented span tree: offset from the root's start, duration, name"""
+    children = {}
+    for s in trace.spans:
+        children.setdefault(s.parent_id, []).append(s)
+    root = trace.root
+    lines = [f"trace {trace.trace_id}"]
+
+    def walk(s: Span, depth: int):
+        offset = (s.start_ns - root.start_ns) / 1e6
+        duration = (s.end_ns - s.start_ns) / 1e6
+        error = "  ERROR" if s.status == _STATUS_ERROR else ""
+        lines.append(f"{offset:9.2f} ms {duration:9.2f} ms  {'  ' * depth}{s.name}{error}")
+        for child in sorted(children.get(s.span_id, []), key=lambda c: c.start_ns):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def _write(trace: Trace) -> None:
+    exporter = settings.TRACING_EXPORTER
+    if exporter == "file":
+        line = json.dumps(to_otlp(trace), separators=(",", ":"))
+        with _export_lock, open(settings.TRACING_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    elif exporter == "console":
+        tree = format_tree(trace)
+        with _export_lock:
+            print(tree, file=sys.stderr)
+
+
+class TraceExporter:
+    """Writes finished traces from a bounded queue on a daemon thread (started on first use)"""
+
+    def __init__(self, max_queued: int):
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, trace: Trace) -> None:
+        """Queue a trace without blocking; dropped (and counted) when the queue is full"""
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            traces_dropped.inc()
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                _write(trace)
+            except Exception as e:
+                logger.warning("Could not export trace %s: %s", trace.trace_id, e)
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued trace has been written"""
+        self._queue.join()
+
+
+exporter = TraceExporter(settings.TRACING_QUEUE_SIZE)
+
+
+def export(trace: Trace) -> None:
+    exporter.submit(trace)
+
+
+def flush() -> None:
+    """Wait for queued traces to be written (shutdown, tests)"""
+    exporter.flush()
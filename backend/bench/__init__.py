@@ -0,0 +1,4 @@
+"""
+Benchmarks for the Oystraz backend
+Run from the backend directory, e.g. `python -m bench.bench_nutrients`
+"""
@@ -0,0 +1,31 @@
+"""
+In-process app harness for benchmarks
+Points the app at a throwaway SQLite database and gives an authenticated client.
+"""
+import os
+import tempfile
+import uuid
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/oystraz_bench.db")
+
+import httpx  # noqa: E402
+
+from app.database import init_db  # noqa: E402
+from app.main import app  # noqa: E402
+
+# httpx.ASGITransport doesn't run the lifespan that creates the schema
+init_db()
+
+
+async def authenticated_client() -> httpx.AsyncClient:
+    """Register a fresh user and return a client carrying its token"""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    username = f"bench_{uuid.uuid4().hex[:10]}"
+    response = await client.post("/api/auth/register", json={
+        "email": f"{username}@example.com",
+        "username": username,
+        "password": "bench-password",
+    })
+    response.raise_for_status()
+    client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+    return client
@@ -0,0 +1,99 @@
+"""
+Assistant context: one aggregate query vs three raw-log scans
+Seeds a user with a week of diet, exercise and sleep logs, checks the
+aggregate snapshot matches the old per-row summary, and times the old
+load, the single-statement load and the cached snapshot.
+Usage: python -m bench.assistant_context [--per-day 20] [--iterations 200]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from bench import app_harness  # noqa: F401  (points DATABASE_URL at the bench database)
+from app.database import Base, SessionLocal, engine
+from app.models import Character, DietLog, ExerciseLog, SleepLog, User
+from app.services.assistant_context import (
+    get_assistant_context,
+    invalidate_assistant_context,
+    load_assistant_context,
+)
+from app.services.gemini import gemini_service
+
+
+def _legacy_load(db, user_id: int, days: int = 7):
+    """What the assistant endpoints did before: load every row, keep one field"""
+    character = db.query(Character).filter(Character.user_id == user_id).first()
+    start_date = datetime.utcnow() - timedelta(days=days)
+    diet_logs = db.query(DietLog).filter(DietLog.user_id == user_id, DietLog.logged_at >= start_date).all()
+    exercise_logs = db.query(ExerciseLog).filter(
+        ExerciseLog.user_id == user_id, ExerciseLog.logged_at >= start_date
+    ).all()
+    sleep_logs = db.query(SleepLog).filter(SleepLog.user_id == user_id, SleepLog.logged_at >= start_date).all()
+    recent = {
+        "diet": [log.calories or 0 for log in diet_logs],
+        "exercise": [log.duration_minutes or 0 for log in exercise_logs],
+        "sleep": [log.duration_hours or 0 for log in sleep_logs],
+    }
+    state = {f: getattr(character, f) for f in ("stamina", "energy", "nutrition", "mood", "stress")}
+    return state, {
+        "meals": len(recent["diet"]),
+        "calories": float(sum(recent["diet"])),
+        "exercises": len(recent["exercise"]),
+        "exercise_minutes": float(sum(recent["exercise"])),
+        "sleep_nights": len(recent["sleep"]),
+        "avg_sleep_hours": sum(recent["sleep"]) / len(recent["sleep"]) if recent["sleep"] else 0.0,
+    }
+
+
+def _seed(db, per_day: int) -> int:
+    user = User(email=f"ctx{time.time_ns()}@example.com", username=f"ctx{time.time_ns()}", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.add(Character(user_id=user.id, stamina=71, energy=64, nutrition=58, mood=55, stress=43))
+    now = datetime.utcnow()
+    for day in range(10):  # Three days fall outside the 7-day window
+        for i in range(per_day):
+            at = now - timedelta(days=day, minutes=i)
+            db.add(DietLog(user_id=user.id, food_name="rice", calories=200 + i, logged_at=at))
+            db.add(ExerciseLog(user_id=user.id, activity_name="walk", duration_minutes=10 + i % 30, logged_at=at))
+        db.add(SleepLog(user_id=user.id, sleep_start=now, sleep_end=now, duration_hours=6.5 + day % 3,
+                        logged_at=now - timedelta(days=day)))
+    db.commit()
+    return user.id
+
+
+def _time(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main(per_day: int, iterations: int):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user_id = _seed(db, per_day)
+
+    state, summary = _legacy_load(db, user_id)
+    context = load_assistant_context(db, user_id)
+    assert context.character_state == state, (context.character_state, state)
+    assert context.log_summary == summary, (context.log_summary, summary)
+    assert gemini_service._format_log_summary(context.log_summary) == gemini_service._format_log_summary(summary)
+
+    legacy = _time(lambda: (_legacy_load(db, user_id), db.expunge_all()), iterations)
+    aggregate = _time(lambda: load_assistant_context(db, user_id), iterations)
+    invalidate_assistant_context(user_id)
+    cached = _time(lambda: get_assistant_context(db, user_id), iterations)
+    print(f"{per_day * 7 * 2 + 7} logs in the 7-day window")
+    print(f"raw-log scans (4 queries): {legacy:7.3f}ms")
+    print(f"aggregate (1 query):       {aggregate:7.3f}ms")
+    print(f"cached snapshot:           {cached:7.3f}ms")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--per-day", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    main(args.per_day, args.iterations)
@@ -0,0 +1,75 @@
+"""
+Microbenchmark: nutrient extraction over a USDA response corpus
+Compares the name-matching extractor this replaced with the ID lookup on
+the same items. The legacy code only understood search-result entries
+(nutrientName + value), so legacy and ID-table paths are compared on search
+results; details responses are timed for the ID table alone.
+Uses bench/data/usda_corpus.json when recorded (bench/record_usda.py),
+otherwise a synthetic corpus shaped like Branded and Foundation results.
+Usage: python -m bench.bench_nutrients [--repeat 20]
+"""
+import argparse
+import timeit
+
+from app.services.usda import usda_service
+from bench.usda_corpus import RECORDED_CORPUS, load_corpus
+
+
+def legacy_extract_calories(food_item: dict):
+    """Substring scan that shipped before the nutrient ID table"""
+    for nutrient in food_item.get("foodNutrients", []):
+        name = nutrient.get("nutrientName", "").lower()
+        if "energy" in name or "calorie" in name:
+            unit = nutrient.get("unitName", "").lower()
+            if "kcal" in unit or "calorie" in unit:
+                return nutrient.get("value", 0.0)
+    return None
+
+
+def legacy_parse_nutrition(food_data: dict) -> dict:
+    """Nested name-matching loop that shipped before the nutrient ID table"""
+    nutrition = {"calories": 0.0, "protein": 0.0, "carbs": 0.0, "fat": 0.0, "fiber": 0.0}
+    nutrient_map = {
+        "Energy": "calories",
+        "Protein": "protein",
+        "Carbohydrate, by difference": "carbs",
+        "Total lipid (fat)": "fat",
+        "Fiber, total dietary": "fiber"
+    }
+    for nutrient in food_data.get("foodNutrients", []):
+        name = nutrient.get("nutrientName", "")
+        for usda_name, our_name in nutrient_map.items():
+            if usda_name in name:
+                nutrition[our_name] = nutrient.get("value", 0.0)
+                break
+    return nutrition
+
+
+def _per_item_us(func, items, repeat: int) -> float:
+    """Best-of-N microseconds per call"""
+    timer = timeit.Timer(lambda: [func(item) for item in items])
+    best = min(timer.repeat(repeat=repeat, number=1))
+    return best / len(items) * 1e6
+
+
+def run(repeat: int = 20) -> dict:
+    corpus = load_corpus()
+    search, details = corpus["search"], corpus["details"]
+    cases = {
+        "extract_calories/legacy": (legacy_extract_calories, search),
+        "extract_calories/id_table": (usda_service._extract_calories, search),
+        "parse_nutrition/legacy": (legacy_parse_nutrition, search),
+        "parse_nutrition/id_table": (usda_service.parse_nutrition, search),
+        "parse_nutrition/id_table (details)": (usda_service.parse_nutrition, details),
+    }
+    return {name: _per_item_us(func, items, repeat) for name, (func, items) in cases.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"corpus: {'recorded' if RECORDED_CORPUS.exists() else 'synthetic'}")
+    for name, us in run(args.repeat).items():
+        print(f"{name:36s} {us:8.2f} us/food")
@@ -0,0 +1,98 @@
+"""
+Daily advice batch: throughput, resume and serving stored advice
+Seeds active users, runs the nightly batch against a fake Gemini, cancels it
+part-way and resumes it, then checks POST /api/assistant/advice serves the
+stored advice without calling Gemini.
+Usage: python -m bench.daily_advice_batch [--users 200] [--chunk-size 20] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from bench import fake_gemini
+from bench.app_harness import authenticated_client
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Character, DailyAdvice, DietLog, User
+from app.services.daily_advice import advice_requests, run_daily_advice_batch
+from app.services.gemini import gemini_service
+
+
+def _seed(users: int) -> None:
+    db = SessionLocal()
+    now = datetime.utcnow()
+    for i in range(users):
+        user = User(email=f"advice{time.time_ns()}@example.com", username=f"advice{time.time_ns()}",
+                    hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add(Character(user_id=user.id, stamina=20 + i % 70, energy=30 + i % 60, nutrition=50, mood=60,
+                         stress=40))
+        db.add(DietLog(user_id=user.id, food_name="oats", calories=350, logged_at=now - timedelta(hours=i % 48)))
+    db.commit()
+    db.close()
+
+
+async def _timed_post(client, json: dict) -> tuple:
+    start = time.perf_counter()
+    response = await client.post("/api/assistant/advice", json=json)
+    response.raise_for_status()
+    return response.json()["advice"], (time.perf_counter() - start) * 1000
+
+
+async def main(users: int, chunk_size: int, latency: float):
+    settings.LLM_CACHE_ENABLED = False  # Every user costs one generation
+    fake = fake_gemini.install(gemini_service, latency=latency)
+    fake.reply = "Drink water and walk after lunch."
+    client = await authenticated_client()
+    response = await client.post("/api/exercise", json={"activity_name": "walk", "duration_minutes": 20})
+    response.raise_for_status()
+    _seed(users)
+
+    # Interrupt the first run after a few chunks, then resume it
+    first = asyncio.create_task(run_daily_advice_batch(chunk_size, resume=False))
+    while fake.calls < 3 * chunk_size:
+        await asyncio.sleep(0.01)
+    first.cancel()
+    try:
+        await first
+    except asyncio.CancelledError:
+        pass
+    calls_before_resume = fake.calls
+
+    summary = await run_daily_advice_batch(chunk_size, resume=True)
+    print(f"run {summary['run_id']}: {summary['processed']}/{summary['total_users']} users "
+          f"({summary['failed']} failed) after resume")
+    print(f"resumed leg: {fake.calls - calls_before_resume} generations in {summary['seconds']}s "
+          f"= {summary['users_per_second']} users/s (chunk {chunk_size}, {latency}s per call, "
+          f"{settings.GEMINI_MAX_CONCURRENCY} concurrent)")
+    assert summary["status"] == "completed"
+    assert summary["processed"] == summary["total_users"]
+    # The cancelled chunk is redone; nothing before it is
+    assert fake.calls - summary["total_users"] <= chunk_size, "resume repeated finished chunks"
+
+    db = SessionLocal()
+    stored = db.query(DailyAdvice).filter(DailyAdvice.run_id == summary["run_id"]).count()
+    db.close()
+    print(f"daily_advice rows written by the run: {stored}")
+
+    calls = fake.calls
+    advice, stored_ms = await _timed_post(client, {})
+    assert fake.calls == calls, "stored advice should not call Gemini"
+    assert advice == fake.reply
+    _, live_ms = await _timed_post(client, {"query": "How should I train tomorrow?"})
+    print(f"/advice stored {stored_ms:.1f}ms vs live (with a query) {live_ms:.1f}ms; "
+          f"stored served {int(advice_requests.value(result='stored'))}, "
+          f"live {int(advice_requests.value(result='live'))}")
+
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--chunk-size", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.chunk_size, args.latency))
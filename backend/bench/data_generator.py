@@ -0,0 +1,179 @@
+"""
+Seeded synthetic users with multi-year activity histories
+Creates N users (password "bench-password"), each with a character and a
+daily history up to yesterday: two to four meals, sleep every night,
+exercise most days and work on weekdays. Each user has a persona (regular,
+night owl, athlete, workaholic) that shapes their habits. The same seed
+always produces the same data, relative to the day it runs.
+Usage: python -m bench.data_generator [--users 50] [--years 2] [--seed 42] [--database-url URL]
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+PASSWORD = "bench-password"
+USERNAME_PREFIX = "load"
+
+MEALS = {
+    "breakfast": [("oatmeal", 300, 10, 54, 6, 8), ("eggs and toast", 380, 20, 30, 18, 3),
+                  ("yogurt with granola", 320, 14, 48, 8, 4), ("pastry", 420, 6, 52, 21, 1)],
+    "lunch": [("chicken rice bowl", 650, 38, 80, 14, 5), ("ramen", 720, 24, 92, 26, 4),
+              ("salad", 410, 18, 22, 26, 9), ("burger and fries", 980, 34, 96, 48, 6)],
+    "dinner": [("salmon and vegetables", 560, 40, 24, 30, 8), ("pasta", 780, 26, 110, 22, 7),
+               ("stir fry tofu", 520, 28, 48, 22, 9), ("pizza", 900, 36, 100, 38, 5)],
+    "snack": [("apple", 95, 0, 25, 0, 4), ("chips", 250, 3, 25, 16, 2),
+              ("protein bar", 210, 20, 22, 7, 3), ("nuts", 180, 6, 6, 16, 3)],
+}
+ACTIVITIES = [("run", "cardio", "vigorous", 11.0), ("walk", "cardio", "light", 4.0),
+              ("weights", "strength", "moderate", 6.0), ("yoga", "yoga", "light", 3.0),
+              ("cycling", "cardio", "moderate", 8.0), ("football", "sports", "vigorous", 9.0)]
+
+# name -> (bedtime hour, sleep hours mean, exercise probability, work hours mean, snack probability)
+PERSONAS = {
+    "regular": (23, 7.3, 0.45, 8.0, 0.4),
+    "night_owl": (2, 6.4, 0.25, 7.5, 0.7),
+    "athlete": (22, 8.2, 0.9, 7.0, 0.3),
+    "workaholic": (1, 5.6, 0.15, 10.5, 0.6),
+}
+
+
+def _day_rows(rng: random.Random, user_id: int, persona: tuple, day: datetime) -> dict:
+    bedtime, sleep_mean, exercise_p, work_mean, snack_p = persona
+    rows = {"diet": [], "exercise": [], "sleep": [], "work": []}
+
+    meals = ["breakfast", "lunch", "dinner"]
+    if rng.random() < 0.2:
+        meals.remove("breakfast")
+    if rng.random() < snack_p:
+        meals.append("snack")
+    for meal_type in meals:
+        food, calories, protein, carbs, fat, fiber = rng.choice(MEALS[meal_type])
+        scale = rng.uniform(0.8, 1.3)
+        hour = {"breakfast": 8, "lunch": 12, "dinner": 19, "snack": 16}[meal_type]
+        rows["diet"].append({
+            "user_id": user_id, "food_name": food, "meal_type": meal_type,
+            "calories": round(calories * scale), "protein": round(protein * scale, 1),
+            "carbs": round(carbs * scale, 1), "fat": round(fat * scale, 1), "fiber": round(fiber * scale, 1),
+            "serving_size": 1.0, "serving_unit": "serving",
+            "logged_at": day + timedelta(hours=hour, minutes=rng.randint(0, 59)),
+        })
+
+    hours = max(3.0, min(11.0, rng.gauss(sleep_mean, 0.8)))
+    start = day - timedelta(days=1) + timedelta(hours=bedtime if bedtime > 12 else bedtime + 24,
+                                                minutes=rng.randint(-40, 40))
+    rows["sleep"].append({
+        "user_id": user_id, "sleep_start": start, "sleep_end": start + timedelta(hours=hours),
+        "duration_hours": round(hours, 2),
+        "quality": "excellent" if hours >= 8 else "good" if hours >= 7 else "average" if hours >= 6 else "poor",
+        "quality_score": round(min(100.0, hours / 8 * 85 + rng.uniform(-10, 10)), 1),
+        "interruptions": rng.randint(0, 3),
+        "logged_at": start + timedelta(hours=hours),
+    })
+
+    if rng.random() < exercise_p:
+        name, activity_type, intensity, kcal_per_minute = rng.choice(ACTIVITIES)
+        minutes = rng.choice([20, 30, 45, 60, 90])
+        rows["exercise"].append({
+            "user_id": user_id, "activity_name": name, "activity_type": activity_type,
+            "duration_minutes": minutes, "intensity": intensity,
+            "calories_burned": round(minutes * kcal_per_minute), "distance_unit": "km",
+            "logged_at": day + timedelta(hours=rng.choice([7, 18, 20])),
+        })
+
+    if day.weekday() < 5:
+        work_hours = max(1.0, min(14.0, rng.gauss(work_mean, 1.2)))
+        intensity = rng.randint(2, 5)
+        rows["work"].append({
+            "user_id": user_id, "duration_hours": round(work_hours, 2), "intensity": intensity,
+            "energy_cost": round(work_hours * intensity * 0.3, 2), "stress_gain": round(work_hours * intensity * 0.5, 2),
+            "stamina_cost": round(work_hours * intensity * 0.5, 2), "experience_gain": int(work_hours * intensity * 10),
+            "pranked_boss": 1 if rng.random() < 0.03 else 0,
+            "logged_at": day + timedelta(hours=17, minutes=rng.randint(0, 120)),
+        })
+    return rows
+
+
+def generate(users: int, years: float, seed: int, batch_rows: int = 5000) -> dict:
+    """
+    Create `users` users with `years` of history ending yesterday
+
+    Returns:
+        {"users": [usernames], "rows": {table: count}, "seconds": elapsed}
+    """
+    from sqlalchemy import insert
+
+    from app.database import Base, SessionLocal, engine
+    from app.models import Character, DietLog, ExerciseLog, SleepLog, User, WorkLog
+    from app.services.auth import get_password_hash
+
+    Base.metadata.create_all(bind=engine)
+    hashed_password = get_password_hash(PASSWORD)  # bcrypt is slow; every user shares one hash
+    tables = {"diet": DietLog, "exercise": ExerciseLog, "sleep": SleepLog, "work": WorkLog}
+    counts = {name: 0 for name in tables}
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    days = int(years * 365)
+    usernames = []
+    start = time.perf_counter()
+
+    db = SessionLocal()
+    try:
+        for index in range(users):
+            username = f"{USERNAME_PREFIX}{seed}_{index}"
+            rng = random.Random(f"{seed}-{index}")  # Per user, so partial runs resume with the same data
+            if db.query(User.id).filter(User.username == username).first():
+                usernames.append(username)  # Already generated with this seed
+                continue
+            persona_name = rng.choice(list(PERSONAS))
+            user = User(email=f"{username}@example.com", username=username, hashed_password=hashed_password,
+                        full_name=f"{persona_name.replace('_', ' ').title()} {index}",
+                        age=rng.randint(20, 60), weight=round(rng.uniform(50, 100), 1),
+                        height=round(rng.uniform(155, 195), 1), goal="improve_health",
+                        created_at=today - timedelta(days=days))
+            db.add(user)
+            db.flush()
+            db.add(Character(user_id=user.id))
+
+            pending = {name: [] for name in tables}
+            for offset in range(days, 0, -1):
+                if rng.random() < 0.08:  # Days with nothing logged
+                    continue
+                for name, rows in _day_rows(rng, user.id, PERSONAS[persona_name], today - timedelta(days=offset)).items():
+                    pending[name].extend(rows)
+                if sum(len(rows) for rows in pending.values()) >= batch_rows:
+                    for name, rows in pending.items():
+                        if rows:
+                            db.execute(insert(tables[name]), rows)
+                            counts[name] += len(rows)
+                    pending = {name: [] for name in tables}
+            for name, rows in pending.items():
+                if rows:
+                    db.execute(insert(tables[name]), rows)
+                    counts[name] += len(rows)
+            db.commit()
+            usernames.append(username)
+    finally:
+        db.close()
+    return {"users": usernames, "rows": counts, "seconds": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database-url", help="defaults to the bench SQLite database")
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from bench import app_harness  # noqa: F401  (points DATABASE_URL at the bench database if unset)
+
+    result = generate(args.users, args.years, args.seed)
+    total = sum(result["rows"].values())
+    print(f"{len(result['users'])} users, {total} log rows in {result['seconds']:.1f}s: "
+          + ", ".join(f"{name} {count}" for name, count in result["rows"].items()))
+
+
+if __name__ == "__main__":
+    main()
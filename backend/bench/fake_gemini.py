@@ -0,0 +1,207 @@
+"""
+Local stand-in for google.generativeai models with injectable latency
+Install with fake_gemini.install(gemini_service, latency=...) in benchmarks.
+"""
+import asyncio
+import copy
+import time
+from types import SimpleNamespace
+
+from app.services.context_cache import CacheHandle, ContextCacheBackend
+
+
+def _estimate_tokens(contents) -> int:
+    return len(str(contents)) // 4
+
+
+class FakeResponse:
+    """Mimics GenerateContentResponse.text and .usage_metadata"""
+
+    def __init__(self, text: str, usage=None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeStreamCall:
+    """Stands in for the gRPC call behind a streaming response"""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class FakeStreamResponse:
+    """
+    Mimics AsyncGenerateContentResponse: yields chunks `chunk_latency` apart
+
+    Closing the iterator before the last chunk cancels the call, as grpc.aio
+    does when an unfinished call is released.
+    """
+
+    def __init__(self, model: "FakeGenerativeModel", usage=None):
+        self.model = model
+        self.usage = usage
+        self.call = FakeStreamCall()
+        model.streams.append(self.call)
+
+    async def __aiter__(self):
+        words = self.model.reply.split()
+        sent = 0
+        try:
+            for i, word in enumerate(words):
+                await asyncio.sleep(self.model.chunk_latency)
+                self.model.chunks_sent += 1
+                sent += 1
+                yield FakeResponse(word + " ", self.usage if i == len(words) - 1 else None)
+        finally:
+            if sent < len(words):
+                self.call.cancel()
+
+
+class FakeChatSession:
+    def __init__(self, model: "FakeGenerativeModel", history: list):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, message: str) -> FakeResponse:
+        return self.model.generate_content(self.history + [message])
+
+    async def send_message_async(self, message: str, stream: bool = False):
+        return await self.model.generate_content_async(self.history + [message], stream=stream)
+
+
+class FakeGenerativeModel:
+    """
+    Answers every prompt after `latency` seconds
+
+    blocking=True makes the async methods sleep synchronously, reproducing
+    what calling the sync SDK from an async handler does to the event loop.
+
+    Usage metadata counts ~4 characters per token. The system instruction is
+    billed as input unless the model is bound to a context cache; each
+    uncached input token adds `token_latency` seconds.
+    """
+
+    def __init__(self, latency: float = 1.0, blocking: bool = False, reply: str = "Fake Pearl reply.",
+                 chunk_latency: float = 0.05, system_instruction: str = "", token_latency: float = 0.0):
+        self.latency = latency
+        self.blocking = blocking
+        self.reply = reply
+        self.chunk_latency = chunk_latency
+        self.system_instruction = system_instruction
+        self.token_latency = token_latency
+        self.cached_tokens = 0
+        self.calls = 0
+        self.chunks_sent = 0
+        self.streams: list = []
+        self.histories: list = []  # History passed to each start_chat
+        self.prompts: list = []  # Contents of each call (chat history + message for chats)
+
+    def _usage(self, contents):
+        prompt = _estimate_tokens(contents) + _estimate_tokens(self.system_instruction) + self.cached_tokens
+        return SimpleNamespace(
+            prompt_token_count=prompt,
+            cached_content_token_count=self.cached_tokens,
+            candidates_token_count=_estimate_tokens(self.reply)
+        )
+
+    def _delay(self, usage) -> float:
+        return self.latency + (usage.prompt_token_count - usage.cached_content_token_count) * self.token_latency
+
+    def generate_content(self, contents) -> FakeResponse:
+        self.calls += 1
+        self.prompts.append(contents)
+        usage = self._usage(contents)
+        time.sleep(self._delay(usage))
+        return FakeResponse(self.reply, usage)
+
+    async def generate_content_async(self, contents, stream: bool = False):
+        if self.blocking:
+            return self.generate_content(contents)
+        self.calls += 1
+        self.prompts.append(contents)
+        usage = self._usage(contents)
+        if stream:
+            await asyncio.sleep(self.chunk_latency + self._delay(usage) - self.latency)
+            return FakeStreamResponse(self, usage)
+        await asyncio.sleep(self._delay(usage))
+        return FakeResponse(self.reply, usage)
+
+    def start_chat(self, history: list = None) -> FakeChatSession:
+        self.histories.append(list(history or []))
+        return FakeChatSession(self, history)
+
+    def bound_to_cache(self, cached_tokens: int) -> "FakeGenerativeModel":
+        """Copy of this model whose system instruction comes from a context cache"""
+        model = copy.copy(self)
+        model.system_instruction = ""
+        model.cached_tokens = cached_tokens
+        return model
+
+
+class CachedContentNotFound(Exception):
+    """Stands in for the NotFound a request gets once its cache entry is gone"""
+
+
+class FakeContextCacheBackend(ContextCacheBackend):
+    """
+    In-memory context cache for FakeGenerativeModel
+
+    fail=True makes every create/extend raise, like an API without caching.
+    """
+
+    def __init__(self, base: FakeGenerativeModel, fail: bool = False):
+        self.base = base
+        self.fail = fail
+        self.created = 0
+        self.extended = 0
+        self.deleted = 0
+
+    def create(self, model_name: str, system_instruction: str, ttl: float) -> CacheHandle:
+        if self.fail:
+            raise RuntimeError("context caching unavailable")
+        self.created += 1
+        return CacheHandle(
+            name=f"cachedContents/fake-{self.created}",
+            expires_at=time.monotonic() + ttl,
+            tokens=_estimate_tokens(system_instruction)
+        )
+
+    def extend(self, handle: CacheHandle, ttl: float) -> CacheHandle:
+        if self.fail:
+            raise RuntimeError("context caching unavailable")
+        self.extended += 1
+        handle.expires_at = time.monotonic() + ttl
+        return handle
+
+    def delete(self, handle: CacheHandle) -> None:
+        self.deleted += 1
+
+    def model_for(self, handle: CacheHandle) -> FakeGenerativeModel:
+        return self.base.bound_to_cache(handle.tokens)
+
+    def is_unusable(self, error: Exception) -> bool:
+        return isinstance(error, CachedContentNotFound)
+
+
+def install(service, latency: float = 1.0, blocking: bool = False) -> FakeGenerativeModel:
+    """Swap a GeminiService's models for a shared fake"""
+    fake = FakeGenerativeModel(latency=latency, blocking=blocking)
+    service.model = fake
+    service.pearl_model = fake
+    service.fast_model = None
+    service.pearl_fast_model = None
+    service.router.fast_available = False
+    service.pearl_context = None
+    return fake
+
+
+def install_fast(service, latency: float = 0.2) -> FakeGenerativeModel:
+    """Give a GeminiService (after install()) a separate fake fast model"""
+    fake = FakeGenerativeModel(latency=latency, reply="Fake fast reply.")
+    service.fast_model = fake
+    service.pearl_fast_model = fake
+    service.router.fast_available = True
+    return fake
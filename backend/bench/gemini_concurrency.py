@@ -0,0 +1,67 @@
+"""
+Event-loop isolation under concurrent Pearl chats
+Fires N chats at a fake Gemini with injected latency while polling
+GET /api/character, and reports the poll latency with and without chats.
+Usage: python -m bench.gemini_concurrency [--chats 50] [--latency 1.0] [--blocking]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bench.app_harness import authenticated_client
+from bench import fake_gemini
+from app.services.gemini import gemini_service
+
+
+async def _poll(client, stop: asyncio.Event, interval: float = 0.05) -> list:
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/api/character")
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+
+def _summary(samples: list) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"n={len(samples):4d}  p50={statistics.median(samples):7.1f}ms  p95={p95:7.1f}ms  max={max(samples):7.1f}ms"
+
+
+async def main(chats: int, latency: float, blocking: bool):
+    fake_gemini.install(gemini_service, latency=latency, blocking=blocking)
+    client = await authenticated_client()
+
+    stop = asyncio.Event()
+    poller = asyncio.create_task(_poll(client, stop))
+    await asyncio.sleep(1.0)
+    stop.set()
+    idle = await poller
+
+    stop = asyncio.Event()
+    poller = asyncio.create_task(_poll(client, stop))
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        client.post("/api/assistant/pearl/chat", json={"message": f"hi #{i}"}, timeout=120)
+        for i in range(chats)
+    ))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    busy = await poller
+
+    statuses = statistics.multimode(r.status_code for r in responses)
+    print(f"{chats} chats, {latency:.1f}s fake latency, blocking={blocking}: {elapsed:.1f}s total, status {statuses}")
+    print(f"GET /api/character idle: {_summary(idle)}")
+    print(f"GET /api/character busy: {_summary(busy)}")
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--blocking", action="store_true", help="simulate the old sync SDK calls")
+    args = parser.parse_args()
+    asyncio.run(main(args.chats, args.latency, args.blocking))
@@ -0,0 +1,81 @@
+"""
+Gemini usage accounting: per-operation metrics and per-user daily totals
+Drives advice, Pearl chat (plain and streamed) and workplace scenarios
+against a fake Gemini, including a failing call, then prints the per-operation
+view from /metrics and the user's totals from GET /api/assistant/usage.
+Usage: python -m bench.gemini_usage [--messages 10] [--latency 0.2]
+"""
+import argparse
+import asyncio
+
+from bench import fake_gemini
+from bench.app_harness import authenticated_client
+from app.config import settings
+from app.services.gemini import gemini_service
+from app.services.llm_usage import gemini_cost, gemini_prompt_tokens, gemini_requests, gemini_seconds
+from app.services.llm_usage import usage_accounting
+
+OPERATIONS = ("advice", "pearl_chat", "pearl_stream", "workplace_scenario")
+
+
+async def main(messages: int, latency: float):
+    settings.LLM_CACHE_ENABLED = False
+    settings.PEARL_ANSWER_CACHE_ENABLED = False
+    gemini_service.answer_cache = None
+    settings.WORKPLACE_POOL_ENABLED = False
+    fake = fake_gemini.install(gemini_service, latency=latency)
+    fake.chunk_latency = 0.01
+    client = await authenticated_client()
+
+    conversation_id = None
+    for i in range(messages):
+        response = await client.post("/api/assistant/pearl/chat", json={
+            "message": f"I had {i + 1} bowls of rice, is that a lot?", "conversation_id": conversation_id
+        })
+        response.raise_for_status()
+        conversation_id = response.json()["conversation_id"]
+        async with client.stream("POST", "/api/assistant/pearl/chat/stream",
+                                 json={"message": "And noodles?", "conversation_id": conversation_id}) as stream:
+            async for _ in stream.aiter_text():
+                pass
+        (await client.post("/api/assistant/advice", json={"query": f"question {i}"})).raise_for_status()
+        (await client.post("/api/assistant/workplace-scenario")).raise_for_status()
+
+    # One failing upstream call
+    async def broken(contents, stream=False):
+        raise ConnectionError("upstream reset")
+    fake.generate_content_async, healthy = broken, fake.generate_content_async
+    await client.post("/api/assistant/advice", json={"query": "fails"})
+    fake.generate_content_async = healthy
+
+    print(f"{'operation':<20} {'calls':>5} {'errors':>6} {'mean s':>7} {'mean prompt tok':>16} {'cost $':>10}")
+    for operation in OPERATIONS:
+        ok = gemini_requests.value(operation=operation, result="ok")
+        calls = gemini_seconds.count(operation=operation)
+        prompts = gemini_prompt_tokens.count(operation=operation)
+        print(f"{operation:<20} {calls:>5} {int(calls - ok):>6} "
+              f"{gemini_seconds.sum(operation=operation) / max(calls, 1):7.3f} "
+              f"{gemini_prompt_tokens.sum(operation=operation) / max(prompts, 1):16.0f} "
+              f"{gemini_cost.value(operation=operation):10.6f}")
+    errors = gemini_requests.value(operation="advice", result="ConnectionError")
+    assert errors == 1, "the failing call should be counted by error type"
+
+    # Queryable before and after the batch write
+    before = (await client.get("/api/assistant/usage")).json()
+    written = usage_accounting.flush()
+    after = (await client.get("/api/assistant/usage")).json()
+    assert before["total"] == after["total"], (before["total"], after["total"])
+    print(f"flushed {written} user/day/operation rows; GET /api/assistant/usage total: {after['total']}")
+    for row in after["days"]:
+        print(f"  {row['day']} {row['operation']:<20} requests {row['requests']:>3}  errors {row['errors']}  "
+              f"prompt {row['prompt_tokens']:>6}  response {row['response_tokens']:>4}  ${row['cost_usd']:.6f}")
+
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.latency))
@@ -0,0 +1,83 @@
+"""
+Startup import budget (CI guard against slow cold starts)
+Imports app.main in fresh interpreters under `python -X importtime` and
+fails if any of these is true:
+- the fastest of --runs imports takes longer than --budget seconds
+- a module in LAZY is loaded at import (those libraries must load on first
+  use or in the lifespan pre-warm)
+- importing touches the database (the schema is created at startup)
+
+Prints the slowest modules by self time, which is where to look when the
+budget is exceeded.
+Usage: python -m bench.import_time [--budget 2.0] [--runs 3] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Tuple
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+# Modules that must not be imported by `import app.main`
+LAZY = ("google.generativeai", "passlib", "jose", "numpy")
+
+
+def import_app(database_url: str) -> Dict[str, Tuple[int, int]]:
+    """module -> (self us, cumulative us) for one `import app.main` in a fresh interpreter"""
+    env = {**os.environ, "DATABASE_URL": database_url, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=BACKEND, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{result.stderr[-2000:]}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # ~1.1-1.2s locally; the margin absorbs slower CI runners, not new eager imports
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds for `import app.main`")
+    parser.add_argument("--runs", type=int, default=3, help="imports to take the fastest of")
+    parser.add_argument("--top", type=int, default=15, help="slowest modules to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = Path(tmp) / "import_time.db"
+        runs = [import_app(f"sqlite:///{database}") for _ in range(args.runs)]
+        touched_database = database.exists()
+    fastest = min(runs, key=lambda modules: modules["app.main"][1])
+    seconds = fastest["app.main"][1] / 1e6
+
+    print(f"{'module':<60} {'self ms':>8} {'cumulative ms':>14}")
+    for name, (self_us, cumulative_us) in sorted(fastest.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"{name:<60} {self_us / 1000:>8.1f} {cumulative_us / 1000:>14.1f}")
+    print(f"\nimport app.main: {seconds:.2f}s (fastest of {args.runs}), budget {args.budget:.2f}s")
+
+    failures = []
+    if seconds > args.budget:
+        failures.append(f"import app.main took {seconds:.2f}s, over the {args.budget:.2f}s budget")
+    for module in LAZY:
+        if any(name == module or name.startswith(module + ".") for name in fastest):
+            failures.append(f"{module} is imported by app.main; import it on first use instead")
+    if touched_database:
+        failures.append("importing app.main touched the database; create the schema at startup (init_db)")
+
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("OK: within budget, no eager SDK imports, no database access")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
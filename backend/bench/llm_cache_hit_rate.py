@@ -0,0 +1,104 @@
+"""
+LLM response cache: hit rate and latency saved on a simulated population
+Draws user states around typical values (plus a share of idle users still at
+the new-user defaults, since metrics only move when activity is logged),
+requests advice and scenarios
+through GeminiService with a fake model, and reports the cache metrics.
+Also checks that an answer to one user's question is never served to another.
+Usage: python -m bench.llm_cache_hit_rate [--requests 2000] [--latency 0.2] [--band 5] [--idle-share 0.3]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import bench.app_harness  # noqa: F401  (points the app at the bench database)
+from bench import fake_gemini
+from app.config import settings
+from app.metrics import registry
+from app.services.gemini import gemini_service
+from app.services.llm_cache import llm_cache
+
+
+DEFAULT_STATE = {"stamina": 80, "energy": 80, "nutrition": 60, "mood": 60, "stress": 40}
+
+
+def _random_state(rng: random.Random) -> dict:
+    def metric(mean, spread):
+        return max(0.0, min(100.0, rng.gauss(mean, spread)))
+    return {
+        "stamina": metric(70, 12), "energy": metric(70, 12), "nutrition": metric(60, 15),
+        "mood": metric(55, 12), "stress": metric(45, 12),
+    }
+
+
+EMPTY_SUMMARY = {
+    "meals": 0, "calories": 0.0, "exercises": 0, "exercise_minutes": 0.0, "sleep_nights": 0, "avg_sleep_hours": 0.0,
+}
+
+
+def _random_summary(rng: random.Random) -> dict:
+    """A week of activity totals, as AssistantContext.log_summary"""
+    meals = rng.randint(8, 21)
+    exercise = [rng.choice([20, 30, 45, 60]) for _ in range(rng.randint(0, 5))]
+    sleep = [rng.gauss(7, 0.7) for _ in range(7)]
+    return {
+        "meals": meals,
+        "calories": sum(rng.gauss(600, 150) for _ in range(meals)),
+        "exercises": len(exercise),
+        "exercise_minutes": float(sum(exercise)),
+        "sleep_nights": len(sleep),
+        "avg_sleep_hours": sum(sleep) / len(sleep),
+    }
+
+
+async def check_query_isolation():
+    state = {"stamina": 70, "energy": 70, "nutrition": 60, "mood": 55, "stress": 45}
+    logs = EMPTY_SUMMARY
+    fake = gemini_service.model
+    fake.reply = "answer for user 1"
+    await gemini_service.generate_health_advice(state, logs, "is coffee ok?", user_id=1)
+    fake.reply = "answer for user 2"
+    answer = await gemini_service.generate_health_advice(state, logs, "is coffee ok?", user_id=2)
+    assert answer == "answer for user 2", "user 2 was served user 1's answer"
+    print("ok  free-text answers are scoped to their user")
+
+
+async def main(requests: int, latency: float, seed: int, band: int, idle_share: float):
+    settings.LLM_CACHE_BAND = band
+    fake_gemini.install(gemini_service, latency=latency)
+    llm_cache.memory.clear()
+    rng = random.Random(seed)
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        idle = rng.random() < idle_share
+        state = dict(DEFAULT_STATE) if idle else _random_state(rng)
+        logs = EMPTY_SUMMARY if idle else _random_summary(rng)
+        if rng.random() < 0.5:
+            await gemini_service.generate_health_advice(state, logs)
+        else:
+            await gemini_service.generate_workplace_scenario(state)
+    elapsed = time.perf_counter() - start
+
+    lookups = registry.counter("llm_cache_requests_total", "")
+    saved = registry.counter("llm_cache_latency_saved_seconds_total", "")
+    for kind in ("advice", "workplace_scenario"):
+        hits = lookups.value(kind=kind, result="memory") + lookups.value(kind=kind, result="db")
+        total = hits + lookups.value(kind=kind, result="miss")
+        print(f"{kind:20s} hit rate {hits / max(total, 1):6.1%} of {int(total)}, "
+              f"LLM time saved {saved.value(kind=kind):7.1f}s")
+    print(f"{requests} requests in {elapsed:.1f}s, {band}-point bands, {latency:.2f}s fake LLM latency")
+
+    await check_query_isolation()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--band", type=int, default=5)
+    parser.add_argument("--idle-share", type=float, default=0.3)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency, args.seed, args.band, args.idle_share))
@@ -0,0 +1,99 @@
+"""
+LLM scheduler: priority, per-user fairness, rate limiting and load shedding
+Drives GeminiService against a fake Gemini:
+  1. one user floods 40 chats, then five other users send one chat each
+  2. 20 background scenario generations queued behind interactive chats
+  3. the upstream rate limit caps the call start rate
+  4. overload past the queue deadline returns 429 over HTTP
+Usage: python -m bench.llm_scheduler [--latency 0.2] [--concurrency 4]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bench import fake_gemini
+from bench.app_harness import authenticated_client
+from app.services.gemini import gemini_service
+from app.services.resilience import PriorityScheduler
+
+
+def _scheduler(concurrency: int, rate: float = None, timeout: float = 60.0) -> PriorityScheduler:
+    return PriorityScheduler(
+        "bench",
+        max_concurrency=concurrency,
+        queue_timeouts={p: timeout for p in PriorityScheduler.PRIORITIES},
+        rate_per_second=rate,
+        burst=1
+    )
+
+
+async def _timed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+async def fairness(concurrency: int, latency: float) -> None:
+    gemini_service.scheduler = _scheduler(concurrency)
+    heavy = [asyncio.create_task(_timed(gemini_service.pearl_chat("hi", user_id=1))) for _ in range(40)]
+    await asyncio.sleep(0.01)
+    light = [asyncio.create_task(_timed(gemini_service.pearl_chat("hi", user_id=uid))) for uid in range(2, 7)]
+    heavy_t, light_t = await asyncio.gather(asyncio.gather(*heavy), asyncio.gather(*light))
+    fifo = 40 * latency / concurrency + latency
+    print(f"fairness: light users p50 {statistics.median(light_t):.2f}s max {max(light_t):.2f}s "
+          f"(FIFO would be ~{fifo:.1f}s); heavy user max {max(heavy_t):.2f}s")
+    assert max(light_t) < fifo / 2, "light users waited behind the heavy user's backlog"
+
+
+async def priority(concurrency: int, latency: float) -> None:
+    gemini_service.scheduler = _scheduler(concurrency)
+    background = [asyncio.create_task(_timed(gemini_service.generate_workplace_scenario(
+        {"stamina": 50}, use_cache=False, priority=PriorityScheduler.BACKGROUND
+    ))) for _ in range(20)]
+    await asyncio.sleep(0.01)
+    chats = [asyncio.create_task(_timed(gemini_service.pearl_chat("hi", user_id=uid))) for uid in range(10)]
+    chat_t = await asyncio.gather(*chats)
+    background_t = await asyncio.gather(*background)
+    print(f"priority: interactive max {max(chat_t):.2f}s while 20 background jobs queued "
+          f"(background finished after {max(background_t):.2f}s)")
+    assert max(chat_t) < 2 * latency + 10 * latency / concurrency + 0.1
+
+
+async def rate_limit(rate: float) -> None:
+    gemini_service.scheduler = _scheduler(concurrency=50, rate=rate)
+    start = time.perf_counter()
+    await asyncio.gather(*(gemini_service.pearl_chat("hi", user_id=uid) for uid in range(20)))
+    elapsed = time.perf_counter() - start
+    print(f"rate limit: 20 calls at {rate:.0f}/s took {elapsed:.2f}s (expected >= {19 / rate:.2f}s)")
+    assert elapsed >= 19 / rate * 0.9
+
+
+async def shedding(latency: float) -> None:
+    gemini_service.scheduler = _scheduler(concurrency=1, timeout=latency * 2)
+    client = await authenticated_client()
+    responses = await asyncio.gather(*(
+        client.post("/api/assistant/pearl/chat", json={"message": f"hi #{i}"}, timeout=60) for i in range(10)
+    ))
+    statuses = [r.status_code for r in responses]
+    shed = [r for r in responses if r.status_code == 429]
+    print(f"shedding: {statuses.count(200)} served, {len(shed)} rejected with 429 "
+          f"(Retry-After {shed[0].headers.get('retry-after') if shed else None})")
+    assert shed, "overload was not shed"
+    await client.aclose()
+
+
+async def main(latency: float, concurrency: int):
+    fake_gemini.install(gemini_service, latency=latency)
+    await fairness(concurrency, latency)
+    await priority(concurrency, latency)
+    await rate_limit(rate=20)
+    await shedding(latency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.concurrency))
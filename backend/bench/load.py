@@ -0,0 +1,188 @@
+"""
+HTTP load test against a local app instance
+Generates users with bench.data_generator (if missing), starts bench.serve
+(unless --url points at a running instance), logs every user in, then runs
+--concurrency virtual users for --duration seconds. Each virtual user
+repeatedly plays a weighted scenario: log a meal, poll the character, open
+the stats screen, or chat with Pearl (a fake Gemini when started here).
+Per-endpoint throughput and p50/p95/p99 are printed and saved as JSON to
+bench/results/ for `python -m bench.report compare`.
+Usage: python -m bench.load [--users 50] [--years 2] [--concurrency 20] [--duration 30] [--url URL]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+from bench import data_generator, report
+
+# scenario -> weight; roughly what the app's screens do
+MIX = {"log_meal": 25, "poll_character": 40, "open_stats": 25, "chat": 10}
+
+
+class VirtualUser:
+    """One logged-in user playing scenarios in a closed loop"""
+
+    def __init__(self, client: httpx.AsyncClient, token: str, rng: random.Random, samples: List[report.Sample]):
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rng = rng
+        self.samples = samples
+        self.conversation_id: Optional[int] = None
+
+    async def request(self, method: str, endpoint: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.samples.append((f"{method} {endpoint}", 0, time.perf_counter() - start))
+            return None
+        self.samples.append((f"{method} {endpoint}", response.status_code, time.perf_counter() - start))
+        return response
+
+    async def log_meal(self):
+        food, calories, protein, carbs, fat, fiber = self.rng.choice(
+            [meal for meals in data_generator.MEALS.values() for meal in meals])
+        await self.request("POST", "/api/diet", "/api/diet", json={
+            "food_name": food, "calories": calories, "protein": protein, "carbs": carbs, "fat": fat, "fiber": fiber,
+        })
+        await self.request("GET", "/api/character", "/api/character")
+
+    async def poll_character(self):
+        await self.request("GET", "/api/character", "/api/character")
+
+    async def open_stats(self):
+        days = self.rng.choice([7, 30])
+        await asyncio.gather(
+            self.request("GET", "/api/work/stats", "/api/work/stats", params={"days": days}),
+            self.request("GET", "/api/diet", "/api/diet", params={"days": days}),
+            self.request("GET", "/api/sleep", "/api/sleep", params={"days": days}),
+            self.request("GET", "/api/exercise", "/api/exercise", params={"days": days}),
+        )
+
+    async def chat(self):
+        message = self.rng.choice(["I had ramen for lunch, is that bad?", "Why am I so tired?",
+                                   "What should I eat before a run?", "How do I lower stress?"])
+        response = await self.request("POST", "/api/assistant/pearl/chat", "/api/assistant/pearl/chat",
+                                      json={"message": message, "conversation_id": self.conversation_id})
+        if response is not None and response.status_code == 200:
+            self.conversation_id = response.json().get("conversation_id")
+
+    async def run(self, deadline: float, think: float):
+        scenarios, weights = zip(*MIX.items())
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(scenarios, weights)[0])()
+            if think:
+                await asyncio.sleep(self.rng.expovariate(1 / think))
+
+
+async def login(client: httpx.AsyncClient, usernames: List[str]) -> List[str]:
+    tokens = []
+    for username in usernames:
+        response = await client.post("/api/auth/login",
+                                     data={"username": username, "password": data_generator.PASSWORD})
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"bench.serve exited with {server.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("bench.serve did not become ready")
+
+
+async def run_load(url: str, usernames: List[str], concurrency: int, duration: float, think: float,
+                   seed: int, server: Optional[subprocess.Popen] = None) -> tuple:
+    limits = httpx.Limits(max_connections=concurrency * 4, max_keepalive_connections=concurrency * 4)
+    async with httpx.AsyncClient(base_url=url, timeout=60.0, limits=limits) as client:
+        if server is not None:
+            await _wait_ready(client, server)
+        tokens = await login(client, usernames)
+        samples: List[report.Sample] = []
+        rng = random.Random(seed)
+        users = [VirtualUser(client, tokens[i % len(tokens)], random.Random(rng.random()), samples)
+                 for i in range(concurrency)]
+        start = time.perf_counter()
+        await asyncio.gather(*(user.run(start + duration, think) for user in users))
+        return samples, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="generated users to log in as")
+    parser.add_argument("--years", type=float, default=2.0, help="history per generated user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--think", type=float, default=0.0, help="mean seconds between scenarios (0: closed loop)")
+    parser.add_argument("--gemini-latency", type=float, default=0.8, help="fake Gemini reply time for bench.serve")
+    parser.add_argument("--url", help="running app to load instead of starting bench.serve")
+    parser.add_argument("--database-url", help="defaults to the bench SQLite database")
+    parser.add_argument("--output", type=Path, help="report path (default bench/results/load-<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from bench import app_harness  # noqa: F401  (points DATABASE_URL at the bench database if unset)
+
+    generated = data_generator.generate(args.users, args.years, args.seed)
+    print(f"{len(generated['users'])} users ready ({sum(generated['rows'].values())} new log rows)")
+
+    server = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ)
+        # Up to four requests per virtual user are in flight (open_stats); a
+        # smaller pool stalls the server's event loop on connection checkout
+        env.setdefault("DATABASE_POOL_SIZE", str(args.concurrency * 4))
+        server = subprocess.Popen(
+            [sys.executable, "-m", "bench.serve", "--port", str(port), "--gemini-latency", str(args.gemini_latency)],
+            cwd=Path(__file__).resolve().parent.parent, env=env,
+        )
+    try:
+        samples, elapsed = asyncio.run(run_load(url, generated["users"], args.concurrency, args.duration,
+                                                args.think, args.seed, server))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    config = {key: getattr(args, key) for key in ("users", "years", "seed", "concurrency", "duration", "think")}
+    config.update(url=args.url or "bench.serve", mix=MIX,
+                  database=os.environ["DATABASE_URL"].split(":", 1)[0],
+                  gemini_latency=None if args.url else args.gemini_latency)
+    result = report.build_report(samples, elapsed, config)
+    report.show(result)
+    print(f"saved {report.save(result, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Event loop blocking call sites
+Runs the bench.query_budgets tour of every API route with the loop monitor
+sampling every --interval seconds and the blocking-call detector on at a low
+--threshold, then lists the app call sites that held the event loop, i.e.
+sync work inside `async def` handlers. A final Pearl chat against a Gemini
+fake that blocks must be attributed to app/services/gemini.py.
+Usage: python -m bench.loop_monitor [--rounds 5] [--interval 0.002] [--threshold 0.005]
+"""
+import argparse
+import asyncio
+
+from bench import fake_gemini
+from bench.app_harness import authenticated_client
+from bench.query_budgets import PROFILING_TOKEN, Recorder, exercise_routes
+from bench.usda_stub import FaultyUSDATransport
+from app.config import settings
+from app.loop_monitor import loop_blocked, loop_lag, loop_monitor
+from app.services.gemini import gemini_service
+from app.services.usda import usda_service
+
+
+async def main(rounds: int, interval: float, threshold: float):
+    settings.LLM_CACHE_ENABLED = False
+    settings.WORKPLACE_POOL_ENABLED = False
+    settings.PROFILING_TOKEN = PROFILING_TOKEN
+    gemini_service.answer_cache = None
+    fake_gemini.install(gemini_service, latency=0)
+    usda_service._transport = FaultyUSDATransport()
+    usda_service.api_key = "stub"
+
+    client = await authenticated_client()
+    loop_monitor.start(interval=interval, threshold=threshold, detect=True)
+    recorder = Recorder(client)
+    for round_number in range(rounds):
+        await exercise_routes(recorder, round_number)
+
+    fake_gemini.install(gemini_service, latency=max(0.2, threshold * 20), blocking=True)
+    (await client.post("/api/assistant/pearl/chat", json={"message": "Blocking?"})).raise_for_status()
+    await asyncio.sleep(interval * 2)
+    await loop_monitor.stop()
+    await client.aclose()
+
+    print(f"lag samples: {loop_lag.count()}  mean {loop_lag.sum() / max(1, loop_lag.count()) * 1000:.2f} ms  "
+          f"over {threshold * 1000:.0f} ms: {loop_blocked.value():.0f}")
+    print(f"\n{'blocking call site':<64} {'count':>5} {'max ms':>7}  blocked in")
+    report = loop_monitor.report()
+    for entry in report:
+        print(f"{entry['site']:<64} {entry['count']:>5} {entry['max_seconds'] * 1000:>7.1f}  {entry['leaf']}")
+    assert any(entry["site"].startswith("app/services/gemini.py") for entry in report), \
+        "a sync Gemini call inside an async handler must be attributed to gemini.py"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.002, help="lag sampling interval (seconds)")
+    parser.add_argument("--threshold", type=float, default=0.005, help="lag that counts as blocked (seconds)")
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.interval, args.threshold))
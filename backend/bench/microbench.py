@@ -0,0 +1,246 @@
+"""
+Microbenchmarks for the pure hot functions, compared against a stored baseline
+Times the health_calculator formulas and work._recalculate_and_update_character
+(against an in-memory SQLite database) over a seeded set of generated days, and
+USDAService.parse_nutrition, _extract_calories and _format_description over the
+USDA corpus (bench/usda_corpus.py). Each case reports the best and median time
+per call over --repeat rounds.
+
+Cases are compared with the stored baseline (bench/data/microbench_baseline.json)
+relative to a fixed pure-Python reference workload timed in the same run, which
+cancels most of the drift between runs on shared machines. A case slower than
+the baseline by more than --threshold fails the run. Save a new baseline on the
+same machine when comparing across commits on different hardware.
+Usage:
+    python -m bench.microbench --save-baseline
+    python -m bench.microbench [--threshold 0.25] [--repeat 20] [--filter usda]
+"""
+import argparse
+import gc
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from bench import app_harness  # noqa: F401  (points DATABASE_URL at the bench database)
+from bench import data_generator
+from bench.report import git_commit
+from bench.usda_corpus import load_corpus
+
+BASELINE = Path(__file__).resolve().parent / "data" / "microbench_baseline.json"
+
+Case = Tuple[Callable, List[tuple]]  # function, argument tuples (one call each)
+
+REFERENCE = "reference/python_loop"
+
+
+def _reference_workload(n: int) -> int:
+    """Fixed mix of dict, arithmetic and string work, timed to normalise for machine speed"""
+    totals = {}
+    for i in range(n):
+        key = "k" + str(i % 7)
+        totals[key] = totals.get(key, 0) + i * 3 % 11
+    return sum(totals.values())
+
+
+def _days(count: int, seed: int) -> List[dict]:
+    """Generated days of logs, as the rows bench.data_generator inserts"""
+    rng = random.Random(seed)
+    persona_names = list(data_generator.PERSONAS)
+    start = datetime(2024, 1, 1)
+    return [data_generator._day_rows(rng, 1, data_generator.PERSONAS[rng.choice(persona_names)],
+                                     start + timedelta(days=i)) for i in range(count)]
+
+
+def _calculator_cases(days: List[dict]) -> Dict[str, Case]:
+    from app.services import health_calculator as hc
+
+    diets, energy, stress, mood, xp = [], [], [], [], []
+    for day in days:
+        calories_in = sum(row["calories"] for row in day["diet"])
+        exercise_minutes = sum(row["duration_minutes"] for row in day["exercise"])
+        calories_out = sum(row["calories_burned"] for row in day["exercise"]) + 500
+        sleep_hours = sum(row["duration_hours"] for row in day["sleep"])
+        work_hours = sum(row["duration_hours"] for row in day["work"])
+        intensity = day["work"][0]["intensity"] if day["work"] else 3
+        pranked = bool(day["work"] and day["work"][0]["pranked_boss"])
+        diets.append((day["diet"],))
+        energy.append((calories_in, calories_out, sleep_hours, work_hours, intensity))
+        stress.append((work_hours, intensity, int(exercise_minutes), sleep_hours, pranked))
+        mood.append((80 - work_hours * 2, 70 + sleep_hours, 60.0, 40 + work_hours * 3))
+        xp.append((bool(day["diet"]), bool(day["exercise"]), bool(day["sleep"]), work_hours, intensity, 1,
+                   calories_in > 1800, pranked))
+    return {
+        "health/calculate_nutrition_score": (hc.calculate_nutrition_score, diets),
+        "health/calculate_energy_change": (hc.calculate_energy_change, energy),
+        "health/calculate_stress_change": (hc.calculate_stress_change, stress),
+        "health/calculate_mood_score": (hc.calculate_mood_score, mood),
+        "health/calculate_xp_gain": (hc.calculate_xp_gain, xp),
+    }
+
+
+def _recalculate_case(days: List[dict]) -> Case:
+    """_recalculate_and_update_character against an in-memory database (it commits and refreshes)"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from app.database import Base
+    from app.models import Character, DietLog, ExerciseLog, SleepLog, User, WorkLog
+    from app.routers.work import _recalculate_and_update_character
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    user = User(email="micro@example.com", username="micro", hashed_password="x")
+    db.add(user)
+    db.flush()
+    character = Character(user_id=user.id)
+    db.add(character)
+    db.commit()
+
+    calls = [(db, character, [DietLog(**row) for row in day["diet"]],
+              [ExerciseLog(**row) for row in day["exercise"]], [SleepLog(**row) for row in day["sleep"]],
+              [WorkLog(**row) for row in day["work"]]) for day in days]
+    return _recalculate_and_update_character, calls
+
+
+def _usda_cases() -> Dict[str, Case]:
+    from app.services.usda import usda_service
+
+    corpus = load_corpus()
+    foods = corpus["search"] + corpus["details"]
+    return {
+        "usda/parse_nutrition": (usda_service.parse_nutrition, [(food,) for food in foods]),
+        "usda/_extract_calories": (usda_service._extract_calories, [(food,) for food in corpus["search"]]),
+        "usda/_format_description": (usda_service._format_description,
+                                     [(food.get("description", ""),) for food in foods]),
+    }
+
+
+def build_cases(seed: int = 42, days: int = 500) -> Dict[str, Case]:
+    generated = _days(days, seed)
+    cases = {REFERENCE: (_reference_workload, [(50,)] * 100)}
+    cases.update(_calculator_cases(generated))
+    cases["work/_recalculate_and_update_character"] = _recalculate_case(generated[:100])
+    cases.update(_usda_cases())
+    return cases
+
+
+def measure(cases: Dict[str, Case], repeat: int, pass_seconds: float = 0.05) -> Dict[str, dict]:
+    """
+    Best and median microseconds per call for each case over `repeat` rounds
+
+    Each pass runs through a case's calls enough times to take about
+    `pass_seconds`. Rounds visit every case in turn, so slow spells on the
+    machine hit all cases (and the reference) alike instead of whichever ran
+    then. GC is off while timing, as with timeit.
+    """
+    def one_pass(func: Callable, calls: List[tuple], loops: int) -> float:
+        start = time.perf_counter()
+        for _ in range(loops):
+            for args in calls:
+                func(*args)
+        return time.perf_counter() - start
+
+    # One untimed pass per case warms caches and lazy imports and sizes the loops
+    loops = {name: max(1, math.ceil(pass_seconds / max(one_pass(func, calls, 1), 1e-9)))
+             for name, (func, calls) in cases.items()}
+    per_call: Dict[str, List[float]] = {name: [] for name in cases}
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for name, (func, calls) in cases.items():
+                per_call[name].append(one_pass(func, calls, loops[name]) / (loops[name] * len(calls)) * 1e6)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return {name: {"min_us": round(min(times), 4), "median_us": round(statistics.median(times), 4),
+                   "calls": len(cases[name][1]) * loops[name]}
+            for name, times in per_call.items()}
+
+
+def _environment() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform()}
+
+
+def compare(results: Dict[str, dict], baseline: dict, threshold: float) -> List[str]:
+    """
+    Print each case against the baseline, both raw and relative to the
+    reference workload; returns the cases whose relative time regressed past `threshold`
+    """
+    regressions = []
+    if baseline.get("environment") != _environment():
+        print(f"note: baseline was recorded on {baseline.get('environment')}; timings may not be comparable")
+    speed = results[REFERENCE]["min_us"] / baseline["cases"][REFERENCE]["min_us"]
+    print(f"reference workload: {speed - 1:+.0%} vs baseline (machine speed drift, factored out below)")
+    print(f"{'case':<44} {'baseline us':>12} {'now us':>10} {'raw':>6} {'change':>8}")
+    for name, result in results.items():
+        if name == REFERENCE:
+            continue
+        base = baseline["cases"].get(name)
+        if base is None:
+            print(f"{name:<44} {'-':>12} {result['min_us']:>10.3f}        new")
+            continue
+        raw = result["min_us"] / base["min_us"] - 1
+        change = (raw + 1) / speed - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(f"{name}: {base['min_us']:.3f}us -> {result['min_us']:.3f}us "
+                               f"({change:+.0%} relative to the reference)")
+        print(f"{name:<44} {base['min_us']:>12.3f} {result['min_us']:>10.3f} {raw:>+6.0%} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE}")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    args = parser.parse_args()
+
+    cases = build_cases()
+    if args.filter:
+        cases = {name: case for name, case in cases.items() if args.filter in name or name == REFERENCE}
+    results = measure(cases, args.repeat)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_commit(), "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                       "environment": _environment(), "cases": results}, f, indent=2)
+        for name, result in results.items():
+            print(f"{name:<44} {result['min_us']:>10.3f} us  (median {result['median_us']:.3f})")
+        print(f"saved baseline to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        for name, result in results.items():
+            print(f"{name:<44} {result['min_us']:>10.3f} us  (median {result['median_us']:.3f})")
+        print(f"no baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"\nOK: no case slower than the baseline by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Latency-aware model routing: fallback and recovery
+Sends Pearl chats against a fake primary and fast model. The primary slows
+down past the SLO part-way through, then recovers; prints which route served
+each phase and the resulting latency. Also checks that summaries go to the
+fast model and oversized prompts skip the primary.
+Usage: python -m bench.model_routing [--calls 60] [--slo 0.5]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bench import fake_gemini
+from app.services.gemini import gemini_service
+from app.services.model_router import route_failures, route_requests
+
+
+def _routes(operation: str) -> dict:
+    return {
+        (route, reason): route_requests.value(operation=operation, route=route, reason=reason)
+        for route in ("primary", "fast") for reason in ("default", "slo", "probe", "prompt_size", "operation")
+    }
+
+
+async def _phase(label: str, calls: int) -> None:
+    before = _routes("pearl_chat")
+    latencies = []
+    for i in range(calls):
+        start = time.perf_counter()
+        await gemini_service.pearl_chat(f"Question {i} about lunch", user_id=1)
+        latencies.append(time.perf_counter() - start)
+    after = _routes("pearl_chat")
+    served = {f"{route}/{reason}": int(after[key] - before[key]) for key in after
+              for route, reason in [key] if after[key] - before[key]}
+    print(f"{label:<20} p50 {statistics.median(latencies) * 1000:6.0f}ms  "
+          f"max {max(latencies) * 1000:6.0f}ms  routes {served}")
+
+
+async def main(calls: int, slo: float):
+    gemini_service.answer_cache = None
+    primary = fake_gemini.install(gemini_service, latency=0.1)
+    fake_gemini.install_fast(gemini_service, latency=0.05)
+    router = gemini_service.router
+    router.slos["pearl_chat"] = slo
+
+    await _phase("primary healthy", calls)
+    primary.latency = slo * 2
+    await _phase("primary slow", calls)
+    print(f"  degraded: {router.status()['degraded']}")
+    assert "pearl_chat" in router.status()["degraded"]
+    primary.latency = 0.1
+    await _phase("primary recovered", calls)
+    await _phase("after recovery", calls)
+    assert "pearl_chat" not in router.status()["degraded"], router.status()
+
+    before = _routes("summarize")
+    await gemini_service.summarize_conversation("", [("user", "hi"), ("model", "hello")], 100)
+    assert _routes("summarize")[("fast", "operation")] - before[("fast", "operation")] == 1
+    big = "rice " * (router.large_prompt_tokens * 2)
+    before = _routes("pearl_chat")
+    await gemini_service.pearl_chat(big, user_id=1)
+    assert _routes("pearl_chat")[("fast", "prompt_size")] - before[("fast", "prompt_size")] == 1
+    print("summaries -> fast (operation); oversized prompt -> fast (prompt_size)")
+
+    # Failed calls are counted separately and stay out of the latency window
+    async def timing_out(contents, stream=False):
+        await asyncio.sleep(slo * 2)
+        raise TimeoutError("fake deadline exceeded")
+
+    samples = list(router._tracker("primary", "pearl_chat").samples)
+    failures = route_failures.value(route="primary", operation="pearl_chat", error="TimeoutError")
+    primary.generate_content_async = timing_out
+    for i in range(3):
+        await gemini_service.pearl_chat(f"Failing question {i}", user_id=1)
+    del primary.generate_content_async
+    assert list(router._tracker("primary", "pearl_chat").samples) == samples, "failures must not be timed"
+    assert route_failures.value(route="primary", operation="pearl_chat", error="TimeoutError") - failures == 3
+    print("failed calls -> gemini_route_failures_total, not the latency window")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--slo", type=float, default=0.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.calls, args.slo))
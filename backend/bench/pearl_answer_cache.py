@@ -0,0 +1,150 @@
+"""
+Pearl semantic answer cache: threshold evaluation and hit latency
+Scores a labelled set of question pairs (paraphrase vs different question)
+at several similarity thresholds, checks which questions are treated as
+general, then times cached vs live answers through /api/assistant/pearl/chat
+against a fake Gemini.
+Usage: python -m bench.pearl_answer_cache [--latency 1.0]
+"""
+import argparse
+import asyncio
+import random
+import string
+import time
+
+from app.services.semantic_cache import SemanticAnswerCache, is_general_question
+
+# (cached question, incoming question, should the cached answer be served)
+PAIRS = [
+    ("How does stress work?", "how is stress calculated", True),
+    ("How does stress work?", "What makes stress go up?", True),
+    ("How does stress work?", "what affects stress", True),
+    ("How does stress work?", "How does stamina work?", False),
+    ("How does stress work?", "How does energy work?", False),
+    ("What affects stamina?", "what affects stamina", True),
+    ("What affects stamina?", "What changes stamina?", True),
+    ("What affects stamina?", "how do you gain stamina", True),
+    ("What affects stamina?", "What affects energy?", False),
+    ("What affects stamina?", "What affects mood?", False),
+    ("How is mood calculated?", "what's the mood formula", True),
+    ("How is mood calculated?", "How is mood computed?", True),
+    ("How is mood calculated?", "How is nutrition calculated?", False),
+    ("How is nutrition calculated?", "how does the nutrition score work", True),
+    ("How is nutrition calculated?", "What is the nutrition score based on?", True),
+    ("How is nutrition calculated?", "How much XP for logging a meal?", False),
+    ("How do I level up?", "How does leveling work?", True),
+    ("How does XP work?", "how do you earn xp", True),
+    ("How does XP work?", "What are the XP sources?", True),
+    ("How does XP work?", "How does sleep affect stamina?", False),
+    ("Do stats decay?", "Do metrics decay over time?", True),
+    ("Do metrics decay over time?", "Will stats drop if the app is closed for days?", True),
+    ("Do metrics decay over time?", "What does overwork do?", False),
+    ("What does pranking the boss do?", "what happens when you prank the octopus boss", True),
+    ("What does pranking the boss do?", "How does the boss prank work?", True),
+    ("What does pranking the boss do?", "How does exercise reduce stress?", False),
+    ("How does sleep affect stamina?", "does sleep change stamina", True),
+    ("How does sleep affect stamina?", "How does sleep affect stress?", False),
+    ("How does sleep affect stamina?", "How does exercise affect stamina?", False),
+    ("how does stress affect sleep", "how does sleep affect stress", False),
+    ("How does overwork affect stress?", "what does working overtime do to stress", True),
+    ("How does overwork affect stress?", "How does overwork affect stamina?", False),
+    ("When is the character happy?", "what makes the character happy", True),
+    ("When is the character happy?", "When is the character angry?", False),
+    ("When is the character tired?", "What makes the character tired?", True),
+    ("When is the character tired?", "When is the character stressed?", False),
+    # Same topic, different question
+    ("How do you reduce stress?", "how to lower stress", True),
+    ("How do you reduce stress?", "What is the starting stress?", False),
+    ("How do you reduce stress?", "What's the maximum stress?", False),
+    ("What is the default mood?", "What does mood start at?", True),
+    ("What is the default mood?", "How is mood calculated?", False),
+    ("What drains energy?", "What lowers energy?", True),
+    ("What drains energy?", "What is the default energy?", False),
+    ("How much protein is the target?", "What's the protein target?", True),
+    ("How much protein is the target?", "Where does protein come from?", False),
+]
+
+# (question, cacheable)
+QUESTIONS = [
+    ("How does stress work?", True),
+    ("what affects stamina", True),
+    ("How is mood calculated?", True),
+    ("Tell me how XP works", True),
+    ("Do metrics decay over time?", True),
+    ("Why is my stress so high?", False),
+    ("What should I eat today?", False),
+    ("I slept 4 hours, how bad is that for stamina?", False),
+    ("How does it work?", False),
+    ("Can you explain that again?", False),
+    ("Is my mood ok right now?", False),
+    ("I had ramen for lunch", False),
+    ("hi pearl", False),
+    ("What's a good breakfast?", False),
+]
+
+
+def evaluate(thresholds) -> None:
+    print(f"{'threshold':>9}  {'precision':>9}  {'recall':>6}  wrong answers served")
+    for threshold in thresholds:
+        tp = fp = fn = 0
+        wrong = []
+        for cached, incoming, same in PAIRS:
+            cache = SemanticAnswerCache(threshold=threshold)
+            cache.set(cached, cached)
+            served = cache.get(incoming) is not None
+            tp += served and same
+            fn += (not served) and same
+            if served and not same:
+                fp += 1
+                wrong.append(f"{incoming!r} -> {cached!r}")
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        print(f"{threshold:9.2f}  {precision:9.2f}  {tp / (tp + fn):6.2f}  {'; '.join(wrong[:2])}")
+
+    misclassified = [q for q, general in QUESTIONS if is_general_question(q) != general]
+    print(f"general/personal classification: {len(QUESTIONS) - len(misclassified)}/{len(QUESTIONS)} correct"
+          + (f", wrong: {misclassified}" if misclassified else ""))
+
+
+async def serve(latency: float) -> None:
+    from bench import fake_gemini
+    from bench.app_harness import authenticated_client
+    from app.services.gemini import gemini_service
+
+    fake = fake_gemini.install(gemini_service, latency=latency)
+    fake.reply = "Stress goes up with work hours and down with exercise and sleep."
+    client = await authenticated_client()
+
+    async def ask(message: str) -> float:
+        start = time.perf_counter()
+        response = await client.post("/api/assistant/pearl/chat", json={"message": message})
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    calls = fake.calls
+    live = await ask("How does stress work?")
+    assert fake.prompts[-1] == "How does stress work?", "a shared answer must not see the user's stats or history"
+    hit = await ask("what affects stress")
+    personal = await ask("Why is my stress so high?")
+    print(f"/pearl/chat live {live:.0f}ms, cached paraphrase {hit:.1f}ms, personal {personal:.0f}ms "
+          f"({fake.calls - calls} Gemini calls for 3 messages)")
+    assert fake.calls - calls == 2, "the paraphrase should be answered from the cache"
+
+    cache = gemini_service.answer_cache
+    while len(cache) < cache.max_entries:
+        cache.set(f"What does {''.join(random.choices(string.ascii_lowercase, k=8))} do to stress?", "answer")
+    start = time.perf_counter()
+    for _ in range(100):
+        cache.get("what raises stress")
+    print(f"lookup with {len(cache)} entries: {(time.perf_counter() - start) * 10:.2f}ms")
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+    evaluate([0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9])
+    cache = SemanticAnswerCache(threshold=0.0)
+    cache.set("how does stress affect sleep", "stress -> sleep")
+    assert cache.get("how does sleep affect stress") is None, "reversed relations must not share an answer"
+    asyncio.run(serve(args.latency))
@@ -0,0 +1,116 @@
+"""
+Pearl context caching: billed input tokens and latency per request
+Sends the same Pearl chats with the system instruction inline, from a
+context cache, and with caching unavailable (fallback), then runs a short
+TTL to check the entry is extended before it expires. Finally checks that a
+transient error on the cached model keeps the entry, while a NotFound drops
+it, deletes it and retries inline.
+Usage: python -m bench.pearl_context_cache [--requests 50] [--token-latency 0.0002]
+"""
+import argparse
+import asyncio
+import time
+
+from bench import fake_gemini
+from app.services.context_cache import CachedSystemInstruction
+from app.services.gemini import (
+    gemini_service,
+    pearl_cached_input_tokens,
+    pearl_input_tokens,
+    PEARL_MODEL_NAME,
+    PEARL_SYSTEM_INSTRUCTION,
+)
+
+MESSAGE = "Had oatmeal with blueberries this morning, is that a good breakfast?"
+STATE = {"stamina": 72, "energy": 55, "nutrition": 64, "mood": 58, "stress": 47}
+
+
+def _context(backend, ttl: float = 3600, refresh_before: float = 300) -> CachedSystemInstruction:
+    return CachedSystemInstruction(
+        backend, model_name=PEARL_MODEL_NAME, system_instruction=PEARL_SYSTEM_INSTRUCTION,
+        ttl=ttl, refresh_before=refresh_before, retry_after=600
+    )
+
+
+async def _run(label: str, requests: int) -> None:
+    tokens_before = {s: pearl_input_tokens.sum(instruction=s) for s in ("cached", "inline")}
+    count_before = {s: pearl_input_tokens.count(instruction=s) for s in ("cached", "inline")}
+    cached_before = pearl_cached_input_tokens.value()
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        reply = await gemini_service.pearl_chat(MESSAGE, character_state=STATE)
+        latencies.append(time.perf_counter() - start)
+        assert not reply.startswith("Oof"), reply
+
+    prompt = sum(pearl_input_tokens.sum(instruction=s) - tokens_before[s] for s in tokens_before)
+    sent = sum(pearl_input_tokens.count(instruction=s) - count_before[s] for s in count_before)
+    cached = pearl_cached_input_tokens.value() - cached_before
+    latencies.sort()
+    print(f"{label:<22} billed input {(prompt - cached) / sent:6.0f} tok/req  "
+          f"(cached {cached / sent:5.0f})  p50 {latencies[len(latencies) // 2] * 1000:6.1f}ms")
+
+
+async def main(requests: int, token_latency: float):
+    fake = fake_gemini.install(gemini_service, latency=0.05)
+    fake.system_instruction = PEARL_SYSTEM_INSTRUCTION
+    fake.token_latency = token_latency
+
+    gemini_service.pearl_context = None
+    await _run("inline instruction", requests)
+
+    backend = fake_gemini.FakeContextCacheBackend(fake)
+    gemini_service.pearl_context = _context(backend)
+    await _run("context cache", requests)
+    print(f"  cache entries created: {backend.created}")
+
+    gemini_service.pearl_context = _context(fake_gemini.FakeContextCacheBackend(fake, fail=True))
+    await _run("caching unavailable", requests)
+
+    # Refresh: a 1s TTL extended 0.5s before expiry should never lapse over 3s of traffic
+    backend = fake_gemini.FakeContextCacheBackend(fake)
+    gemini_service.pearl_context = _context(backend, ttl=1.0, refresh_before=0.5)
+    deadline = time.monotonic() + 3.0
+    while time.monotonic() < deadline:
+        await gemini_service.pearl_chat(MESSAGE, character_state=STATE)
+    print(f"refresh over 3s with 1s TTL: created {backend.created}, extended {backend.extended}")
+    assert backend.created == 1 and backend.extended >= 2, "cache entry was not refreshed before expiry"
+
+    await _check_invalidation(fake)
+
+
+async def _check_invalidation(fake) -> None:
+    backend = fake_gemini.FakeContextCacheBackend(fake)
+    context = gemini_service.pearl_context = _context(backend)
+    await gemini_service.pearl_chat(MESSAGE, character_state=STATE)
+
+    async def rate_limited(*args, **kwargs):
+        raise RuntimeError("429 Resource exhausted")
+
+    context._model.generate_content_async = rate_limited
+    inline_calls = fake.calls
+    reply = await gemini_service.pearl_chat(MESSAGE, character_state=STATE)
+    assert reply.startswith("Oof") and context.handle is not None and fake.calls == inline_calls, \
+        "a transient error must keep the cache entry and not be retried inline"
+
+    async def not_found(*args, **kwargs):
+        raise fake_gemini.CachedContentNotFound("cachedContents/fake-1 not found")
+
+    context._model.generate_content_async = not_found
+    reply = await gemini_service.pearl_chat(MESSAGE, character_state=STATE)
+    await asyncio.sleep(0.05)  # Background delete
+    assert not reply.startswith("Oof"), "a missing cache entry must be retried inline"
+    await gemini_service.pearl_chat(MESSAGE, character_state=STATE)
+    print(f"invalidation: transient error kept the entry; NotFound deleted {backend.deleted}, "
+          f"created {backend.created} entries")
+    assert backend.deleted == 1 and backend.created == 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--token-latency", type=float, default=0.0002,
+                        help="seconds per uncached input token in the fake model")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.token_latency))
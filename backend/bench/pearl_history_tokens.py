@@ -0,0 +1,81 @@
+"""
+Pearl history size per turn: client-held history vs the server-side store
+Plays a scripted conversation against a fake Gemini twice: once the way
+older clients do (resending the whole history every turn) and once with
+conversation_id, and reports the estimated tokens of history sent per turn.
+Usage: python -m bench.pearl_history_tokens [--turns 100]
+"""
+import argparse
+import asyncio
+import statistics
+
+from bench import fake_gemini
+from bench.app_harness import authenticated_client
+from app.services.conversations import compactions, history_tokens
+from app.services.gemini import gemini_service
+
+REPLY = (
+    "Oats are a solid pick. The beta-glucan slows digestion, so you stay full longer and your "
+    "energy doesn't crash by ten. Add some protein, Greek yogurt or a spoon of peanut butter, and "
+    "you've got a breakfast that actually works for you. What did you have for lunch yesterday?"
+)
+MESSAGES = [
+    "Had oatmeal with blueberries this morning, is that a good breakfast?",
+    "My stress has been high all week because of a deadline.",
+    "I slept five hours last night. How bad is that for my stats?",
+    "What should I eat before a 30 minute run?",
+    "Is rice or quinoa better for dinner?",
+]
+
+
+def _summary(label: str, sizes: list) -> None:
+    print(f"{label:<28} mean {statistics.mean(sizes):7.0f}  max {max(sizes):7.0f}  last {sizes[-1]:7.0f}")
+
+
+async def main(turns: int):
+    fake = fake_gemini.install(gemini_service, latency=0.0)
+    fake.reply = REPLY
+
+    client = await authenticated_client()
+
+    # Older clients: resend everything said so far
+    full_history = []
+    client_sent, legacy_sent = [], []
+    for turn in range(turns):
+        message = MESSAGES[turn % len(MESSAGES)]
+        client_sent.append(history_tokens(full_history))
+        fake.histories.clear()
+        response = await client.post("/api/assistant/pearl/chat", json={
+            "message": message, "conversation_history": full_history
+        })
+        response.raise_for_status()
+        legacy_sent.append(history_tokens(fake.histories[-1]) if fake.histories else 0)
+        full_history += [{"role": "user", "parts": [message]}, {"role": "model", "parts": [REPLY]}]
+
+    # Server-side store with compaction
+    conversation_id = None
+    stored_sent = []
+    compactions_before = compactions.value()
+    for turn in range(turns):
+        message = MESSAGES[turn % len(MESSAGES)]
+        fake.histories.clear()
+        response = await client.post("/api/assistant/pearl/chat", json={
+            "message": message, "conversation_id": conversation_id
+        })
+        response.raise_for_status()
+        conversation_id = response.json()["conversation_id"]
+        stored_sent.append(history_tokens(fake.histories[-1]) if fake.histories else 0)
+
+    print(f"estimated history tokens per turn over {turns} turns")
+    _summary("client history (uncapped)", client_sent)
+    _summary("client history (capped)", legacy_sent)
+    _summary("server-side store", stored_sent)
+    print(f"compactions: {int(compactions.value() - compactions_before)}")
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns))
@@ -0,0 +1,74 @@
+"""
+Pearl streaming: time-to-first-token and cancellation on disconnect
+Runs the app under uvicorn with a fake Gemini that emits one word per
+`chunk_latency`, compares TTFT with the full non-streamed reply, then
+disconnects mid-stream and checks the upstream stream was cancelled.
+Usage: python -m bench.pearl_stream [--words 60] [--chunk-latency 0.05]
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from bench import fake_gemini
+from bench.app_harness import app, authenticated_client
+from app.services.gemini import gemini_service
+
+
+def _serve(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def main(words: int, chunk_latency: float, port: int):
+    fake = fake_gemini.install(gemini_service, latency=words * chunk_latency)
+    fake.reply = " ".join(f"word{i}" for i in range(words))
+    fake.chunk_latency = chunk_latency
+
+    server = _serve(port)
+    token_client = await authenticated_client()
+    headers = {"Authorization": token_client.headers["Authorization"]}
+    base = f"http://127.0.0.1:{port}"
+
+    async with httpx.AsyncClient(base_url=base, headers=headers, timeout=60) as client:
+        start = time.perf_counter()
+        await client.post("/api/assistant/pearl/chat", json={"message": "hi"})
+        full = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ttft = None
+        async with client.stream("POST", "/api/assistant/pearl/chat/stream", json={"message": "hi"}) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data:") and ttft is None:
+                    ttft = time.perf_counter() - start
+        streamed = time.perf_counter() - start
+        print(f"non-streamed reply: {full * 1000:7.0f}ms")
+        print(f"streamed TTFT:      {ttft * 1000:7.0f}ms (complete after {streamed * 1000:.0f}ms)")
+
+        sent_before = fake.chunks_sent
+        async with client.stream("POST", "/api/assistant/pearl/chat/stream", json={"message": "hi"}) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    break  # Disconnect after the first chunk
+        await asyncio.sleep(chunk_latency * 5)
+        sent = fake.chunks_sent - sent_before
+        print(f"disconnect: upstream cancelled={fake.streams[-1].cancelled}, chunks generated {sent}/{words}")
+        assert fake.streams[-1].cancelled and sent < words, "stream was not cancelled on disconnect"
+
+    server.should_exit = True
+    await token_client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--chunk-latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(main(args.words, args.chunk_latency, args.port))
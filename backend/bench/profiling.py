@@ -0,0 +1,94 @@
+"""
+On-demand request profiling
+Profiles one POST /api/work/log via X-Profile, then samples --rounds rounds of
+logging and reading through the continuous profiler, and prints the hottest
+app functions (by samples that include them) from each folded profile.
+Pass --output DIR to also save the .folded files for a flame graph viewer.
+Usage: python -m bench.profiling [--rounds 30] [--output DIR]
+"""
+import argparse
+import asyncio
+from collections import Counter
+from pathlib import Path
+
+from bench.app_harness import authenticated_client
+from app.config import settings
+from app.profiling import profiled_requests
+
+TOKEN = "bench-profiling-token"
+
+
+def top_app_frames(folded: str, limit: int = 10) -> list:
+    """(frame, samples including it) for frames in app/, most samples first"""
+    inclusive = Counter()
+    total = 0
+    for line in folded.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        total += int(count)
+        for frame in set(stack.split(";")):
+            if "(app/" in frame:
+                inclusive[frame] += int(count)
+    return [(frame, count, count / total if total else 0.0) for frame, count in inclusive.most_common(limit)]
+
+
+def show(title: str, folded: str) -> None:
+    samples = sum(int(line.rsplit(" ", 1)[1]) for line in folded.splitlines())
+    print(f"\n{title}: {samples} samples, {len(folded.splitlines())} distinct stacks")
+    for frame, count, share in top_app_frames(folded):
+        print(f"  {share:6.1%} {count:6} {frame}")
+
+
+async def main(rounds: int, output: Path = None):
+    settings.PROFILING_TOKEN = TOKEN
+    client = await authenticated_client()
+    admin = {"X-Profiling-Token": TOKEN}
+    work = {"duration_hours": 0.25, "intensity": 3}
+
+    plain = await client.post("/api/work/log", json=work)
+    assert "x-profile-id" not in plain.headers, "requests without X-Profile are not profiled"
+    wrong = await client.post("/api/work/log", json=work, headers={"X-Profile": "wrong"})
+    assert "x-profile-id" not in wrong.headers, "a wrong token must not profile"
+    assert (await client.get("/api/admin/profiles", headers={"X-Profiling-Token": "wrong"})).status_code == 403
+    in_url = await client.post(f"/api/work/log?__profile={TOKEN}", json=work)
+    assert "x-profile-id" not in in_url.headers, "the token is only accepted in a header"
+
+    response = await client.post("/api/work/log", json=work, headers={"X-Profile": TOKEN})
+    response.raise_for_status()
+    profile_id = response.headers["x-profile-id"]
+    request_profile = await client.get(f"/api/admin/profiles/{profile_id}", headers=admin)
+    request_profile.raise_for_status()
+    listing = (await client.get("/api/admin/profiles", headers=admin)).json()
+    print(f"profiled request {profile_id}: {listing[0]['seconds'] * 1000:.1f} ms, {listing[0]['samples']} samples")
+    show("POST /api/work/log (X-Profile)", request_profile.text)
+    assert profiled_requests.value() == 1
+
+    (await client.post("/api/admin/profiling/continuous", headers=admin)).raise_for_status()
+    for _ in range(rounds):
+        log = (await client.post("/api/work/log", json=work)).json()
+        await client.get("/api/work/logs")
+        await client.get("/api/work/stats")
+        await client.get("/api/character")
+        await client.delete(f"/api/work/log/{log['id']}")
+    status = (await client.delete("/api/admin/profiling/continuous", headers=admin)).json()
+    continuous = (await client.get("/api/admin/profiling/continuous", headers=admin, params={"reset": True})).text
+    print(f"\ncontinuous: {status['samples']} ticks at {status['interval_seconds'] * 1000:.0f} ms")
+    show(f"continuous, {rounds} rounds of work log/read/delete", continuous)
+    assert not status["running"]
+
+    if output:
+        output.mkdir(parents=True, exist_ok=True)
+        (output / f"request-{profile_id}.folded").write_text(request_profile.text, encoding="utf-8")
+        (output / "continuous.folded").write_text(continuous, encoding="utf-8")
+        print(f"\nsaved folded profiles to {output}")
+
+    settings.PROFILING_TOKEN = None
+    assert (await client.get("/api/admin/profiles", headers=admin)).status_code == 404
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--output", type=Path, help="directory for the .folded profiles")
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.output))
@@ -0,0 +1,230 @@
+"""
+SQL statement budgets per endpoint (CI guard against query-count regressions)
+Calls every API route in-process against the bench database, counts the SQL
+statements each call runs, and fails if a route goes over its budget in
+BUDGETS, repeats one statement shape QUERY_REPEAT_THRESHOLD or more times
+(a likely N+1), or has no budget at all. Gemini and USDA are replaced with
+local fakes; the budgets cover the database only.
+
+When a change legitimately lowers a route's count, lower its budget too.
+Usage: python -m bench.query_budgets [--rounds 3]
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from fastapi.routing import APIRoute
+
+from bench import fake_gemini
+from bench.app_harness import authenticated_client
+from bench.usda_stub import FaultyUSDATransport
+from app.config import settings
+from app.main import app
+from app.request_metrics import count_queries
+from app.services.gemini import gemini_service
+from app.services.usda import usda_service
+
+# (method, route template) -> most SQL statements one call may run
+BUDGETS = {
+    ("POST", "/api/auth/register"): 6,
+    ("POST", "/api/auth/login"): 1,
+    ("GET", "/api/users/me"): 1,
+    ("PUT", "/api/users/me"): 3,
+    ("GET", "/api/character"): 2,
+    ("PUT", "/api/character"): 5,
+    ("POST", "/api/diet"): 12,
+    ("GET", "/api/diet"): 2,
+    ("GET", "/api/diet/{log_id}"): 2,
+    ("PUT", "/api/diet/{log_id}"): 5,
+    ("DELETE", "/api/diet/{log_id}"): 4,
+    ("POST", "/api/exercise"): 13,
+    ("GET", "/api/exercise"): 2,
+    ("GET", "/api/exercise/{log_id}"): 2,
+    ("DELETE", "/api/exercise/{log_id}"): 4,
+    ("POST", "/api/sleep"): 14,
+    ("GET", "/api/sleep"): 2,
+    ("GET", "/api/sleep/{log_id}"): 2,
+    ("DELETE", "/api/sleep/{log_id}"): 4,
+    ("POST", "/api/work/log"): 17,
+    ("GET", "/api/work/logs"): 2,
+    ("GET", "/api/work/stats"): 2,
+    ("DELETE", "/api/work/log/{log_id}"): 12,
+    ("POST", "/api/work/recalculate"): 9,
+    ("POST", "/api/assistant/pearl/chat"): 7,
+    ("POST", "/api/assistant/pearl/chat/stream"): 6,
+    ("POST", "/api/assistant/advice"): 4,
+    ("POST", "/api/assistant/workplace-scenario"): 3,
+    ("GET", "/api/assistant/usage"): 2,
+    ("POST", "/api/assistant/food-search"): 2,  # Auth + counting the search for warm-up
+    ("GET", "/api/assistant/food/{fdc_id}"): 1,
+    ("POST", "/api/assistant/foods"): 1,
+    ("GET", "/"): 0,
+    ("GET", "/health"): 0,
+    ("GET", "/metrics"): 0,
+    ("GET", "/api/admin/profiles"): 0,
+    ("GET", "/api/admin/profiles/{profile_id}"): 0,
+    ("POST", "/api/admin/profiling/continuous"): 0,
+    ("GET", "/api/admin/profiling/continuous"): 0,
+    ("DELETE", "/api/admin/profiling/continuous"): 0,
+    ("GET", "/api/admin/blocking-calls"): 0,
+}
+
+PROFILING_TOKEN = "bench-profiling-token"
+
+
+class Recorder:
+    """Calls routes and keeps the worst statement count and repeats seen per route"""
+
+    def __init__(self, client):
+        self.client = client
+        self.worst = {}
+        self.repeats = {}
+
+    async def call(self, method: str, route: str, path: str = None, **kwargs):
+        with count_queries() as stats:
+            if method == "POST" and route.endswith("/stream"):
+                async with self.client.stream(method, path or route, **kwargs) as response:
+                    async for _ in response.aiter_text():
+                        pass
+            else:
+                response = await self.client.request(method, path or route, **kwargs)
+        response.raise_for_status()
+        key = (method, route)
+        self.worst[key] = max(self.worst.get(key, 0), stats.statements)
+        for shape, count in stats.repeated(settings.QUERY_REPEAT_THRESHOLD):
+            self.repeats.setdefault(key, {})[shape] = max(count, self.repeats.get(key, {}).get(shape, 0))
+        return response
+
+
+async def exercise_routes(recorder: Recorder, round_number: int) -> None:
+    call = recorder.call
+    now = datetime.utcnow()
+    me = (await call("GET", "/api/users/me")).json()
+    await call("PUT", "/api/users/me", json={"full_name": f"Bench {round_number}"})
+    await call("POST", "/api/auth/login", data={"username": me["username"], "password": "bench-password"})
+
+    await call("GET", "/api/character")
+    await call("PUT", "/api/character", json={"mood": 60})
+
+    diet = (await call("POST", "/api/diet", json={"food_name": "rice", "calories": 200, "carbs": 45})).json()
+    await call("GET", "/api/diet")
+    await call("GET", "/api/diet/{log_id}", f"/api/diet/{diet['id']}")
+    await call("PUT", "/api/diet/{log_id}", f"/api/diet/{diet['id']}", json={"calories": 220})
+
+    exercise = (await call("POST", "/api/exercise", json={"activity_name": "walk", "duration_minutes": 10})).json()
+    await call("GET", "/api/exercise")
+    await call("GET", "/api/exercise/{log_id}", f"/api/exercise/{exercise['id']}")
+
+    sleep = (await call("POST", "/api/sleep", json={
+        "sleep_start": (now - timedelta(minutes=30)).isoformat(), "sleep_end": now.isoformat(),
+        "duration_hours": 0.5,
+    })).json()
+    await call("GET", "/api/sleep")
+    await call("GET", "/api/sleep/{log_id}", f"/api/sleep/{sleep['id']}")
+
+    work = (await call("POST", "/api/work/log", json={"duration_hours": 0.25, "intensity": 3})).json()
+    await call("GET", "/api/work/logs")
+    await call("GET", "/api/work/stats")
+    await call("POST", "/api/work/recalculate")
+
+    chat = (await call("POST", "/api/assistant/pearl/chat", json={"message": "I had rice, is that ok?"})).json()
+    await call("POST", "/api/assistant/pearl/chat/stream",
+               json={"message": "And noodles?", "conversation_id": chat["conversation_id"]})
+    await call("POST", "/api/assistant/advice", json={})
+    await call("POST", "/api/assistant/advice", json={"query": f"how do I sleep better {round_number}"})
+    await call("POST", "/api/assistant/workplace-scenario")
+    await call("GET", "/api/assistant/usage")
+    await call("POST", "/api/assistant/food-search", json={"query": "rice"})
+    await call("GET", "/api/assistant/food/{fdc_id}", "/api/assistant/food/1001")
+    await call("POST", "/api/assistant/foods", json={"fdc_ids": [1001, 1002, 1003]})
+
+    await call("DELETE", "/api/work/log/{log_id}", f"/api/work/log/{work['id']}")
+    await call("DELETE", "/api/sleep/{log_id}", f"/api/sleep/{sleep['id']}")
+    await call("DELETE", "/api/exercise/{log_id}", f"/api/exercise/{exercise['id']}")
+    await call("DELETE", "/api/diet/{log_id}", f"/api/diet/{diet['id']}")
+
+    await call("GET", "/")
+    await call("GET", "/health")
+    await call("GET", "/metrics")
+
+    admin = {"X-Profiling-Token": PROFILING_TOKEN}
+    profiled = await call("GET", "/api/character", headers={"X-Profile": PROFILING_TOKEN})
+    await call("GET", "/api/admin/profiles", headers=admin)
+    await call("GET", "/api/admin/profiles/{profile_id}", f"/api/admin/profiles/{profiled.headers['x-profile-id']}",
+               headers=admin)
+    await call("POST", "/api/admin/profiling/continuous", headers=admin)
+    await call("GET", "/api/admin/profiling/continuous", headers=admin)
+    await call("DELETE", "/api/admin/profiling/continuous", headers=admin)
+    await call("GET", "/api/admin/blocking-calls", headers=admin)
+
+
+def check_detector() -> None:
+    """The repeat detector must flag a per-row lookup loop"""
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        with count_queries() as stats:
+            for user_id in range(1, settings.QUERY_REPEAT_THRESHOLD + 1):
+                db.query(User).filter(User.id == user_id).first()
+    finally:
+        db.close()
+    assert stats.repeated(settings.QUERY_REPEAT_THRESHOLD), "a lookup per row should be flagged as repeated"
+
+
+async def main(rounds: int) -> int:
+    settings.LLM_CACHE_ENABLED = False
+    settings.WORKPLACE_POOL_ENABLED = False
+    settings.PROFILING_TOKEN = PROFILING_TOKEN
+    gemini_service.answer_cache = None
+    fake_gemini.install(gemini_service, latency=0)
+    usda_service._transport = FaultyUSDATransport()
+    usda_service.api_key = "stub"
+
+    with count_queries() as registration:
+        client = await authenticated_client()
+    check_detector()
+    recorder = Recorder(client)
+    recorder.worst[("POST", "/api/auth/register")] = registration.statements
+    for round_number in range(rounds):
+        await exercise_routes(recorder, round_number)
+    await client.aclose()
+
+    failures = []
+    print(f"{'route':<45} {'statements':>10} {'budget':>6}")
+    for key, statements in sorted(recorder.worst.items(), key=lambda item: item[0][1]):
+        budget = BUDGETS.get(key)
+        status = ""
+        if budget is None:
+            status = "  NO BUDGET"
+            failures.append(f"{key[0]} {key[1]} has no budget in BUDGETS")
+        elif statements > budget:
+            status = "  OVER"
+            failures.append(f"{key[0]} {key[1]} ran {statements} statements (budget {budget})")
+        print(f"{key[0] + ' ' + key[1]:<45} {statements:>10} {budget if budget is not None else '-':>6}{status}")
+
+    for key, shapes in sorted(recorder.repeats.items()):
+        for shape, count in shapes.items():
+            failures.append(f"{key[0]} {key[1]} repeated a statement {count} times (N+1?): {shape[:200]}")
+
+    routes = {(method, route.path) for route in app.routes if isinstance(route, APIRoute)
+              for method in route.methods if method != "HEAD"}
+    for method, path in sorted(routes - set(recorder.worst)):
+        failures.append(f"{method} {path} is not exercised by bench.query_budgets")
+
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"\nOK: {len(recorder.worst)} routes within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.rounds)))
@@ -0,0 +1,45 @@
+"""
+Record real USDA FoodData Central responses into bench/data/usda_corpus.json
+Requires USDA_API_KEY. Usage: python -m bench.record_usda rice cheese "greek yogurt"
+"""
+import json
+import sys
+
+import httpx
+
+from app.config import settings
+from bench.usda_corpus import RECORDED_CORPUS
+
+BASE_URL = "https://api.nal.usda.gov/fdc/v1"
+
+
+def record(queries: list[str], page_size: int = 25) -> dict:
+    """Fetch raw search results and full details for each query"""
+    corpus = {"search": [], "details": []}
+    with httpx.Client(timeout=30.0) as client:
+        for query in queries:
+            response = client.get(f"{BASE_URL}/foods/search", params={
+                "api_key": settings.USDA_API_KEY, "query": query, "pageSize": page_size,
+            })
+            response.raise_for_status()
+            foods = response.json().get("foods", [])
+            corpus["search"].extend(foods)
+
+            for food in foods[:5]:
+                details = client.get(f"{BASE_URL}/food/{food['fdcId']}",
+                                     params={"api_key": settings.USDA_API_KEY})
+                if details.status_code == 200:
+                    corpus["details"].append(details.json())
+    return corpus
+
+
+if __name__ == "__main__":
+    if not settings.USDA_API_KEY:
+        print("Error: USDA_API_KEY not set")
+        sys.exit(1)
+
+    corpus = record(sys.argv[1:] or ["rice", "cheddar cheese", "greek yogurt", "chicken breast", "oysters"])
+    RECORDED_CORPUS.parent.mkdir(parents=True, exist_ok=True)
+    with open(RECORDED_CORPUS, "w", encoding="utf-8") as f:
+        json.dump(corpus, f)
+    print(f"Recorded {len(corpus['search'])} search results and {len(corpus['details'])} details")
@@ -0,0 +1,147 @@
+"""
+Load test reports: per-endpoint throughput and latency percentiles as JSON
+Reports are written by bench.load to bench/results/ and named after the
+commit they ran on, so runs can be compared across commits.
+Usage:
+    python -m bench.report show REPORT.json
+    python -m bench.report compare BASE.json HEAD.json
+"""
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+Sample = Tuple[str, int, float]  # endpoint, status, seconds
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * pct / 100) - 1))
+    return ordered[index]
+
+
+def _stats(latencies: List[float], errors: int, duration: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / duration, 2) if duration else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def summarize(samples: Iterable[Sample], duration: float) -> dict:
+    """Per-endpoint and overall stats; responses with status >= 400 (or 0, no response) count as errors"""
+    latencies: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for endpoint, status, seconds in samples:
+        latencies.setdefault(endpoint, []).append(seconds)
+        if status == 0 or status >= 400:
+            errors[endpoint] = errors.get(endpoint, 0) + 1
+    return {
+        "overall": _stats([s for values in latencies.values() for s in values], sum(errors.values()), duration),
+        "endpoints": {endpoint: _stats(values, errors.get(endpoint, 0), duration)
+                      for endpoint, values in sorted(latencies.items())},
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Short HEAD commit, suffixed with -dirty when the tree has changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True, cwd=RESULTS_DIR.parent).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True, cwd=RESULTS_DIR.parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def build_report(samples: List[Sample], duration: float, config: dict) -> dict:
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "duration_seconds": round(duration, 2),
+        "config": config,
+        **summarize(samples, duration),
+    }
+
+
+def save(report: dict, path: Optional[Path] = None) -> Path:
+    """Write a report (by default to bench/results/load-<commit>-<time>.json)"""
+    if path is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = RESULTS_DIR / f"load-{report.get('commit') or 'nogit'}-{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def show(report: dict) -> None:
+    print(f"commit {report.get('commit')}  {report.get('created_at')}  "
+          f"{report['duration_seconds']}s  {report.get('config', {})}")
+    print(f"{'endpoint':<42} {'req':>6} {'err':>4} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = list(report["endpoints"].items()) + [("overall", report["overall"])]
+    for endpoint, stats in rows:
+        print(f"{endpoint:<42} {stats['requests']:>6} {stats['errors']:>4} {stats['throughput_rps']:>7.1f} "
+              f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}")
+
+
+def compare(base: dict, head: dict) -> None:
+    """Print per-endpoint throughput and percentile changes from base to head"""
+    print(f"base {base.get('commit')} ({base.get('created_at')})  ->  head {head.get('commit')} "
+          f"({head.get('created_at')})")
+    print(f"{'endpoint':<42} {'rps':>15} {'p50 ms':>17} {'p95 ms':>17} {'p99 ms':>17}")
+
+    def change(old: float, new: float) -> str:
+        pct = f"{(new - old) / old * 100:+.0f}%" if old else "  n/a"
+        return f"{new:8.1f} {pct:>6}"
+
+    rows = [(endpoint, base["endpoints"].get(endpoint), stats) for endpoint, stats in head["endpoints"].items()]
+    rows.append(("overall", base["overall"], head["overall"]))
+    for endpoint, old, new in rows:
+        if old is None:
+            print(f"{endpoint:<42} (new)")
+            continue
+        print(f"{endpoint:<42} {change(old['throughput_rps'], new['throughput_rps']):>15} "
+              f"{change(old['p50_ms'], new['p50_ms']):>17} {change(old['p95_ms'], new['p95_ms']):>17} "
+              f"{change(old['p99_ms'], new['p99_ms']):>17}")
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("show").add_argument("report")
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        show(_load(args.report))
+    else:
+        compare(_load(args.base), _load(args.head))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""
+Per-route request and SQL metrics
+Logs a day of meals, exercise, sleep and work through the API, reads a few
+lists back, then prints per-route request counts, latency and SQL statements
+per request as exported on /metrics.
+Usage: python -m bench.request_metrics [--rounds 10]
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from bench.app_harness import authenticated_client
+from app.request_metrics import db_seconds, db_statements, http_requests, http_seconds
+
+
+async def main(rounds: int):
+    client = await authenticated_client()
+    now = datetime.utcnow()
+    routes = set()
+
+    async def call(method: str, path: str, route: str, **kwargs):
+        response = await client.request(method, path, **kwargs)
+        response.raise_for_status()
+        routes.add((method, route))
+        return response
+
+    for _ in range(rounds):
+        await call("POST", "/api/diet", "/api/diet", json={"food_name": "rice", "calories": 200, "carbs": 45})
+        await call("POST", "/api/exercise", "/api/exercise",
+                   json={"activity_name": "walk", "duration_minutes": 10})
+        await call("POST", "/api/sleep", "/api/sleep", json={
+            "sleep_start": (now - timedelta(minutes=30)).isoformat(), "sleep_end": now.isoformat(),
+            "duration_hours": 0.5,
+        })
+        log = await call("POST", "/api/work/log", "/api/work/log", json={"duration_hours": 0.25, "intensity": 3})
+        await call("GET", "/api/work/logs", "/api/work/logs")
+        await call("GET", "/api/character", "/api/character")
+        await call("DELETE", f"/api/work/log/{log.json()['id']}", "/api/work/log/{log_id}")
+    await call("GET", "/metrics", "/metrics")
+
+    print(f"{'route':<30} {'requests':>8} {'mean ms':>8} {'SQL/request':>11} {'SQL ms/request':>14}")
+    for method, route in sorted(routes, key=lambda key: key[1]):
+        count = http_seconds.count(method=method, route=route)
+        statements = db_statements.sum(method=method, route=route)
+        print(f"{method + ' ' + route:<30} {count:>8} "
+              f"{http_seconds.sum(method=method, route=route) / count * 1000:8.1f} "
+              f"{statements / count:11.1f} {db_seconds.sum(method=method, route=route) / count * 1000:14.2f}")
+    assert http_requests.value(method="POST", route="/api/work/log", status="201") == rounds
+    assert db_statements.sum(method="POST", route="/api/work/log") > 0, "SQL inside sync dependencies must be counted"
+
+    missing = await client.get("/api/nowhere/42")
+    assert missing.status_code == 404
+    assert http_requests.value(method="GET", route="unmatched", status="404") == 1
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds))
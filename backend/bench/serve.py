@@ -0,0 +1,42 @@
+"""
+Local app instance for load tests
+Serves the app over HTTP with uvicorn, against the bench database (or
+--database-url), with Gemini and USDA replaced by local fakes so Pearl and
+food search cost nothing and answer with a fixed latency.
+Usage: python -m bench.serve [--port 8765] [--gemini-latency 0.8] [--database-url URL]
+"""
+import argparse
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--gemini-latency", type=float, default=0.8, help="seconds per fake Gemini reply")
+    parser.add_argument("--database-url", help="defaults to the bench SQLite database")
+    args = parser.parse_args()
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    import uvicorn
+
+    from bench import app_harness  # noqa: F401  (points DATABASE_URL at the bench database if unset)
+    from bench import fake_gemini
+    from bench.usda_stub import FaultyUSDATransport
+    from app.config import settings
+    from app.main import app
+    from app.services.gemini import gemini_service
+    from app.services.usda import usda_service
+
+    settings.WORKPLACE_POOL_ENABLED = False
+    fake = fake_gemini.install(gemini_service, latency=args.gemini_latency)
+    fake.chunk_latency = 0.02
+    usda_service._transport = FaultyUSDATransport(latency=0.05)
+    usda_service.api_key = "stub"
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
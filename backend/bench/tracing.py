@@ -0,0 +1,139 @@
+"""
+Request tracing
+Traces one POST /api/work/log, a Pearl chat and a USDA food search with the
+file exporter, checks the OTLP/JSON it wrote (one trace per request, a SQL
+span per statement, the user id and route on the request span, Gemini and
+USDA client spans) and prints each trace as a span tree. Also checks that
+TRACING_SAMPLE_RATE=0 records nothing, that a sampled W3C traceparent
+is continued anyway, and that traces are written off the event loop.
+Usage: python -m bench.tracing [--file PATH]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+
+from bench import fake_gemini
+from bench.app_harness import authenticated_client
+from bench.usda_stub import FaultyUSDATransport
+from app import tracing
+from app.config import settings
+from app.request_metrics import count_queries
+from app.services.gemini import gemini_service
+from app.services.usda import usda_service
+
+
+def read_traces(path: str) -> list:
+    tracing.flush()
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def spans_of(trace: dict) -> list:
+    return [span for resource in trace["resourceSpans"] for scope in resource["scopeSpans"]
+            for span in scope["spans"]]
+
+
+def attributes(span: dict) -> dict:
+    return {a["key"]: next(iter(a["value"].values())) for a in span["attributes"]}
+
+
+def print_tree(trace: dict) -> None:
+    spans = spans_of(trace)
+    ids = {span["spanId"] for span in spans}
+    children = {}
+    for span in spans:
+        parent = span.get("parentSpanId") if span.get("parentSpanId") in ids else None
+        children.setdefault(parent, []).append(span)
+    root = children[None][0]
+    start = int(root["startTimeUnixNano"])
+    print(f"\ntrace {root['traceId']}  ({len(spans)} spans)")
+    print(f"{'offset ms':>10} {'ms':>8}  span")
+
+    def walk(span: dict, depth: int):
+        offset = (int(span["startTimeUnixNano"]) - start) / 1e6
+        duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+        print(f"{offset:10.2f} {duration:8.2f}  {'  ' * depth}{span['name']}")
+        for child in sorted(children.get(span["spanId"], []), key=lambda s: int(s["startTimeUnixNano"])):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    sql = [s for s in spans if attributes(s).get("db.system")]
+    sql_ms = sum(int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"]) for s in sql) / 1e6
+    total_ms = (int(root["endTimeUnixNano"]) - start) / 1e6
+    print(f"{len(sql)} SQL spans, {sql_ms:.2f} of {total_ms:.2f} ms in SQL")
+
+
+async def main(path: str):
+    settings.LLM_CACHE_ENABLED = False
+    settings.WORKPLACE_POOL_ENABLED = False
+    gemini_service.answer_cache = None
+    fake_gemini.install(gemini_service, latency=0.05)
+    usda_service._transport = FaultyUSDATransport(latency=0.02)
+    usda_service.api_key = "stub"
+    if os.path.exists(path):
+        os.remove(path)
+
+    client = await authenticated_client()
+    me = (await client.get("/api/users/me")).json()
+    settings.TRACING_EXPORTER = "file"
+    settings.TRACING_FILE = path
+    settings.TRACING_SAMPLE_RATE = 1.0
+
+    writer_threads = set()
+    write = tracing._write
+
+    def recording_write(trace):
+        writer_threads.add(threading.current_thread().name)
+        write(trace)
+
+    tracing._write = recording_write
+    with count_queries() as stats:
+        response = await client.post("/api/work/log", json={"duration_hours": 0.25, "intensity": 3})
+    response.raise_for_status()
+    (await client.post("/api/assistant/pearl/chat", json={"message": "I had rice, is that ok?"})).raise_for_status()
+    (await client.post("/api/assistant/food-search", json={"query": "rice"})).raise_for_status()
+
+    traces = read_traces(path)
+    tracing._write = write
+    assert len(traces) == 3, f"expected one trace per request, got {len(traces)}"
+    assert writer_threads == {"trace-exporter"}, f"traces written on {writer_threads}, not the exporter thread"
+    work, chat, search = traces
+    spans = spans_of(work)
+    root = next(span for span in spans if "parentSpanId" not in span)
+    assert root["traceId"] == response.headers["x-trace-id"]
+    assert all(span["traceId"] == root["traceId"] for span in spans)
+    root_attributes = attributes(root)
+    assert root_attributes["http.route"] == "/api/work/log"
+    assert root_attributes["enduser.id"] == str(me["id"]), "the authenticated user id must be on the request span"
+    assert root_attributes["http.response.status_code"] == "201"
+    sql = [span for span in spans if attributes(span).get("db.system")]
+    assert len(sql) == stats.statements, f"{len(sql)} SQL spans for {stats.statements} statements"
+    assert any(span["name"].startswith("gemini ") for span in spans_of(chat)), "Pearl chat needs a Gemini span"
+    assert any(span["name"].startswith("USDA ") for span in spans_of(search)), "food search needs a USDA span"
+    assert not any("api_key" in json.dumps(trace) for trace in traces), "the USDA key must not be exported"
+    for trace in traces:
+        print_tree(trace)
+
+    settings.TRACING_SAMPLE_RATE = 0.0
+    await client.get("/api/character")
+    assert len(read_traces(path)) == 3, "sample rate 0 must record nothing"
+    parent_trace, parent_span = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    await client.get("/api/character", headers={"traceparent": f"00-{parent_trace}-{parent_span}-01"})
+    continued = read_traces(path)[-1]
+    continued_root = next(span for span in spans_of(continued) if span.get("parentSpanId") == parent_span)
+    assert continued_root["traceId"] == parent_trace, "a sampled traceparent must be continued"
+    print(f"\nsample rate 0: no trace; sampled traceparent continued as {parent_trace}")
+
+    settings.TRACING_EXPORTER = None
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=os.path.join(tempfile.gettempdir(), "oystraz_traces.jsonl"),
+                        help="OTLP/JSON file to export to")
+    args = parser.parse_args()
+    asyncio.run(main(args.file))
@@ -0,0 +1,89 @@
+"""
+USDA response corpus for benchmarks
+Loads recorded FoodData Central responses (see bench/record_usda.py) and
+falls back to a seeded synthetic corpus shaped like real responses.
+"""
+import csv
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+from app.services.nutrients import DEFAULT_NUTRIENT_TABLE
+
+RECORDED_CORPUS = Path(__file__).resolve().parent / "data" / "usda_corpus.json"
+
+# Nutrients real foods report, by data type: Branded labels give kcal (1008);
+# Foundation foods give kJ and the Atwater kcal variants instead
+_COMMON_IDS = {
+    "Branded": [1008, 1003, 1004, 1005, 1079, 2000, 1093, 1253, 1258],
+    "Foundation": [1062, 2047, 2048, 1003, 1004, 1005, 1079, 2000, 1093, 1253, 1258],
+}
+
+
+def _load_nutrient_rows() -> List[Dict[str, str]]:
+    with open(DEFAULT_NUTRIENT_TABLE, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def _synthetic_food(rng: random.Random, rows: List[Dict[str, str]], by_id: Dict[int, dict],
+                    fdc_id: int, branded: bool, details: bool) -> dict:
+    """Build one search result or details response with realistic nutrient counts"""
+    common = _COMMON_IDS["Branded" if branded else "Foundation"]
+    # Branded labels list a handful of nutrients; Foundation analyses list many
+    count = rng.randint(12, 25) if branded else rng.randint(50, 120)
+    energy = {1008, 1062, 2047, 2048}
+    extra = [r for r in rng.sample(rows, count + 8) if int(r["id"]) not in energy and int(r["id"]) not in common]
+    chosen = [by_id[i] for i in common] + extra[:max(0, count - len(common))]
+    rng.shuffle(chosen)
+
+    nutrients = []
+    for row in chosen:
+        value = round(rng.uniform(0, 500), 2)
+        if details:
+            nutrients.append({
+                "type": "FoodNutrient",
+                "nutrient": {
+                    "id": int(row["id"]),
+                    "number": row["nutrient_nbr"],
+                    "name": row["name"],
+                    "rank": int(float(row["rank"] or 0)),
+                    "unitName": row["unit_name"].lower(),
+                },
+                "amount": value,
+            })
+        else:
+            nutrients.append({
+                "nutrientId": int(row["id"]),
+                "nutrientName": row["name"],
+                "nutrientNumber": row["nutrient_nbr"],
+                "unitName": row["unit_name"],
+                "value": value,
+            })
+
+    return {
+        "fdcId": fdc_id,
+        "description": rng.choice(["CHEDDAR CHEESE", "BROWN RICE, COOKED", "GREEK YOGURT WITH HONEY",
+                                   "CHICKEN BREAST, ROASTED", "OYSTERS, RAW"]),
+        "dataType": "Branded" if branded else "Foundation",
+        "brandOwner": "Oystraz Foods, Inc." if branded else "",
+        "foodNutrients": nutrients,
+    }
+
+
+def synthetic_corpus(size: int = 200, seed: int = 42) -> Dict[str, List[dict]]:
+    """Seeded corpus of search results and details responses"""
+    rng = random.Random(seed)
+    rows = _load_nutrient_rows()
+    by_id = {int(r["id"]): r for r in rows}
+    search = [_synthetic_food(rng, rows, by_id, 100000 + i, rng.random() < 0.7, False) for i in range(size)]
+    details = [_synthetic_food(rng, rows, by_id, 200000 + i, rng.random() < 0.7, True) for i in range(size)]
+    return {"search": search, "details": details}
+
+
+def load_corpus(path: Path = RECORDED_CORPUS) -> Dict[str, List[dict]]:
+    """Recorded corpus if one exists, otherwise the synthetic one"""
+    if path.exists():
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return synthetic_corpus()
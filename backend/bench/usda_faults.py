@@ -0,0 +1,150 @@
+"""
+Fault-injection checks for USDA circuit breaker, deadlines, hedging and error mapping
+Usage: python -m bench.usda_faults (exits non-zero on the first failed check)
+"""
+import asyncio
+import time
+
+from app.metrics import registry
+from app.services.resilience import CircuitBreaker, reset_deadline, set_deadline
+from app.services.usda import USDAService, USDARequestError, USDAUnavailableError
+from bench.usda_stub import FaultyUSDATransport
+
+
+def _service(transport: FaultyUSDATransport, **overrides) -> USDAService:
+    service = USDAService(transport=transport)
+    service.api_key = "stub"
+    service.timeout = overrides.get("timeout", 0.5)
+    service.hedge_percentile = overrides.get("hedge_percentile")
+    service.breaker = CircuitBreaker("usda_stub", failure_threshold=3, reset_timeout=0.3)
+    return service
+
+
+async def check_breaker_serves_stale_then_recovers():
+    stub = FaultyUSDATransport()
+    service = _service(stub)
+    fresh = await service.search_foods("rice")
+
+    # Expire freshness so the next call goes upstream
+    for key, (_, foods) in list(service.search_cache._data.items()):
+        service.search_cache.set(key, (float("-inf"), foods[1]))
+
+    stub.status = 503
+    for _ in range(3):
+        assert await service.search_foods("rice") == fresh
+    assert service.breaker.state == CircuitBreaker.OPEN
+
+    calls_before = stub.calls
+    start = time.monotonic()
+    assert await service.search_foods("rice") == fresh
+    assert stub.calls == calls_before, "open circuit must not call upstream"
+    assert time.monotonic() - start < 0.05, "open circuit must fail fast"
+
+    try:
+        await service.search_foods("kale")
+        raise AssertionError("uncached query must raise while unavailable")
+    except USDAUnavailableError:
+        pass
+
+    stub.status = 200
+    await asyncio.sleep(0.35)
+    await service.search_foods("kale")
+    assert service.breaker.state == CircuitBreaker.CLOSED
+
+
+async def check_half_open_probe_reopens():
+    stub = FaultyUSDATransport()
+    stub.fail_connect = True
+    service = _service(stub)
+    for _ in range(3):
+        try:
+            await service.get_food_details(1)
+        except USDAUnavailableError:
+            pass
+    assert service.breaker.state == CircuitBreaker.OPEN
+
+    await asyncio.sleep(0.35)
+    try:
+        await service.get_food_details(1)
+    except USDAUnavailableError:
+        pass
+    assert service.breaker.state == CircuitBreaker.OPEN, "failed probe must re-open"
+
+
+async def check_deadline_caps_upstream_wait():
+    stub = FaultyUSDATransport(latency=2.0)
+    service = _service(stub, timeout=10.0)
+    token = set_deadline(0.2)
+    start = time.monotonic()
+    try:
+        await service.search_foods("slow")
+        raise AssertionError("slow upstream must not outlive the request deadline")
+    except USDAUnavailableError:
+        pass
+    finally:
+        reset_deadline(token)
+    elapsed = time.monotonic() - start
+    assert elapsed < 0.4, f"waited {elapsed:.2f}s past a 0.2s deadline"
+    assert service.breaker.failures == 0, "our own deadline is not an upstream failure"
+
+
+async def check_hedge_beats_slow_attempt():
+    stub = FaultyUSDATransport(latency=0.01)
+    service = _service(stub, timeout=2.0, hedge_percentile=95)
+    for _ in range(service.latency.min_samples):
+        service.latency.record(0.02)
+
+    stub.latency_plan.extend([1.0])  # First attempt stalls, hedge is fast
+    start = time.monotonic()
+    await service.get_food_details(42)
+    elapsed = time.monotonic() - start
+    assert elapsed < 0.3, f"hedged call took {elapsed:.2f}s"
+    assert registry.counter("hedged_requests_total", "").value(upstream="usda") >= 1
+
+
+async def check_batch_outage_is_not_missing():
+    stub = FaultyUSDATransport()
+    service = _service(stub)
+    await service.get_foods_details([1])  # Cached
+
+    stub.status = 503
+    details = await service.get_foods_details([1, 2, 3])
+    assert set(details.foods) == {1} and details.unavailable == [2, 3], "failed chunks must be unavailable"
+    try:
+        await service.get_foods_details([4, 5])
+        raise AssertionError("a batch USDA could not answer at all must raise")
+    except USDAUnavailableError:
+        pass
+
+
+async def check_search_4xx_is_client_error():
+    stub = FaultyUSDATransport(status=400)
+    service = _service(stub)
+    try:
+        await service.search_foods("???")
+        raise AssertionError("a 4xx search must not be reported as unavailable")
+    except USDARequestError as e:
+        assert e.status_code == 400
+    assert service.breaker.failures == 0
+
+
+async def main():
+    checks = [
+        check_breaker_serves_stale_then_recovers,
+        check_half_open_probe_reopens,
+        check_deadline_caps_upstream_wait,
+        check_hedge_beats_slow_attempt,
+        check_batch_outage_is_not_missing,
+        check_search_4xx_is_client_error,
+    ]
+    for check in checks:
+        await check()
+        print(f"ok  {check.__name__}")
+
+    transitions = registry.counter("circuit_breaker_transitions_total", "")
+    assert transitions.value(breaker="usda_stub", state="open") >= 2
+    print("ok  breaker transitions exported")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Fault-injecting local stand-in for USDA FoodData Central
+Plug into USDAService(transport=FaultyUSDATransport()) to exercise failure modes.
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Optional
+
+import httpx
+
+
+class FaultyUSDATransport(httpx.AsyncBaseTransport):
+    """
+    Serves canned FDC responses with injectable latency and errors
+
+    Attributes may be changed between calls:
+        latency: seconds to wait before answering
+        status: HTTP status to return (e.g. 503)
+        fail_connect: raise a transport error instead of answering
+        latency_plan: per-call latencies consumed before `latency` applies
+    """
+
+    def __init__(self, latency: float = 0.0, status: int = 200):
+        self.latency = latency
+        self.status = status
+        self.fail_connect = False
+        self.latency_plan: deque = deque()
+        self.calls = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.fail_connect:
+            raise httpx.ConnectError("stub: connection refused", request=request)
+
+        latency = self.latency_plan.popleft() if self.latency_plan else self.latency
+        timeout: Optional[float] = request.extensions.get("timeout", {}).get("read")
+        if timeout is not None and latency > timeout:
+            await asyncio.sleep(timeout)
+            raise httpx.ReadTimeout("stub: read timed out", request=request)
+        await asyncio.sleep(latency)
+
+        if self.status >= 400:
+            return httpx.Response(self.status, json={"error": "stub fault"}, request=request)
+        return httpx.Response(200, json=self._payload(request), request=request)
+
+    def _payload(self, request: httpx.Request):
+        path = request.url.path
+        if path.endswith("/foods/search"):
+            query = request.url.params.get("query", "food")
+            return {"foods": [{
+                "fdcId": 1000 + i,
+                "description": f"{query.upper()} {i}",
+                "dataType": "Foundation",
+                "foodNutrients": [{"nutrientId": 1008, "value": 100.0 + i}],
+            } for i in range(int(request.url.params.get("pageSize", 10)))]}
+        if path.endswith("/foods"):
+            ids = json.loads(request.content)["fdcIds"]
+            return [self._food(fdc_id) for fdc_id in ids]
+        return self._food(int(path.rsplit("/", 1)[-1]))
+
+    @staticmethod
+    def _food(fdc_id: int) -> dict:
+        return {
+            "fdcId": fdc_id,
+            "description": f"Stub food {fdc_id}",
+            "foodNutrients": [
+                {"nutrient": {"id": 1008}, "amount": 250.0},
+                {"nutrient": {"id": 1003}, "amount": 12.0},
+            ],
+        }
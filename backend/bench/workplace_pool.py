@@ -0,0 +1,81 @@
+"""
+Workplace scenario pool: request latency and replenishment
+Serves workplace scenarios against a fake Gemini, first generated live on
+every request, then from the pre-generated pool with the refill worker
+running, and checks each served scenario was stored as a WorkplaceEvent.
+Usage: python -m bench.workplace_pool [--requests 30] [--latency 1.0] [--interval 0.2]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bench import fake_gemini
+from bench.app_harness import authenticated_client
+from app.config import settings
+from app.database import SessionLocal
+from app.models import WorkplaceEvent
+from app.services.gemini import gemini_service
+from app.services.scenario_pool import pool_requests, scenario_pool, state_bucket
+
+
+async def _serve(client, requests: int, interval: float) -> list:
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.post("/api/assistant/workplace-scenario")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+def _report(label: str, latencies: list) -> None:
+    ordered = sorted(latencies)
+    print(f"{label:<8} p50 {statistics.median(ordered) * 1000:7.1f}ms  "
+          f"p95 {ordered[int(len(ordered) * 0.95) - 1] * 1000:7.1f}ms  max {ordered[-1] * 1000:7.1f}ms")
+
+
+def _event_count() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(WorkplaceEvent).count()
+    finally:
+        db.close()
+
+
+async def main(requests: int, latency: float, interval: float):
+    # Measure raw generation, not the response cache
+    settings.LLM_CACHE_ENABLED = False
+    fake_gemini.install(gemini_service, latency=latency)
+    client = await authenticated_client()
+    events_before = _event_count()
+
+    _report("live", await _serve(client, requests, interval))
+
+    worker = asyncio.create_task(scenario_pool.run(workers=2))
+    bucket = state_bucket({"stamina": 80, "energy": 80, "mood": 60, "stress": 40})  # New character
+    while len(scenario_pool.scenarios.get(bucket, ())) < scenario_pool.target:
+        await asyncio.sleep(0.05)
+
+    hits, misses = pool_requests.value(result="hit"), pool_requests.value(result="miss")
+    _report("pool", await _serve(client, requests, interval))
+    hits, misses = pool_requests.value(result="hit") - hits, pool_requests.value(result="miss") - misses
+    print(f"pool hits {int(hits)}/{int(hits + misses)} (one request every {interval}s, "
+          f"{latency}s per generation, 2 refill workers)")
+
+    stored = _event_count() - events_before
+    print(f"workplace_events stored: {stored}/{2 * requests}")
+    assert stored == 2 * requests, "served scenarios were not all persisted"
+
+    worker.cancel()
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--interval", type=float, default=0.2)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency, args.interval))
@@ -1,22 +1,165 @@
 """
-Check available Gemini models for your API key
+Check available Gemini models for your API key, and benchmark candidates
+
+Usage:
+    python check_gemini_models.py                      # list models
+    python check_gemini_models.py --record-prompts     # save the prompt set to bench/data/gemini_prompts.json
+    python check_gemini_models.py --benchmark [--models gemini-2.5-flash gemini-2.5-flash-lite] [--runs 3]
+
+The benchmark replays the recorded prompt set (advice, workplace scenario,
+Pearl chat at several history lengths) against each model and reports
+latency percentiles per operation next to the GEMINI_LATENCY_SLOS routing uses.
 """
-import google.generativeai as genai
+import argparse
+import asyncio
+import json
 import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import google.generativeai as genai
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+PROMPT_SET = Path(__file__).resolve().parent / "bench" / "data" / "gemini_prompts.json"
+
+
+def list_models() -> None:
+    print("Available Gemini models:\n")
+    for model in genai.list_models():
+        if 'generateContent' in model.supported_generation_methods:
+            print(f"- {model.name}")
+
+
+def build_prompts(seed: int = 7) -> list:
+    """Prompts as the app builds them, for a spread of character states and history lengths"""
+    from app.services.gemini import gemini_service
+
+    rng = random.Random(seed)
+    prompts = []
+    for _ in range(4):
+        state = {metric: rng.randint(10, 95) for metric in ("stamina", "energy", "nutrition", "mood", "stress")}
+        summary = {
+            "meals": rng.randint(0, 21), "calories": float(rng.randint(0, 14000)),
+            "exercises": rng.randint(0, 7), "exercise_minutes": float(rng.randint(0, 300)),
+            "sleep_nights": rng.randint(0, 7), "avg_sleep_hours": rng.uniform(4, 9),
+        }
+        prompts.append({"operation": "advice", "contents": gemini_service._build_health_prompt(state, summary)})
+        prompts.append({"operation": "workplace_scenario",
+                        "contents": gemini_service._build_workplace_prompt(state)})
+
+    for turns in (0, 6, 20):
+        history = []
+        for i in range(turns):
+            history.append({"role": "user", "parts": [f"I had {rng.choice(['rice', 'ramen', 'oats'])} for meal {i}"]})
+            history.append({"role": "model", "parts": ["Nice. Fun fact: cooled rice has resistant starch. " * 3]})
+        for operation in ("pearl_chat", "pearl_stream"):
+            prompts.append({
+                "operation": operation,
+                "history": history,
+                "contents": gemini_service._build_pearl_message("How should I fix my energy?", state, summary),
+            })
+    return prompts
+
+
+async def _run_once(model, pearl_model, prompt: dict) -> float:
+    """Seconds to the full reply (or the first chunk for pearl_stream)"""
+    start = time.monotonic()
+    if prompt["operation"].startswith("pearl"):
+        stream = prompt["operation"] == "pearl_stream"
+        chat = pearl_model.start_chat(history=prompt.get("history") or [])
+        response = await chat.send_message_async(prompt["contents"], stream=stream)
+        if stream:
+            async for _ in response:
+                return time.monotonic() - start
+        return time.monotonic() - start
+    await model.generate_content_async(prompt["contents"])
+    return time.monotonic() - start
+
+
+async def benchmark(models: dict, prompts: list, runs: int, slos: dict) -> dict:
+    """
+    Latency per model and operation
+
+    Args:
+        models: name -> (model, pearl_model)
+    Returns:
+        {name: {operation: [seconds, ...]}}
+    """
+    results = {}
+    for name, (model, pearl_model) in models.items():
+        by_operation = results.setdefault(name, {})
+        for _ in range(runs):
+            for prompt in prompts:
+                try:
+                    seconds = await _run_once(model, pearl_model, prompt)
+                except Exception as e:
+                    print(f"  {name} {prompt['operation']} failed: {e}")
+                    continue
+                by_operation.setdefault(prompt["operation"], []).append(seconds)
+
+    print(f"\n{'model':<28} {'operation':<20} {'n':>3} {'p50 s':>7} {'p95 s':>7} {'SLO s':>6}")
+    for name, by_operation in results.items():
+        for operation, samples in sorted(by_operation.items()):
+            ordered = sorted(samples)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            slo = slos.get(operation)
+            flag = "  over SLO" if slo is not None and p95 > slo else ""
+            print(f"{name:<28} {operation:<20} {len(ordered):>3} {statistics.median(ordered):7.2f} "
+                  f"{p95:7.2f} {slo if slo is not None else '-':>6}{flag}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List or benchmark Gemini models")
+    parser.add_argument("--benchmark", action="store_true", help="replay the prompt set against --models")
+    parser.add_argument("--record-prompts", action="store_true", help=f"write the prompt set to {PROMPT_SET}")
+    parser.add_argument("--models", nargs="+", help="models to benchmark (default: GEMINI_MODEL and GEMINI_FAST_MODEL)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.record_prompts:
+        PROMPT_SET.parent.mkdir(parents=True, exist_ok=True)
+        prompts = build_prompts()
+        with open(PROMPT_SET, "w", encoding="utf-8") as f:
+            json.dump(prompts, f, indent=1)
+        print(f"Recorded {len(prompts)} prompts to {PROMPT_SET}")
+        return
+
+    # Load environment variables
+    load_dotenv()
+
+    api_key = os.getenv('GEMINI_API_KEY')
+
+    if not api_key:
+        print("Error: GEMINI_API_KEY not found in .env file")
+        sys.exit(1)
+
+    genai.configure(api_key=api_key)
+
+    if not args.benchmark:
+        list_models()
+        return
 
-api_key = os.getenv('GEMINI_API_KEY')
+    from app.config import settings
+    from app.services.gemini import PEARL_SYSTEM_INSTRUCTION
 
-if not api_key:
-    print("Error: GEMINI_API_KEY not found in .env file")
-    exit(1)
+    if PROMPT_SET.exists():
+        with open(PROMPT_SET, encoding="utf-8") as f:
+            prompts = json.load(f)
+    else:
+        prompts = build_prompts()
+    names = args.models or [name for name in (settings.GEMINI_MODEL, settings.GEMINI_FAST_MODEL) if name]
+    models = {
+        name: (genai.GenerativeModel(name),
+               genai.GenerativeModel(name, system_instruction=PEARL_SYSTEM_INSTRUCTION))
+        for name in names
+    }
+    print(f"Benchmarking {', '.join(names)} on {len(prompts)} prompts x {args.runs} runs")
+    asyncio.run(benchmark(models, prompts, args.runs, settings.GEMINI_LATENCY_SLOS))
 
-genai.configure(api_key=api_key)
 
-print("Available Gemini models:\n")
-for model in genai.list_models():
-    if 'generateContent' in model.supported_generation_methods:
-        print(f"- {model.name}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
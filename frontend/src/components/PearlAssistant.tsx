@@ -116,6 +116,8 @@ export default function PearlAssistant() {
 
   const [input, setInput] = useState('');
   const [isLoading, setIsLoading] = useState(false);
+  // Server-side conversation; set by Pearl's first reply
+  const conversationIdRef = useRef<number | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   // Auto-scroll to bottom when new messages arrive
@@ -146,7 +148,10 @@ export default function PearlAssistant() {
     setIsLoading(true);
 
     try {
-      const response = await chatWithPearl(userInput);
+      const { response, conversation_id } = await chatWithPearl(userInput, conversationIdRef.current);
+      if (conversation_id != null) {
+        conversationIdRef.current = conversation_id;
+      }
       const assistantMessage: Message = {
         role: 'assistant',
         content: response,
@@ -7,27 +7,32 @@ import { API_ENDPOINTS } from '../config/api';
 
 interface PearlChatRequest {
   message: string;
+  conversation_id?: number | null;
   conversation_history?: any[];
 }
 
-interface PearlChatResponse {
+export interface PearlChatResponse {
   response: string;
+  conversation_id: number | null;
 }
 
 /**
  * Send a message to Pearl AI assistant
+ *
+ * Pass the conversation_id from the previous reply to continue that
+ * conversation; the server keeps its history.
  */
 export const chatWithPearl = async (
   message: string,
-  conversationHistory?: any[]
-): Promise<string> => {
+  conversationId?: number | null
+): Promise<PearlChatResponse> => {
   const response = await api.post<PearlChatResponse>(
     API_ENDPOINTS.pearlChat,
     {
       message,
-      conversation_history: conversationHistory,
+      conversation_id: conversationId ?? undefined,
     } as PearlChatRequest
   );
 
-  return response.data.response;
+  return response.data;
 };
\ No newline at end of file